@@ -0,0 +1,174 @@
+import asyncio
+import hashlib
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import date, datetime, timedelta
+
+logger = logging.getLogger(__name__)
+
+# Каталог дискового уровня кэша и его предельный размер
+ARTIFACT_CACHE_DIR = os.getenv("ARTIFACT_CACHE_DIR", "artifact_cache")
+ARTIFACT_CACHE_DISK_MB = int(os.getenv("ARTIFACT_CACHE_DISK_MB", "512"))
+# Сколько артефактов держать в памяти процесса
+ARTIFACT_CACHE_MEMORY_ITEMS = int(os.getenv("ARTIFACT_CACHE_MEMORY_ITEMS", "128"))
+# Время жизни (сек) артефактов за еще не закрытый период
+ARTIFACT_CACHE_OPEN_TTL = int(os.getenv("ARTIFACT_CACHE_OPEN_TTL", "300"))
+# Сколько последних дней витрины продаж еще пересчитываются (cron: sales_cube.py refresh --days 3).
+# Для артефактов из витрин период закрывается, только когда его последний день вышел из этого окна
+ARTIFACT_CACHE_SETTLE_DAYS = int(os.getenv("ARTIFACT_CACHE_SETTLE_DAYS", "3"))
+
+
+def _as_date(value):
+    return value.date() if isinstance(value, datetime) else value
+
+
+# Кэш готовых графиков и отчетов. Ключ — хэш от (тип артефакта, имя запроса,
+# начало и конец периода, версия рендерера). Закрытые периоды не меняются,
+# поэтому хранятся в памяти (LRU) и на диске без срока жизни; открытые периоды
+# живут только в памяти и недолго. Период закрыт, когда его последний день прошел;
+# для типов из cube_types (строятся из витрин) — когда этот день вышел из окна пересчета.
+class ArtifactCache:
+    def __init__(self, renderer_version, cache_dir=ARTIFACT_CACHE_DIR,
+                 disk_max_bytes=ARTIFACT_CACHE_DISK_MB * 1024 * 1024,
+                 memory_items=ARTIFACT_CACHE_MEMORY_ITEMS, open_ttl=ARTIFACT_CACHE_OPEN_TTL,
+                 settle_days=ARTIFACT_CACHE_SETTLE_DAYS, cube_types=()):
+        self.renderer_version = renderer_version
+        self.cache_dir = cache_dir
+        self.disk_max_bytes = disk_max_bytes
+        self.memory_items = memory_items
+        self.open_ttl = open_ttl
+        self.settle_days = settle_days
+        self.cube_types = tuple(cube_types)
+        self._memory = OrderedDict()  # key -> (data, expires_at или None)
+        self._disk_lock = threading.Lock()
+        self._disk_size = None
+        self.hits = 0
+        self.misses = 0
+
+    def make_key(self, artifact_type, query_name, start_date, end_date):
+        raw = "|".join([
+            artifact_type,
+            query_name or "",
+            _as_date(start_date).isoformat(),
+            _as_date(end_date).isoformat(),
+            str(self.renderer_version),
+        ])
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    # Последний день, данные за который для артефакта этого типа уже не меняются.
+    # По нему же планировщик выбирает периоды для подготовки и рассылки
+    def last_settled_day(self, artifact_type):
+        if artifact_type.startswith(self.cube_types):
+            return date.today() - timedelta(days=self.settle_days)
+        return date.today() - timedelta(days=1)
+
+    def is_open_period(self, artifact_type, end_date):
+        return _as_date(end_date) > self.last_settled_day(artifact_type)
+
+    async def get(self, key):
+        entry = self._memory.get(key)
+        if entry is not None:
+            data, expires_at = entry
+            if expires_at is None or expires_at > time.monotonic():
+                self._memory.move_to_end(key)
+                self.hits += 1
+                return data
+            del self._memory[key]
+        data = await asyncio.to_thread(self._disk_get, key)
+        if data is not None:
+            self._memory_put(key, data, None)
+            self.hits += 1
+            return data
+        self.misses += 1
+        return None
+
+    async def put(self, key, data, artifact_type, end_date):
+        if not data:
+            return
+        if self.is_open_period(artifact_type, end_date):
+            self._memory_put(key, data, time.monotonic() + self.open_ttl)
+            return
+        self._memory_put(key, data, None)
+        try:
+            await asyncio.to_thread(self._disk_put, key, data)
+        except OSError as e:
+            logger.error(f"Не удалось записать артефакт в дисковый кэш: {str(e)}")
+
+    def _memory_put(self, key, data, expires_at):
+        self._memory[key] = (data, expires_at)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_items:
+            self._memory.popitem(last=False)
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, key[:2], f"{key}.bin")
+
+    def _disk_get(self, key):
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+            # Обновляем время доступа вручную: atime часто отключен (noatime)
+            os.utime(path, None)
+            return data
+        except FileNotFoundError:
+            return None
+        except OSError as e:
+            logger.error(f"Ошибка чтения дискового кэша: {str(e)}")
+            return None
+
+    def _disk_put(self, key, data):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        with self._disk_lock:
+            # При перезаписи (например, после истечения артефакта в памяти) размер
+            # старого файла вычитается, иначе счетчик растет и очистка идет зря
+            try:
+                old_size = os.path.getsize(path)
+            except FileNotFoundError:
+                old_size = 0
+            os.replace(tmp_path, path)
+            if self._disk_size is None:
+                self._disk_size = sum(size for _, size, _ in self._scan_disk())
+            else:
+                self._disk_size += len(data) - old_size
+            if self._disk_size > self.disk_max_bytes:
+                self._evict_disk()
+
+    def _scan_disk(self):
+        entries = []
+        for root, _, files in os.walk(self.cache_dir):
+            for name in files:
+                if not name.endswith(".bin"):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                entries.append((path, stat.st_size, stat.st_mtime))
+        return entries
+
+    # Удаляет давно не использованные файлы, пока кэш не уменьшится до 90% лимита
+    def _evict_disk(self):
+        entries = sorted(self._scan_disk(), key=lambda entry: entry[2])
+        total = sum(size for _, size, _ in entries)
+        target = self.disk_max_bytes * 0.9
+        removed = 0
+        for path, size, _ in entries:
+            if total <= target:
+                break
+            try:
+                os.remove(path)
+                total -= size
+                removed += 1
+            except FileNotFoundError:
+                continue
+        self._disk_size = total
+        logger.info(f"Очистка дискового кэша артефактов: удалено файлов {removed}, размер {total} байт")
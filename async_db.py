@@ -0,0 +1,114 @@
+import asyncio
+import logging
+import os
+import re
+from datetime import date, datetime, time
+from functools import lru_cache
+
+import asyncpg
+
+logger = logging.getLogger(__name__)
+
+# Размер пула соединений asyncpg
+DB_POOL_MIN_SIZE = int(os.getenv("DB_POOL_MIN_SIZE", "2"))
+DB_POOL_MAX_SIZE = int(os.getenv("DB_POOL_MAX_SIZE", "10"))
+# Интервал проверки соединений (сек) и таймаут запроса (сек)
+DB_HEALTHCHECK_INTERVAL = float(os.getenv("DB_HEALTHCHECK_INTERVAL", "60"))
+DB_COMMAND_TIMEOUT = float(os.getenv("DB_COMMAND_TIMEOUT", "60"))
+# Соединение, простаивающее дольше этого времени (сек), закрывается пулом
+DB_MAX_INACTIVE_LIFETIME = float(os.getenv("DB_MAX_INACTIVE_LIFETIME", "300"))
+
+_PLACEHOLDER_RE = re.compile(r"%s")
+
+
+# Переводит запрос с плейсхолдерами psycopg2 (%s) в формат asyncpg ($1, $2, ...),
+# чтобы SQL_QUERIES можно было использовать без изменений
+@lru_cache(maxsize=256)
+def to_asyncpg_query(query):
+    counter = iter(range(1, query.count("%s") + 1))
+    return _PLACEHOLDER_RE.sub(lambda _: f"${next(counter)}", query)
+
+
+# asyncpg строго типизирует параметры: дата без времени не подходит для timestamp,
+# а datetime подходит и для date, и для timestamp
+def _coerce_param(value):
+    if isinstance(value, date) and not isinstance(value, datetime):
+        return datetime.combine(value, time.min)
+    return value
+
+
+class AsyncDatabase:
+    def __init__(self, db_config, min_size=DB_POOL_MIN_SIZE, max_size=DB_POOL_MAX_SIZE):
+        self.db_config = db_config
+        self.min_size = min_size
+        self.max_size = max(min_size, max_size)
+        self._pool = None
+        self._health_task = None
+
+    async def connect(self):
+        if self._pool is not None:
+            return
+        self._pool = await asyncpg.create_pool(
+            database=self.db_config.get("dbname"),
+            user=self.db_config.get("user"),
+            password=self.db_config.get("password"),
+            host=self.db_config.get("host"),
+            port=self.db_config.get("port"),
+            ssl=self.db_config.get("sslmode"),
+            min_size=self.min_size,
+            max_size=self.max_size,
+            command_timeout=DB_COMMAND_TIMEOUT,
+            max_inactive_connection_lifetime=DB_MAX_INACTIVE_LIFETIME,
+        )
+        logger.info(f"Создан пул соединений asyncpg: min={self.min_size}, max={self.max_size}")
+        if DB_HEALTHCHECK_INTERVAL > 0:
+            self._health_task = asyncio.create_task(self._health_loop())
+
+    async def close(self):
+        if self._health_task is not None:
+            self._health_task.cancel()
+            self._health_task = None
+        if self._pool is not None:
+            await self._pool.close()
+            self._pool = None
+            logger.info("Пул соединений asyncpg закрыт.")
+
+    async def check_health(self):
+        try:
+            async with self._get_pool().acquire() as conn:
+                await conn.fetchval("SELECT 1")
+            return True
+        except Exception as e:
+            logger.error(f"Проверка соединения с базой данных не прошла: {str(e)}")
+            return False
+
+    async def _health_loop(self):
+        while True:
+            await asyncio.sleep(DB_HEALTHCHECK_INTERVAL)
+            if not await self.check_health():
+                # Сбрасываем все соединения: пул переподключится при следующем запросе
+                await self._pool.expire_connections()
+
+    # Состояние пула для метрик: открытые соединения, из них свободные, и предел пула
+    def pool_stats(self):
+        if self._pool is None:
+            return {"open": 0, "idle": 0, "max": self.max_size}
+        return {"open": self._pool.get_size(), "idle": self._pool.get_idle_size(), "max": self.max_size}
+
+    def _get_pool(self):
+        if self._pool is None:
+            raise RuntimeError("Пул соединений с базой данных не инициализирован")
+        return self._pool
+
+    # Записи asyncpg не сериализуются pickle, поэтому наружу отдаем кортежи:
+    # результаты передаются в процессы рендеринга
+    async def fetch(self, query, *params):
+        rows = await self._get_pool().fetch(to_asyncpg_query(query), *map(_coerce_param, params))
+        return [tuple(row) for row in rows]
+
+    async def fetchrow(self, query, *params):
+        row = await self._get_pool().fetchrow(to_asyncpg_query(query), *map(_coerce_param, params))
+        return tuple(row) if row is not None else None
+
+    async def fetchval(self, query, *params):
+        return await self._get_pool().fetchval(to_asyncpg_query(query), *map(_coerce_param, params))
@@ -0,0 +1,107 @@
+# Микробенчмарк маршрутизации callback-запросов: стоимость выбора обработчика
+# для одного нажатия при росте числа обработчиков.
+#   chain  — цепочка фильтров lambda c: c.data.startswith(...) в порядке регистрации,
+#            затем разбор callback_data.split("_") в обработчике (прежняя схема бота)
+#   router — CallbackRouter: один разбор строки и поиск по таблице префиксов
+# Запуск из корня репозитория: python benchmarks/bench_callback_router.py
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from callback_router import CallbackRouter
+
+HANDLER_COUNTS = [5, 20, 50, 100, 200]
+ROUNDS = 200_000
+STEPS = ["period", "year", "month", "week", "build"]
+
+
+# Фабрика callback_data с тем же интерфейсом, что у aiogram CallbackData
+def make_factory(prefix):
+    class Factory:
+        __prefix__ = prefix
+        __separator__ = ":"
+
+        def __init__(self, step, year, month):
+            self.step = step
+            self.year = year
+            self.month = month
+
+        @classmethod
+        def unpack(cls, data):
+            _, step, year, month = data.split(":")
+            return cls(step, int(year), int(month))
+
+    return Factory
+
+
+def handler(callback, callback_data):
+    return callback_data
+
+
+def build_chain(count):
+    chain = []
+    for i in range(count // len(STEPS) + 1):
+        for step in STEPS:
+            if len(chain) == count:
+                return chain
+            prefix = f"h{i}_{step}_"
+            chain.append((lambda data, prefix=prefix: data.startswith(prefix), handler))
+    return chain
+
+
+def dispatch_chain(chain, data):
+    for check, func in chain:
+        if check(data):
+            parts = data.split("_")
+            return func(data, (parts[1], int(parts[2]), int(parts[3])))
+    return None
+
+
+def build_router(count):
+    router = CallbackRouter()
+    registered = 0
+    for i in range(count // len(STEPS) + 1):
+        factory = make_factory(f"h{i}")
+        for step in STEPS:
+            if registered == count:
+                return router
+            router.route(factory, step)(handler)
+            registered += 1
+    return router
+
+
+def payloads(count):
+    result = []
+    for n in range(count):
+        i, step = divmod(n, len(STEPS))
+        result.append((f"h{i}_{STEPS[step]}_2024_5", f"h{i}:{STEPS[step]}:2024:5"))
+    return result
+
+
+def measure(func, samples):
+    started = time.perf_counter()
+    for data in samples:
+        func(data)
+    return (time.perf_counter() - started) / len(samples) * 1e9
+
+
+def main():
+    rng = random.Random(42)
+    print(f"{'обработчиков':>12} {'chain, нс':>12} {'router, нс':>12} {'chain худший':>14} {'router худший':>14}")
+    for count in HANDLER_COUNTS:
+        chain = build_chain(count)
+        router = build_router(count)
+        pairs = payloads(count)
+        picks = [rng.choice(pairs) for _ in range(ROUNDS)]
+        chain_avg = measure(lambda data: dispatch_chain(chain, data), [p[0] for p in picks])
+        router_avg = measure(lambda data: router.resolve(data)[0](None, None), [p[1] for p in picks])
+        chain_worst = measure(lambda data: dispatch_chain(chain, data), [pairs[-1][0]] * ROUNDS)
+        router_worst = measure(lambda data: router.resolve(data)[0](None, None), [pairs[-1][1]] * ROUNDS)
+        print(f"{count:>12} {chain_avg:>12.0f} {router_avg:>12.0f} {chain_worst:>14.0f} {router_worst:>14.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,252 @@
+# Бенчмарк конвейеров бота: графики всех типов, дашборд, недельный и месячный
+# отчеты за неделю, месяц, квартал и год. Для каждого случая время делится на:
+#   sql     — запросы к базе (AsyncDatabase, как в боте)
+#   shaping — разбор результата в структуры для рендеринга (dashboard_data, report_data)
+#   render  — построение графика, PDF или DOCX (функции renderers)
+#   encode  — кодирование графика в PNG/JPEG/WebP (только для графиков)
+# и записывается пиковый RSS рабочего процесса, в котором шел рендеринг.
+#
+# Запускается против локальной PostgreSQL с заполненной схемой магазина, без сети
+# (синтетические данные — benchmarks/generate_data.py):
+#   python benchmarks/generate_data.py --create-schema --scale 1
+#   python sales_cube.py migrate && python sales_cube.py refresh --full
+#   python benchmarks/bench_pipelines.py --save-baseline    # записать базовую линию
+#   python benchmarks/bench_pipelines.py                    # сравнить с ней
+# Параметры подключения — DB_NAME, DB_USER, DB_PASSWORD, DB_HOST, DB_PORT (как у sales_cube.py).
+# Код возврата 1, если какой-то показатель хуже базовой линии больше допустимого
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import statistics
+import sys
+import time
+from datetime import date, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from async_db import AsyncDatabase
+from chart_queries import SQL_QUERIES
+from dashboard_data import load_dashboard_data
+from report_data import load_weekly_report_data, load_monthly_report_data
+from periods import period_range
+
+BASELINE_PATH = os.path.join(ROOT, "benchmarks", "baseline_pipelines.json")
+PERIODS = ["week", "month", "quarter", "year"]
+REPORTS = ["dashboard", "weekly_report", "monthly_report"]
+STAGES = ["sql", "shaping", "render", "encode"]
+# Допустимое ухудшение относительно базовой линии: доля и абсолютный порог шума
+TIME_THRESHOLD = 0.20
+TIME_NOISE_MS = 5.0
+RSS_THRESHOLD = 0.10
+
+REPORT_LOADERS = {
+    "dashboard": load_dashboard_data,
+    "weekly_report": load_weekly_report_data,
+    "monthly_report": load_monthly_report_data,
+}
+
+REPORT_RENDERERS = {
+    "dashboard": "create_dashboard",
+    "weekly_report": "create_weekly_word_report",
+    "monthly_report": "create_monthly_word_report",
+}
+
+
+# Обертка над AsyncDatabase: считает время, проведенное в запросах
+class TimedDatabase:
+    def __init__(self, db):
+        self.db = db
+        self.sql_seconds = 0.0
+
+    async def _timed(self, method, query, *params):
+        started = time.perf_counter()
+        try:
+            return await getattr(self.db, method)(query, *params)
+        finally:
+            self.sql_seconds += time.perf_counter() - started
+
+    async def fetch(self, query, *params):
+        return await self._timed("fetch", query, *params)
+
+    async def fetchrow(self, query, *params):
+        return await self._timed("fetchrow", query, *params)
+
+    async def fetchval(self, query, *params):
+        return await self._timed("fetchval", query, *params)
+
+
+# Периоды для end_date: семь дней по end_date, его месяц, квартал и год
+def bench_period(period, end_date):
+    year, month = end_date.year, end_date.month
+    if period == "week":
+        return end_date - timedelta(days=6), end_date
+    if period == "month":
+        return period_range("m", year, month)
+    if period == "quarter":
+        return period_range("q", year, part=(month - 1) // 3 + 1)
+    return period_range("y", year)
+
+
+async def load_case(db, name, start_date, end_date):
+    timed = TimedDatabase(db)
+    started = time.perf_counter()
+    if name in REPORT_LOADERS:
+        data = await REPORT_LOADERS[name](timed, start_date, end_date)
+    else:
+        data = await timed.fetch(SQL_QUERIES[name], start_date, end_date)
+    total = time.perf_counter() - started
+    return data, timed.sql_seconds, total - timed.sql_seconds
+
+
+# Выполняется в отдельном рабочем процессе (один процесс на случай), чтобы
+# пиковый RSS относился только к этому случаю
+def render_case(name, start_date, end_date, data, repeat):
+    import renderers
+
+    render_times, encode_times, size = [], [], 0
+    for _ in range(repeat):
+        started = time.perf_counter()
+        encode = 0.0
+        if name in REPORT_RENDERERS:
+            buffer = getattr(renderers, REPORT_RENDERERS[name])(start_date, end_date, data)
+            if buffer is None:
+                raise RuntimeError(f"{name} не построен")
+        else:
+            buffer, error, encode_stats = renderers.create_graph(name, start_date, end_date, data)
+            if error:
+                raise RuntimeError(error)
+            encode = encode_stats.seconds
+        render_times.append(time.perf_counter() - started - encode)
+        encode_times.append(encode)
+        size = buffer.getbuffer().nbytes
+    # ru_maxrss в Linux — в килобайтах
+    peak_rss_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    return statistics.median(render_times), statistics.median(encode_times), peak_rss_mb, size
+
+
+async def run_case(db, context, name, period, end_date, repeat):
+    start_date, stop_date = bench_period(period, end_date)
+    sql_times, shaping_times = [], []
+    for _ in range(repeat):
+        data, sql_seconds, shaping_seconds = await load_case(db, name, start_date, stop_date)
+        sql_times.append(sql_seconds)
+        shaping_times.append(shaping_seconds)
+    if name not in REPORT_LOADERS and not data:
+        return {"skipped": f"нет данных за {start_date} - {stop_date}"}
+    with context.Pool(processes=1, maxtasksperchild=1) as pool:
+        render, encode, peak_rss_mb, size = await asyncio.to_thread(
+            pool.apply, render_case, (name, start_date, stop_date, data, repeat))
+    return {
+        "sql_ms": statistics.median(sql_times) * 1000,
+        "shaping_ms": statistics.median(shaping_times) * 1000,
+        "render_ms": render * 1000,
+        "encode_ms": encode * 1000,
+        "peak_rss_mb": peak_rss_mb,
+        "rows": len(data) if isinstance(data, list) else None,
+        "bytes": size,
+    }
+
+
+def machine_info():
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+    }
+
+
+# Показатели, ухудшившиеся сверх порогов
+def compare(results, baseline, time_threshold, rss_threshold):
+    regressions = []
+    for case, current in results.items():
+        previous = baseline.get(case)
+        if not previous or "skipped" in current or "skipped" in previous:
+            continue
+        for stage in STAGES:
+            key = f"{stage}_ms"
+            was, now = previous.get(key, 0), current[key]
+            if now > was * (1 + time_threshold) and now - was > TIME_NOISE_MS:
+                regressions.append(f"{case}: {stage} {was:.1f} -> {now:.1f} мс")
+        was, now = previous.get("peak_rss_mb", 0), current["peak_rss_mb"]
+        if was and now > was * (1 + rss_threshold):
+            regressions.append(f"{case}: peak RSS {was:.0f} -> {now:.0f} МБ")
+    return regressions
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Бенчмарк графиков, дашборда и отчетов")
+    parser.add_argument("--end-date", type=date.fromisoformat, default=date(2024, 12, 31),
+                        help="последний день недели; месяц, квартал и год берутся по этой дате")
+    parser.add_argument("--periods", default=",".join(PERIODS))
+    parser.add_argument("--only", default="", help="типы графиков и отчетов через запятую")
+    parser.add_argument("--repeat", type=int, default=3, help="повторов каждого этапа, берется медиана")
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--save-baseline", action="store_true", help="записать результаты как базовую линию")
+    parser.add_argument("--threshold", type=float, default=TIME_THRESHOLD,
+                        help="допустимое ухудшение времени (доля)")
+    parser.add_argument("--rss-threshold", type=float, default=RSS_THRESHOLD)
+    # Стенд обычно локальный и без SSL: prefer подключится и к базе с SSL, и без него
+    parser.add_argument("--sslmode", default=os.getenv("DB_SSLMODE", "prefer"))
+    args = parser.parse_args()
+
+    names = list(SQL_QUERIES) + REPORTS
+    if args.only:
+        names = [name for name in names if name in args.only.split(",")]
+    periods = [period for period in args.periods.split(",") if period in PERIODS]
+
+    db = AsyncDatabase({
+        "dbname": os.getenv("DB_NAME"),
+        "user": os.getenv("DB_USER"),
+        "password": os.getenv("DB_PASSWORD"),
+        "host": os.getenv("DB_HOST", "localhost"),
+        "port": os.getenv("DB_PORT", "5432"),
+        "sslmode": args.sslmode,
+    }, min_size=1, max_size=1)
+    await db.connect()
+    context = multiprocessing.get_context("spawn")
+    results = {}
+    try:
+        print(f"{'случай':36} {'sql':>9} {'shaping':>9} {'render':>9} {'encode':>9} {'RSS МБ':>8}")
+        for period in periods:
+            for name in names:
+                case = f"{name}:{period}"
+                result = await run_case(db, context, name, period, args.end_date, args.repeat)
+                results[case] = result
+                if "skipped" in result:
+                    print(f"{case:36} пропущен: {result['skipped']}")
+                    continue
+                print(f"{case:36} {result['sql_ms']:9.1f} {result['shaping_ms']:9.1f} "
+                      f"{result['render_ms']:9.1f} {result['encode_ms']:9.1f} {result['peak_rss_mb']:8.0f}")
+    finally:
+        await db.close()
+
+    if args.save_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump({"machine": machine_info(), "end_date": args.end_date.isoformat(), "results": results},
+                      f, ensure_ascii=False, indent=2, sort_keys=True)
+        print(f"Базовая линия записана в {args.baseline}")
+        return 0
+    if not os.path.exists(args.baseline):
+        print(f"Базовой линии {args.baseline} нет; запишите ее флагом --save-baseline")
+        return 0
+    with open(args.baseline, encoding="utf-8") as f:
+        baseline = json.load(f)
+    if baseline.get("end_date") != args.end_date.isoformat():
+        print(f"Внимание: базовая линия снята за другие периоды (--end-date {baseline.get('end_date')})")
+    if baseline.get("machine") != machine_info():
+        print(f"Внимание: базовая линия снята на другой машине: {baseline.get('machine')}")
+    regressions = compare(results, baseline["results"], args.threshold, args.rss_threshold)
+    for line in regressions:
+        print(f"РЕГРЕССИЯ {line}")
+    if not regressions:
+        print("Регрессий относительно базовой линии нет")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
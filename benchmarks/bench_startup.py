@@ -0,0 +1,98 @@
+# Бенчмарк времени запуска: сколько стоит импорт модуля бота и веб-приложений.
+# Каждый модуль импортируется в отдельном процессе с -X importtime; выводится
+# общее время процесса, суммарное время импорта и самые дорогие модули.
+# Окружение тестовое (токен-заглушка, ключ шифрования, временная рабочая папка),
+# к Telegram и базе данных запуск не обращается.
+# Запуск из корня репозитория:
+#   python benchmarks/bench_startup.py                  # bot4g2, web_app, sales_app
+#   python benchmarks/bench_startup.py renderers        # отдельные модули
+# Код возврата 1, если какой-то модуль не импортируется или запускается дольше STARTUP_BUDGET_MS
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+MODULES = ["bot4g2", "web_app", "sales_app"]
+# Допустимое время запуска процесса, мс
+STARTUP_BUDGET_MS = float(os.getenv("STARTUP_BUDGET_MS", "1000"))
+TOP_MODULES = 10
+ROUNDS = 3
+
+TEST_ENV = {
+    "API_TOKEN": "123456:TEST",
+    "ENCRYPTION_KEY": "MDEyMzQ1Njc4OWFiY2RlZjAxMjM0NTY3ODlhYmNkZWY=",
+    "BOT_MODE": "polling",
+    "FSM_STORAGE": "memory",
+}
+
+
+# Строки вида "import time:   self [us] | cumulative | imported package";
+# вложенность импорта обозначена отступом имени (два пробела на уровень)
+def parse_importtime(stderr):
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        _, cumulative_us, name = line[len("import time:"):].split("|", 2)
+        name = name[1:].rstrip()
+        depth = (len(name) - len(name.lstrip())) // 2
+        rows.append((depth, int(cumulative_us), name.strip()))
+    return rows
+
+
+# Прямые импорты модуля: -X importtime печатает дочерние модули перед родителем
+def direct_imports(rows, module):
+    end = next((i for i, (depth, _, name) in enumerate(rows) if depth == 0 and name == module), None)
+    if end is None:
+        return 0, []
+    children = []
+    for depth, cumulative, name in reversed(rows[:end]):
+        if depth == 0:
+            break
+        if depth == 1:
+            children.append((cumulative, name))
+    return rows[end][1], children
+
+
+def measure(module, workdir):
+    env = dict(os.environ, **TEST_ENV, PYTHONPATH=ROOT)
+    started = time.perf_counter()
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                            cwd=workdir, env=env, capture_output=True, text=True)
+    wall_ms = (time.perf_counter() - started) * 1000
+    if result.returncode != 0:
+        error = result.stderr.strip().splitlines()[-1] if result.stderr.strip() else "?"
+        raise RuntimeError(f"импорт {module} завершился с ошибкой: {error}")
+    return wall_ms, parse_importtime(result.stderr)
+
+
+def main(modules):
+    failed = []
+    for module in modules:
+        # Лучший из нескольких запусков: первый прогревает кэш файловой системы и .pyc
+        runs = []
+        try:
+            for _ in range(ROUNDS):
+                with tempfile.TemporaryDirectory() as workdir:
+                    runs.append(measure(module, workdir))
+        except RuntimeError as e:
+            print(f"{module}: {str(e)}")
+            failed.append(module)
+            continue
+        wall_ms, rows = min(runs, key=lambda run: run[0])
+        own, children = direct_imports(rows, module)
+        print(f"{module}: процесс {wall_ms:.0f} мс, импорт модуля {own / 1000:.0f} мс, модулей загружено {len(rows)}")
+        # Прямые импорты модуля с наибольшим накопленным временем
+        for cumulative, name in sorted(children, reverse=True)[:TOP_MODULES]:
+            print(f"    {cumulative / 1000:8.1f} мс  {name}")
+        if wall_ms > STARTUP_BUDGET_MS:
+            print(f"    дольше {STARTUP_BUDGET_MS:.0f} мс")
+            failed.append(module)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:] or MODULES))
@@ -0,0 +1,665 @@
+# Генератор синтетических данных магазина в масштабе продакшена: таблицы
+# "Order", "Order_goods", "Goods", "Category_goods", "Customer", "Store", "Realization",
+# "Delivery", "Address", "Payment", "Supply", "Suppliers", "Store_stock", "Rating_goods",
+# "Staff", "Country", "Price_goods", "Discount".
+#
+# При --scale 1 получается около 3,2 млн заказов и 10,7 млн строк заказов за период
+# --from/--to. Заказы распределены по дням с сезонностью: рост к концу года, дни
+# недели, праздничные пики как в get_holiday_seasonality (Новый год, 14 февраля,
+# 23 февраля, 8 марта и недели перед ними, дни рождения покупателей), подарочные
+# категории в праздники продаются чаще. Города и магазины неравномерны (крупные
+# города и популярные магазины получают основную долю), доля онлайн-заказов растет
+# от начала периода к концу.
+#
+# Данные детерминированы: одинаковые --seed, --scale и период дают одни и те же
+# строки при любом числе --workers. Большие таблицы делятся на блоки, у каждого
+# блока свой генератор случайных чисел (от seed и номера блока); блоки генерируются
+# и загружаются через COPY параллельно в рабочих процессах.
+#
+# Схема в репозитории не хранится, поэтому колонки взяты из запросов приложений.
+# COPY заполняет только эти колонки: остальные колонки существующей схемы должны
+# допускать NULL или иметь значение по умолчанию. --create-schema создает таблицы
+# с этими колонками, а после загрузки — первичные ключи и индексы.
+#
+#   python benchmarks/generate_data.py --dry-run --scale 3          # только объемы
+#   python benchmarks/generate_data.py --create-schema --scale 1
+#   python benchmarks/generate_data.py --truncate --scale 0.1 --seed 7
+#   python sales_cube.py migrate && python sales_cube.py refresh --full
+# Параметры подключения — DB_NAME, DB_USER, DB_PASSWORD, DB_HOST, DB_PORT (как у sales_cube.py).
+import argparse
+import io
+import math
+import multiprocessing
+import os
+import random
+import sys
+import time
+from bisect import bisect_right
+from datetime import date, timedelta
+from itertools import accumulate
+
+# Объемы при --scale 1. Заказы и покупатели растут линейно, каталог и сеть
+# магазинов — как корень из масштаба
+ORDERS_PER_SCALE = 3_200_000
+CUSTOMERS_PER_SCALE = 400_000
+GOODS_PER_SCALE = 20_000
+STORES_PER_SCALE = 120
+SUPPLIERS_PER_SCALE = 300
+
+# Размеры блоков: от них зависят генераторы случайных чисел, поэтому это не параметры
+ORDERS_PER_CHUNK = 100_000
+CUSTOMERS_PER_CHUNK = 100_000
+GOODS_PER_CHUNK = 2_000
+
+# Order_goodsID = OrderID * MAX_ORDER_LINES + номер строки: идентификаторы строк
+# не зависят от соседних блоков
+MAX_ORDER_LINES = 10
+LINE_COUNT_WEIGHTS = [22, 22, 18, 13, 9, 6, 4, 3, 2, 1]
+
+# Покупатели регистрируются равномерно начиная с REGISTRATION_YEARS лет до начала периода
+REGISTRATION_YEARS = 3
+# Доля заказов, сделанных покупателем в свой день рождения
+BIRTHDAY_SHARE = 0.03
+BIRTHDAY_STEP = 7919
+
+ONLINE_SHARE_START = 0.30
+ONLINE_SHARE_END = 0.42
+ONLINE_HOLIDAY_BONUS = 0.05
+# Доля онлайн-заказов с доставкой; остальные — самовывоз (DeliveriID = 0)
+DELIVERY_SHARE = 0.7
+YEARLY_GROWTH = 0.15
+
+WEEKDAY_FACTORS = [0.9, 0.9, 0.95, 1.0, 1.15, 1.25, 1.1]
+MONTH_FACTORS = [0.85, 0.9, 1.0, 0.95, 0.95, 0.95, 0.95, 1.0, 1.0, 1.0, 1.1, 1.3]
+# Праздники из get_holiday_seasonality: (месяц, первый день, последний день) -> множитель заказов
+HOLIDAYS = {
+    (12, 31, 31): 2.2,
+    (1, 1, 1): 0.6,
+    (12, 25, 30): 1.6,
+    (2, 14, 14): 1.8,
+    (2, 7, 13): 1.25,
+    (2, 23, 23): 1.5,
+    (3, 8, 8): 2.0,
+    (3, 1, 7): 1.4,
+}
+# Во сколько раз чаще подарочные категории попадают в заказы праздничных дней
+GIFT_BOOST = 3.0
+HOUR_WEIGHTS = [1, 0, 0, 0, 0, 0, 1, 2, 4, 5, 6, 7, 8, 8, 7, 7, 8, 10, 12, 12, 10, 7, 4, 2]
+
+CITIES = [
+    "Москва", "Санкт-Петербург", "Новосибирск", "Екатеринбург", "Казань", "Нижний Новгород",
+    "Челябинск", "Красноярск", "Самара", "Уфа", "Ростов-на-Дону", "Омск", "Краснодар", "Воронеж",
+    "Пермь", "Волгоград", "Саратов", "Тюмень", "Тольятти", "Ижевск", "Барнаул", "Ульяновск",
+    "Иркутск", "Хабаровск", "Ярославль", "Владивосток", "Махачкала", "Томск", "Оренбург", "Кемерово",
+    "Новокузнецк", "Рязань", "Набережные Челны", "Астрахань", "Пенза", "Киров", "Липецк",
+    "Чебоксары", "Балашиха", "Калининград",
+]
+# Вес города убывает со рангом; Москва и Санкт-Петербург дополнительно крупнее
+CITY_WEIGHTS = [(1.5 if rank == 0 else 1.2 if rank == 1 else 1.0) / (rank + 1) ** 1.1
+                for rank in range(len(CITIES))]
+
+COUNTRIES = [("Россия", 60), ("Китай", 12), ("Беларусь", 7), ("Турция", 5), ("Италия", 4),
+             ("Германия", 4), ("Франция", 3), ("Казахстан", 2), ("Япония", 2), ("Корея", 1)]
+# Категория, цена от и до, тип товара, срок хранения в днях, подарочная, доля ассортимента
+CATEGORIES = [
+    ("Молочные продукты", 60, 400, "Продукты", (5, 30), False, 10),
+    ("Овощи и фрукты", 40, 500, "Продукты", (3, 20), False, 10),
+    ("Бакалея", 50, 600, "Продукты", (180, 720), False, 14),
+    ("Напитки", 40, 800, "Продукты", (90, 720), False, 10),
+    ("Кондитерские изделия", 60, 1500, "Продукты", (30, 270), True, 9),
+    ("Цветы", 300, 5000, "Подарки", (3, 10), True, 3),
+    ("Бытовая химия", 80, 1500, "Хозтовары", (720, 1440), False, 8),
+    ("Косметика", 150, 4000, "Красота", (365, 1080), True, 9),
+    ("Одежда", 500, 8000, "Непродовольственные", (1800, 3600), False, 10),
+    ("Игрушки", 300, 5000, "Непродовольственные", (1800, 3600), True, 7),
+    ("Электроника", 1500, 60000, "Непродовольственные", (1800, 3600), True, 6),
+    ("Товары для дома", 200, 6000, "Хозтовары", (1800, 3600), False, 4),
+]
+DISCOUNTS = [(0, 60), (5, 12), (10, 12), (15, 7), (20, 5), (30, 3), (50, 1)]
+PAYMENT_METHODS = ["Наличные", "Банковская карта", "СБП", "Оплата при получении"]
+# Веса способов оплаты (в порядке PAYMENT_METHODS) для магазина и для онлайн-заказов
+OFFLINE_PAYMENT_WEIGHTS = [25, 65, 10, 0]
+ONLINE_PAYMENT_WEIGHTS = [0, 70, 20, 10]
+STATUSES = [("Завершен", 92), ("Отменен", 5), ("Возврат", 3)]
+# Онлайн-заказы последних дней периода могут быть еще не выполнены
+PENDING_STATUS = "В обработке"
+PENDING_DAYS = 3
+
+LAST_NAMES = ["Иванов", "Смирнов", "Кузнецов", "Попов", "Васильев", "Петров", "Соколов", "Михайлов",
+              "Новиков", "Федоров", "Морозов", "Волков", "Алексеев", "Лебедев", "Семенов", "Егоров"]
+FIRST_NAMES = ["Александр", "Дмитрий", "Максим", "Сергей", "Андрей", "Алексей", "Артем", "Илья",
+               "Анна", "Мария", "Елена", "Ольга", "Наталья", "Татьяна", "Ирина", "Екатерина"]
+STREETS = ["Ленина", "Мира", "Советская", "Садовая", "Центральная", "Молодежная", "Школьная",
+           "Лесная", "Победы", "Гагарина", "Пушкина", "Набережная"]
+BRAND_SYLLABLES = ["ве", "ла", "ро", "ми", "та", "кор", "нор", "ст", "ал", "ви", "да", "лю", "сан", "тек"]
+
+TABLE_COLUMNS = {
+    "Country": [("CountryID", "integer"), ("Country_name", "text")],
+    "Category_goods": [("Category_goodsID", "integer"), ("Category", "text")],
+    "Discount": [("DiscountID", "integer"), ("Discount_amount", "numeric(5,2)")],
+    "Price_goods": [("PriceID", "integer"), ("Goods_price", "numeric(12,2)")],
+    "Payment": [("PaymentID", "integer"), ("Method_payment", "text")],
+    "Goods": [("GoodID", "integer"), ("Goods", "text"), ("Brend", "text"), ("Type_good", "text"),
+              ("Category_goodsID", "integer"), ("CountryID", "integer"), ("PriceID", "integer"),
+              ("DiscountID", "integer"), ("Storage_life", "integer")],
+    "Suppliers": [("SuppliersID", "integer"), ("Name_suppliers", "text"),
+                  ("Number_phone_suppliers", "text"), ("Contact_person", "text")],
+    "Store": [("StoreID", "integer"), ("Name", "text"), ("City", "text"), ("Street", "text"),
+              ("Building", "text"), ("Rental_price_month", "numeric(12,2)")],
+    "Staff": [("StaffID", "integer"), ("Last_name", "text"), ("First_name", "text"),
+              ("Salary", "numeric(12,2)")],
+    "Realization": [("RealizationID", "integer"), ("StoreID", "integer"), ("StaffID", "integer")],
+    "Customer": [("CustomerID", "integer"), ("Gender", "text"), ("Date_birthday", "date"),
+                 ("Registration_date", "date")],
+    "Address": [("AddressID", "integer"), ("City", "text")],
+    "Order": [("OrderID", "integer"), ("Date_order", "timestamp"), ("Buying_method", "text"),
+              ("CustomerID", "integer"), ("DeliveriID", "integer"), ("Order status", "text"),
+              ("PaymentID", "integer"), ("RealizationID", "integer")],
+    "Order_goods": [("Order_goodsID", "bigint"), ("OrderID", "integer"), ("GoodID", "integer"),
+                    ("Quantity_goods", "integer"), ("Sum_og", "numeric(12,2)"),
+                    ("Sum_and_discont_og", "numeric(12,2)")],
+    "Delivery": [("DeliveryID", "integer"), ("AdressID", "integer")],
+    "Supply": [("GoodsID", "integer"), ("SuppliersID", "integer"), ("Date_supply", "date"),
+               ("Price_supply", "numeric(12,2)")],
+    "Store_stock": [("StoreID", "integer"), ("GoodID", "integer"), ("Goods_quantity", "integer")],
+    "Rating_goods": [("GoodID", "integer"), ("Rating", "integer")],
+}
+
+# Первичные ключи и индексы, которые --create-schema добавляет после загрузки
+PRIMARY_KEYS = {
+    "Country": "CountryID", "Category_goods": "Category_goodsID", "Discount": "DiscountID",
+    "Price_goods": "PriceID", "Payment": "PaymentID", "Goods": "GoodID", "Suppliers": "SuppliersID",
+    "Store": "StoreID", "Staff": "StaffID", "Realization": "RealizationID", "Customer": "CustomerID",
+    "Address": "AddressID", "Order": "OrderID", "Order_goods": "Order_goodsID", "Delivery": "DeliveryID",
+}
+INDEXES = [
+    ("Order", "Date_order"),
+    ("Order_goods", "OrderID"),
+    ("Order_goods", "GoodID"),
+    ("Supply", "GoodsID"),
+    ("Store_stock", "GoodID"),
+    ("Rating_goods", "GoodID"),
+]
+
+
+# Равномерное число в [0, 1), зависящее только от value и salt: свойства покупателя
+# (город, пол, год рождения) вычисляются в любом блоке без общего состояния
+def _uniform(value, salt):
+    x = (value * 0x9E3779B1 + salt * 0x85EBCA6B) & 0xFFFFFFFF
+    x ^= x >> 16
+    x = (x * 0x45D9F3B) & 0xFFFFFFFF
+    x ^= x >> 16
+    x = (x * 0x45D9F3B) & 0xFFFFFFFF
+    x ^= x >> 16
+    return x / 2 ** 32
+
+
+def _rng(seed, name, chunk=0):
+    return random.Random(f"{seed}:{name}:{chunk}")
+
+
+def _pick(cum_weights, value):
+    return min(bisect_right(cum_weights, value * cum_weights[-1]), len(cum_weights) - 1)
+
+
+def _money(value):
+    return f"{value:.2f}"
+
+
+def _copy_rows(cur, table, rows):
+    buffer = io.StringIO()
+    for row in rows:
+        buffer.write("\t".join("\\N" if value is None else str(value) for value in row))
+        buffer.write("\n")
+    buffer.seek(0)
+    columns = ", ".join(f'"{name}"' for name, _ in TABLE_COLUMNS[table])
+    cur.copy_expert(f'COPY public."{table}" ({columns}) FROM STDIN', buffer)
+
+
+def holiday_factor(day):
+    factor = 1.0
+    for (month, first, last), value in HOLIDAYS.items():
+        if day.month == month and first <= day.day <= last:
+            factor = max(factor, value) if value > 1 else min(factor, value)
+    return factor
+
+
+# Объемы и справочники, одинаково построенные в основном и в рабочих процессах
+class World:
+    def __init__(self, seed, scale, date_from, date_to):
+        self.seed = seed
+        self.date_from = date_from
+        self.date_to = date_to
+        self.orders = max(1, round(ORDERS_PER_SCALE * scale))
+        self.customers = max(100, round(CUSTOMERS_PER_SCALE * scale))
+        self.goods_count = max(100, round(GOODS_PER_SCALE * math.sqrt(scale)))
+        self.stores_count = max(5, round(STORES_PER_SCALE * math.sqrt(scale)))
+        self.suppliers_count = max(5, round(SUPPLIERS_PER_SCALE * math.sqrt(scale)))
+        self.registration_start = date_from - timedelta(days=365 * REGISTRATION_YEARS)
+        self.registration_span = (date_to - self.registration_start).days + 1
+        self.birthday_offset = seed % 365
+        self.birthday_inverse = pow(BIRTHDAY_STEP, -1, 365)
+        self.city_cum = list(accumulate(CITY_WEIGHTS))
+        self._build_days()
+        self._build_catalog()
+        self._build_stores()
+
+    # Заказов в каждый день: веса дней, округленные так, что сумма равна self.orders
+    def _build_days(self):
+        days = (self.date_to - self.date_from).days + 1
+        self.days = [self.date_from + timedelta(days=i) for i in range(days)]
+        weights = []
+        for i, day in enumerate(self.days):
+            growth = (1 + YEARLY_GROWTH) ** (i / 365)
+            weights.append(growth * WEEKDAY_FACTORS[day.weekday()] * MONTH_FACTORS[day.month - 1]
+                           * holiday_factor(day))
+        total = sum(weights)
+        ends, running = [], 0.0
+        for weight in weights:
+            running += weight
+            ends.append(round(self.orders * running / total))
+        # OrderID заказов дня i — от day_ends[i - 1] + 1 до day_ends[i]
+        self.day_ends = ends
+
+    def _build_catalog(self):
+        rng = _rng(self.seed, "catalog")
+        category_cum = list(accumulate(share for *_, share in CATEGORIES))
+        country_cum = list(accumulate(weight for _, weight in COUNTRIES))
+        discount_cum = list(accumulate(weight for _, weight in DISCOUNTS))
+        brands_per_category = max(5, self.goods_count // len(CATEGORIES) // 12)
+        brands = [[self._brand_name(rng) for _ in range(brands_per_category)] for _ in CATEGORIES]
+        brand_cum = list(accumulate(1 / (rank + 1) for rank in range(brands_per_category)))
+
+        self.goods = []
+        for good_id in range(1, self.goods_count + 1):
+            category = _pick(category_cum, rng.random())
+            name, low, high, type_good, storage, gift, _ = CATEGORIES[category]
+            brand = brands[category][_pick(brand_cum, rng.random())]
+            price = round(math.exp(rng.uniform(math.log(low), math.log(high))), 2)
+            discount = _pick(discount_cum, rng.random())
+            self.goods.append({
+                "id": good_id,
+                "name": f"{name} {brand} №{good_id}",
+                "brand": brand,
+                "type": type_good,
+                "category": category,
+                "country": _pick(country_cum, rng.random()),
+                "price": price,
+                "discount": discount,
+                "storage_life": rng.randint(*storage),
+                "gift": gift,
+                "supplier": rng.randint(1, self.suppliers_count),
+            })
+        # Популярность товаров по закону Ципфа, ранги перемешаны относительно GoodID
+        ranks = list(range(1, self.goods_count + 1))
+        rng.shuffle(ranks)
+        for good, rank in zip(self.goods, ranks):
+            good["popularity"] = 1 / rank ** 0.9
+        self.goods_cum = list(accumulate(good["popularity"] for good in self.goods))
+        self.gift_goods_cum = list(accumulate(
+            good["popularity"] * (GIFT_BOOST if good["gift"] else 1) for good in self.goods))
+
+    # Первые магазины — по одному на город, остальные распределены по весу городов.
+    # Каждый сотрудник оформляет продажи одного магазина: RealizationID = StaffID
+    def _build_stores(self):
+        rng = _rng(self.seed, "stores")
+        self.stores, self.staff = [], []
+        for store_id in range(1, self.stores_count + 1):
+            if store_id <= len(CITIES):
+                city = store_id - 1
+            else:
+                city = _pick(self.city_cum, rng.random())
+            store = {
+                "id": store_id,
+                "city": city,
+                "street": rng.choice(STREETS),
+                "building": str(rng.randint(1, 150)),
+                "rent": round(rng.uniform(150_000, 600_000) * (1.8 if city < 2 else 1.0), -3),
+                "popularity": rng.lognormvariate(0, 0.6),
+                "staff": [],
+            }
+            for _ in range(rng.randint(3, 8)):
+                staff_id = len(self.staff) + 1
+                self.staff.append({
+                    "id": staff_id,
+                    "store": store_id,
+                    "last_name": rng.choice(LAST_NAMES),
+                    "first_name": rng.choice(FIRST_NAMES),
+                    "salary": round(rng.uniform(45_000, 120_000), -2),
+                })
+                store["staff"].append(staff_id)
+            self.stores.append(store)
+        # Магазины города покупателя; если в городе магазина нет — вся сеть
+        everywhere = self.stores
+        self.city_stores = []
+        for city in range(len(CITIES)):
+            stores = [store for store in self.stores if store["city"] == city] or everywhere
+            self.city_stores.append((stores, list(accumulate(store["popularity"] for store in stores))))
+
+    @staticmethod
+    def _brand_name(rng):
+        return "".join(rng.choice(BRAND_SYLLABLES) for _ in range(rng.randint(2, 3))).capitalize()
+
+    def customer_city(self, customer_id):
+        return _pick(self.city_cum, _uniform(customer_id, self.seed * 3 + 1))
+
+    def registration_date(self, customer_id):
+        return self.registration_start + timedelta(
+            days=(customer_id - 1) * self.registration_span // self.customers)
+
+    # Последний покупатель, зарегистрированный к дню day
+    def registered_until(self, day):
+        passed = (day - self.registration_start).days + 1
+        return max(1, min(self.customers, (passed * self.customers - 1) // self.registration_span + 1))
+
+    # День рождения: номер дня в невисокосном году — (id * BIRTHDAY_STEP + смещение) mod 365
+    def birthday(self, customer_id):
+        day_of_year = (customer_id * BIRTHDAY_STEP + self.birthday_offset) % 365
+        year = 1950 + int(_uniform(customer_id, self.seed * 3 + 2) * 57)
+        birthday = date(2001, 1, 1) + timedelta(days=day_of_year)
+        return date(year, birthday.month, birthday.day)
+
+    # Наименьший id покупателя с днем рождения в день day; остальные — через 365
+    def first_birthday_customer(self, day):
+        if day.month == 2 and day.day == 29:
+            return None
+        day_of_year = (date(2001, day.month, day.day) - date(2001, 1, 1)).days
+        first = (day_of_year - self.birthday_offset) * self.birthday_inverse % 365
+        return first or 365
+
+    def gender(self, customer_id):
+        value = _uniform(customer_id, self.seed * 3 + 3)
+        if value < 0.02:
+            return None
+        return "Женский" if value < 0.57 else "Мужской"
+
+    def order_chunks(self):
+        return (self.orders + ORDERS_PER_CHUNK - 1) // ORDERS_PER_CHUNK
+
+    def customer_chunks(self):
+        return (self.customers + CUSTOMERS_PER_CHUNK - 1) // CUSTOMERS_PER_CHUNK
+
+    def goods_chunks(self):
+        return (self.goods_count + GOODS_PER_CHUNK - 1) // GOODS_PER_CHUNK
+
+    # Небольшие справочники; загружаются основным процессом одной транзакцией
+    def dimension_rows(self):
+        goods = self.goods
+        return {
+            "Country": [(i + 1, name) for i, (name, _) in enumerate(COUNTRIES)],
+            "Category_goods": [(i + 1, category[0]) for i, category in enumerate(CATEGORIES)],
+            "Discount": [(i + 1, amount) for i, (amount, _) in enumerate(DISCOUNTS)],
+            "Payment": [(i + 1, method) for i, method in enumerate(PAYMENT_METHODS)],
+            "Price_goods": [(good["id"], _money(good["price"])) for good in goods],
+            "Goods": [(good["id"], good["name"], good["brand"], good["type"], good["category"] + 1,
+                       good["country"] + 1, good["id"], good["discount"] + 1, good["storage_life"])
+                      for good in goods],
+            "Suppliers": self._supplier_rows(),
+            "Store": [(store["id"], f"Магазин №{store['id']}", CITIES[store["city"]], store["street"],
+                       store["building"], _money(store["rent"])) for store in self.stores],
+            "Staff": [(staff["id"], staff["last_name"], staff["first_name"], _money(staff["salary"]))
+                      for staff in self.staff],
+            "Realization": [(staff["id"], staff["store"], staff["id"]) for staff in self.staff],
+        }
+
+    def _supplier_rows(self):
+        rng = _rng(self.seed, "suppliers")
+        rows = []
+        for supplier_id in range(1, self.suppliers_count + 1):
+            rows.append((supplier_id, f"ООО «{self._brand_name(rng)}»",
+                         f"+7 9{rng.randint(10, 99)} {rng.randint(100, 999)}-{rng.randint(10, 99)}-{rng.randint(10, 99)}",
+                         f"{rng.choice(LAST_NAMES)} {rng.choice(FIRST_NAMES)}"))
+        return rows
+
+    def customer_rows(self, chunk):
+        first = chunk * CUSTOMERS_PER_CHUNK + 1
+        last = min(self.customers, first + CUSTOMERS_PER_CHUNK - 1)
+        customers, addresses = [], []
+        for customer_id in range(first, last + 1):
+            customers.append((customer_id, self.gender(customer_id), self.birthday(customer_id),
+                              self.registration_date(customer_id)))
+            # У каждого покупателя один адрес доставки: AddressID = CustomerID
+            addresses.append((customer_id, CITIES[self.customer_city(customer_id)]))
+        return {"Customer": customers, "Address": addresses}
+
+    def order_rows(self, chunk):
+        rng = _rng(self.seed, "orders", chunk)
+        first = chunk * ORDERS_PER_CHUNK + 1
+        last = min(self.orders, first + ORDERS_PER_CHUNK - 1)
+        line_cum = list(accumulate(LINE_COUNT_WEIGHTS))
+        hour_cum = list(accumulate(HOUR_WEIGHTS))
+        status_cum = list(accumulate(weight for _, weight in STATUSES))
+        offline_payment_cum = list(accumulate(OFFLINE_PAYMENT_WEIGHTS))
+        online_payment_cum = list(accumulate(ONLINE_PAYMENT_WEIGHTS))
+        pending_from = self.date_to - timedelta(days=PENDING_DAYS - 1)
+        total_days = max(1, len(self.days) - 1)
+        goods = self.goods
+        orders, lines, deliveries = [], [], []
+
+        day_index = bisect_right(self.day_ends, first - 1)
+        order_id = first
+        while order_id <= last:
+            day = self.days[day_index]
+            day_last = min(last, self.day_ends[day_index])
+            holiday = holiday_factor(day) > 1
+            online_share = ONLINE_SHARE_START + (ONLINE_SHARE_END - ONLINE_SHARE_START) * day_index / total_days
+            if holiday:
+                online_share += ONLINE_HOLIDAY_BONUS
+            registered = self.registered_until(day)
+            birthday_first = self.first_birthday_customer(day)
+            goods_cum = self.gift_goods_cum if holiday else self.goods_cum
+
+            for order_id in range(order_id, day_last + 1):
+                if birthday_first is not None and birthday_first <= registered and rng.random() < BIRTHDAY_SHARE:
+                    customer = birthday_first + 365 * rng.randint(0, (registered - birthday_first) // 365)
+                else:
+                    # Давние покупатели заказывают чаще новых
+                    customer = 1 + int(registered * rng.random() ** 1.3)
+                stores, stores_cum = self.city_stores[self.customer_city(customer)]
+                store = stores[_pick(stores_cum, rng.random())]
+                realization = rng.choice(store["staff"])
+                online = rng.random() < online_share
+                delivery = 0
+                if online and rng.random() < DELIVERY_SHARE:
+                    delivery = order_id
+                    deliveries.append((order_id, customer))
+                payment = _pick(online_payment_cum if online else offline_payment_cum, rng.random()) + 1
+                if online and day >= pending_from and rng.random() < 0.5:
+                    status = PENDING_STATUS
+                else:
+                    status = STATUSES[_pick(status_cum, rng.random())][0]
+                hour = _pick(hour_cum, rng.random())
+                orders.append((order_id, f"{day} {hour:02d}:{rng.randrange(60):02d}:{rng.randrange(60):02d}",
+                               "Онлайн" if online else "Офлайн", customer, delivery, status, payment,
+                               realization))
+
+                count = _pick(line_cum, rng.random()) + 1
+                for line in range(count):
+                    good = goods[_pick(goods_cum, rng.random())]
+                    quantity = min(10, 1 + int(rng.expovariate(1.5)))
+                    total = good["price"] * quantity
+                    discounted = total * (1 - DISCOUNTS[good["discount"]][0] / 100)
+                    lines.append((order_id * MAX_ORDER_LINES + line, order_id, good["id"], quantity,
+                                  _money(total), _money(discounted)))
+            order_id = day_last + 1
+            day_index += 1
+        return {"Order": orders, "Order_goods": lines, "Delivery": deliveries}
+
+    # Поставки, остатки и оценки товаров блока
+    def goods_fact_rows(self, chunk):
+        rng = _rng(self.seed, "goods", chunk)
+        first = chunk * GOODS_PER_CHUNK
+        goods = self.goods[first:first + GOODS_PER_CHUNK]
+        top = max(good["popularity"] for good in self.goods)
+        supplies, stock, ratings = [], [], []
+        for good in goods:
+            popular = good["popularity"] / top
+            day = self.date_from - timedelta(days=rng.randint(1, 30))
+            while day <= self.date_to:
+                supplier = good["supplier"] if rng.random() < 0.85 else rng.randint(1, self.suppliers_count)
+                supplies.append((good["id"], supplier, day, _money(good["price"] * rng.uniform(0.55, 0.75))))
+                day += timedelta(days=rng.randint(14, 45))
+            for store in self.stores:
+                if rng.random() < 0.2 + 0.6 * popular ** 0.3:
+                    stock.append((store["id"], good["id"], int(rng.expovariate(1 / (20 + 200 * popular)))))
+            quality = rng.uniform(3.0, 4.8)
+            for _ in range(int(rng.expovariate(1 / (3 + 60 * popular ** 0.5)))):
+                ratings.append((good["id"], min(5, max(1, round(rng.gauss(quality, 0.9))))))
+        return {"Supply": supplies, "Store_stock": stock, "Rating_goods": ratings}
+
+
+_world = None
+_conn = None
+
+
+def _init_worker(seed, scale, date_from, date_to, db_config):
+    global _world, _conn
+    import psycopg2
+
+    _world = World(seed, scale, date_from, date_to)
+    _conn = psycopg2.connect(**db_config)
+    with _conn.cursor() as cur:
+        # Потеря последних блоков при сбое сервера не страшна: генерацию можно повторить
+        cur.execute("SET synchronous_commit = off;")
+    _conn.commit()
+
+
+# Выполняется в рабочем процессе: генерирует блок и загружает его одной транзакцией
+def _load_chunk(task):
+    kind, chunk = task
+    started = time.perf_counter()
+    if kind == "customers":
+        tables = _world.customer_rows(chunk)
+    elif kind == "orders":
+        tables = _world.order_rows(chunk)
+    else:
+        tables = _world.goods_fact_rows(chunk)
+    generated = time.perf_counter() - started
+    with _conn.cursor() as cur:
+        for table, rows in tables.items():
+            _copy_rows(cur, table, rows)
+    _conn.commit()
+    counts = {table: len(rows) for table, rows in tables.items()}
+    return kind, chunk, counts, generated, time.perf_counter() - started - generated
+
+
+def create_schema(conn):
+    with conn.cursor() as cur:
+        for table, columns in TABLE_COLUMNS.items():
+            definition = ", ".join(f'"{name}" {kind}' for name, kind in columns)
+            cur.execute(f'CREATE TABLE IF NOT EXISTS public."{table}" ({definition});')
+    conn.commit()
+
+
+# Ключи и индексы строятся после загрузки: так COPY не обновляет их на каждой строке
+def create_indexes(conn):
+    with conn.cursor() as cur:
+        for table, column in PRIMARY_KEYS.items():
+            cur.execute(f"""
+                DO $$ BEGIN
+                    ALTER TABLE public."{table}" ADD PRIMARY KEY ("{column}");
+                EXCEPTION WHEN invalid_table_definition THEN NULL;
+                END $$;
+            """)
+        for table, column in INDEXES:
+            name = f"{table}_{column}_idx".lower()
+            cur.execute(f'CREATE INDEX IF NOT EXISTS {name} ON public."{table}" ("{column}");')
+    conn.commit()
+
+
+def print_plan(world):
+    lines = world.orders * sum(n * w for n, w in enumerate(LINE_COUNT_WEIGHTS, 1)) / sum(LINE_COUNT_WEIGHTS)
+    print(f"Период {world.date_from} - {world.date_to}, дней {len(world.days)}")
+    print(f"Заказов {world.orders:,}, строк заказов ~{lines:,.0f}, покупателей {world.customers:,}")
+    print(f"Товаров {world.goods_count:,}, магазинов {world.stores_count:,}, сотрудников {len(world.staff):,}, "
+          f"поставщиков {world.suppliers_count:,}")
+    print(f"Блоков: заказы {world.order_chunks()}, покупатели {world.customer_chunks()}, "
+          f"товары {world.goods_chunks()}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Генерация синтетических данных магазина")
+    parser.add_argument("--scale", type=float, default=1.0,
+                        help="множитель объема; 1 — около 10 млн строк заказов")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--from", dest="date_from", type=date.fromisoformat, default=date(2023, 1, 1))
+    parser.add_argument("--to", dest="date_to", type=date.fromisoformat, default=date(2024, 12, 31))
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--create-schema", action="store_true",
+                        help="создать таблицы, а после загрузки — ключи и индексы")
+    parser.add_argument("--truncate", action="store_true", help="очистить таблицы перед загрузкой")
+    parser.add_argument("--dry-run", action="store_true", help="показать объемы без подключения к базе")
+    # Стенд обычно локальный и без SSL: prefer подключится и к базе с SSL, и без него
+    parser.add_argument("--sslmode", default=os.getenv("DB_SSLMODE", "prefer"))
+    args = parser.parse_args()
+    if args.date_from > args.date_to:
+        parser.error("--from позже --to")
+
+    world = World(args.seed, args.scale, args.date_from, args.date_to)
+    print_plan(world)
+    if args.dry_run:
+        return 0
+
+    import psycopg2
+
+    db_config = {
+        "dbname": os.getenv("DB_NAME"),
+        "user": os.getenv("DB_USER"),
+        "password": os.getenv("DB_PASSWORD"),
+        "host": os.getenv("DB_HOST", "localhost"),
+        "port": os.getenv("DB_PORT", "5432"),
+        "sslmode": args.sslmode,
+    }
+    conn = psycopg2.connect(**db_config)
+    started = time.perf_counter()
+    try:
+        if args.create_schema:
+            create_schema(conn)
+        with conn.cursor() as cur:
+            if args.truncate:
+                tables = ", ".join(f'public."{table}"' for table in TABLE_COLUMNS)
+                cur.execute(f"TRUNCATE {tables};")
+            else:
+                cur.execute('SELECT EXISTS (SELECT 1 FROM public."Order");')
+                if cur.fetchone()[0]:
+                    print('В таблице "Order" уже есть данные; добавьте --truncate')
+                    return 1
+            for table, rows in world.dimension_rows().items():
+                _copy_rows(cur, table, rows)
+        conn.commit()
+        print("Справочники загружены")
+
+        tasks = ([("customers", chunk) for chunk in range(world.customer_chunks())]
+                 + [("goods", chunk) for chunk in range(world.goods_chunks())]
+                 + [("orders", chunk) for chunk in range(world.order_chunks())])
+        totals = {}
+        context = multiprocessing.get_context("spawn")
+        with context.Pool(args.workers, initializer=_init_worker,
+                          initargs=(args.seed, args.scale, args.date_from, args.date_to, db_config)) as pool:
+            for done, (kind, chunk, counts, generated, copied) in enumerate(
+                    pool.imap_unordered(_load_chunk, tasks), 1):
+                for table, count in counts.items():
+                    totals[table] = totals.get(table, 0) + count
+                print(f"[{done}/{len(tasks)}] {kind} #{chunk}: "
+                      f"{', '.join(f'{table} {count:,}' for table, count in counts.items())} "
+                      f"(генерация {generated:.1f} с, COPY {copied:.1f} с)")
+
+        if args.create_schema:
+            print("Создание ключей и индексов...")
+            create_indexes(conn)
+        conn.autocommit = True
+        with conn.cursor() as cur:
+            for table in TABLE_COLUMNS:
+                cur.execute(f'ANALYZE public."{table}";')
+    finally:
+        conn.close()
+
+    for table, count in sorted(totals.items()):
+        print(f"{table:14} {count:>12,}")
+    print(f"Готово за {time.perf_counter() - started:.0f} с; пересчитайте витрины: "
+          f"python sales_cube.py refresh --full")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,50 @@
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+# Маршрутизация нажатий inline-кнопок по таблице префиксов. Вместо цепочки
+# фильтров, каждый из которых заново проверяет и разбирает callback_data,
+# строка разбирается один раз: префикс фабрики и (если задан) первый ее
+# параметр — шаг — дают ключ словаря, по которому сразу находится обработчик.
+# Обработчик получает типизированный объект callback_data.
+# Фабрика — класс aiogram CallbackData (нужны __prefix__, __separator__ и unpack)
+class CallbackRouter:
+    def __init__(self):
+        self._routes = {}
+        self._separators = set()
+
+    def route(self, factory, step=None):
+        def register(handler):
+            key = (factory.__prefix__, step)
+            if key in self._routes:
+                raise ValueError(f"Маршрут {key} уже зарегистрирован")
+            self._routes[key] = (factory, handler)
+            self._separators.add(factory.__separator__)
+            return handler
+        return register
+
+    def resolve(self, data):
+        for separator in self._separators:
+            prefix, _, rest = data.partition(separator)
+            step = rest.partition(separator)[0]
+            route = self._routes.get((prefix, step)) or self._routes.get((prefix, None))
+            if route is not None:
+                factory, handler = route
+                return handler, factory.unpack(data)
+        return None, None
+
+    # Вызывает обработчик нажатия; False — подходящего маршрута нет
+    async def dispatch(self, callback, **kwargs):
+        try:
+            handler, callback_data = self.resolve(callback.data or "")
+        except (TypeError, ValueError) as e:
+            logger.warning(f"Не удалось разобрать callback_data '{callback.data}': {str(e)}")
+            return False
+        if handler is None:
+            return False
+        await handler(callback, callback_data, **kwargs)
+        return True
+
+    def __len__(self):
+        return len(self._routes)
@@ -0,0 +1,77 @@
+# SQL-запросы графиков бота: ключ — тип графика (как в navigation.CHART_MENU и
+# chart_templates.CHART_SPECS). Модуль без зависимостей: его импортируют и бот, и бенчмарки
+# Все запросы читают предагрегированные дневные витрины (db/migrations/001_sales_cube.sql),
+# которые пересчитываются командой `python sales_cube.py refresh`
+SQL_QUERIES = {
+    "sales_dynamics": 
+        """SELECT 
+            oc.day AS "День",
+            SUM(oc.revenue) AS "Общая выручка"
+        FROM public.orders_cube_daily oc
+        WHERE oc.day BETWEEN %s AND %s
+        GROUP BY oc.day
+        ORDER BY "День" ASC;""",
+    "category_sales": 
+        """SELECT 
+            sc.category AS "Категория товара",
+            SUM(sc.revenue) AS "Выручка по категории"
+        FROM public.sales_cube_daily sc
+        WHERE sc.day BETWEEN %s AND %s
+        GROUP BY sc.category
+        ORDER BY "Выручка по категории" DESC;""",
+    "city_revenue":
+        """SELECT 
+            oc.city AS "Город",
+            SUM(oc.revenue) AS "Выручка"
+        FROM public.orders_cube_daily oc
+        WHERE oc.day BETWEEN %s AND %s
+        GROUP BY oc.city
+        ORDER BY "Выручка" DESC
+        LIMIT 19;""",
+    "payment_methods": 
+        """SELECT 
+            oc.payment_method AS "Method_payment",
+            SUM(oc.orders_with_goods) AS "Количество заказов"
+        FROM public.orders_cube_daily oc
+        WHERE oc.day BETWEEN %s AND %s AND oc.payment_method IS NOT NULL
+        GROUP BY oc.payment_method
+        HAVING SUM(oc.orders_with_goods) > 0
+        ORDER BY "Количество заказов" DESC;""",
+    "gender_stats": 
+        """SELECT 
+            oc.customer_gender AS "Пол",
+            SUM(oc.order_count) AS "Количество покупателей"
+        FROM public.orders_cube_daily oc
+        WHERE oc.day BETWEEN %s AND %s AND oc.customer_gender IS NOT NULL
+        GROUP BY oc.customer_gender
+        ORDER BY "Количество покупателей" DESC;""",
+    "top_goods": 
+        """SELECT 
+            sc.good_name AS "Название товара",
+            COALESCE(SUM(sc.quantity), 0) AS "Количество проданных единиц",
+            COALESCE(SUM(sc.revenue), 0) AS "Общая выручка"
+        FROM public.sales_cube_daily sc
+        WHERE sc.day BETWEEN %s AND %s AND sc.order_status = 'Завершен' AND sc.good_id IS NOT NULL
+        GROUP BY sc.good_name
+        ORDER BY "Количество проданных единиц" DESC, "Общая выручка" DESC
+        LIMIT 10;""",
+    "order_dynamics": 
+        """SELECT 
+            oc.day AS "День",
+            SUM(oc.order_count) AS "Количество заказов"
+        FROM public.orders_cube_daily oc
+        WHERE oc.day BETWEEN %s AND %s
+        GROUP BY oc.day
+        ORDER BY "День" ASC;""",
+    "top_brend":
+    """SELECT 
+            sc.brand AS "Бренд",
+            COALESCE(SUM(sc.quantity), 0) AS "Количество проданных единиц",
+            COALESCE(SUM(sc.revenue), 0) AS "Общая выручка"
+        FROM public.sales_cube_daily sc
+        WHERE sc.day BETWEEN %s AND %s AND sc.order_status = 'Завершен' AND sc.good_id IS NOT NULL
+        GROUP BY sc.brand
+        ORDER BY "Количество проданных единиц" DESC, "Общая выручка" DESC
+        LIMIT 15;
+    """
+}
@@ -0,0 +1,172 @@
+import logging
+from typing import NamedTuple
+
+import matplotlib.pyplot as plt
+import seaborn as sns
+from matplotlib.figure import Figure
+
+from output_profiles import encode_figure
+
+logger = logging.getLogger(__name__)
+
+
+# Описание одного типа графика для create_graph
+class ChartSpec(NamedTuple):
+    kind: str                       # "line", "bar" или "pie"
+    title: str
+    title_pad: int = 20
+    xlabel: str = ""
+    ylabel: str = ""
+    ylabel_pad: int = 15
+    figsize: tuple = (14, 8)
+    value_scale: float = 1          # делитель значений (1000 — тысячи рублей)
+    color: str = "#e95150"          # линия
+    series_label: str = ""          # легенда линии
+    grid: dict = {}                 # доп. параметры сетки линейного графика
+    bar_width: float = 0.3
+    bar_label_format: str = "{:.1f}"
+    bar_label_rotation: int = 0
+    xtick_fontsize: int = 12
+    legend_labels: tuple = ()       # фиксированная легенда круговой диаграммы
+
+
+CHART_SPECS = {
+    "sales_dynamics": ChartSpec(
+        kind="line", title="Динамика выручки", xlabel="Дата", ylabel="Выручка, тыс. ₽",
+        value_scale=1000, color="#e95150", series_label="Выручка",
+        grid={"color": "gray", "linewidth": 0.3}),
+    "order_dynamics": ChartSpec(
+        kind="line", title="Динамика заказов", xlabel="Дата", ylabel="Количество заказов",
+        color="#e95150", series_label="Количество заказов",
+        grid={"color": "gray", "linewidth": 0.5}),
+    "category_sales": ChartSpec(
+        kind="bar", title="Выручка по категориям", title_pad=30, xlabel="Категория",
+        ylabel="Выручка, тыс. ₽", value_scale=1000, bar_label_rotation=25),
+    "city_revenue": ChartSpec(
+        kind="bar", title="Выручка по городам", title_pad=35, xlabel="Город",
+        ylabel="Выручка, тыс. ₽", value_scale=1000, bar_label_rotation=25),
+    "top_goods": ChartSpec(
+        kind="bar", title="Топ-10 товаров", xlabel="Товар", ylabel="Количество проданных единиц",
+        ylabel_pad=20, figsize=(12, 13), bar_width=0.4, bar_label_format="{:.0f}", xtick_fontsize=10),
+    "top_brend": ChartSpec(
+        kind="bar", title="Топ-15 брендов", xlabel="Бренд", ylabel="Количество проданных единиц",
+        bar_width=0.4, bar_label_format="{:.0f}", xtick_fontsize=10),
+    "payment_methods": ChartSpec(
+        kind="pie", title="Методы оплаты", legend_labels=("Наличные", "Карта")),
+    "gender_stats": ChartSpec(
+        kind="pie", title="Распределение по полу", legend_labels=("Ж", "М", "Не указан")),
+}
+
+PIE_COLORS = ["#953269", "#e95150", "#f5936e"]
+
+_bar_palette = None
+
+
+def _bar_colors():
+    global _bar_palette
+    if _bar_palette is None:
+        _bar_palette = sns.color_palette("rocket", n_colors=19)
+    return _bar_palette
+
+
+# Заготовка графика: фигура, оси, подписи, сетка и легенда создаются один раз
+# на рабочий процесс, при каждом построении заменяются только элементы с данными
+class ChartTemplate:
+    def __init__(self, spec):
+        self.spec = spec
+        self.fig = Figure(figsize=spec.figsize, dpi=300)
+        self.ax = self.fig.subplots()
+        self._data_artists = []
+        self.line = None
+        ax = self.ax
+
+        if spec.kind != "pie":
+            ax.set_xlabel(spec.xlabel, labelpad=15, fontsize=14)
+            ax.set_ylabel(spec.ylabel, labelpad=spec.ylabel_pad, fontsize=14)
+        if spec.kind == "line":
+            self.line, = ax.plot([], [], color=spec.color, linewidth=2, marker='o', markersize=8,
+                                 label=spec.series_label)
+            ax.grid(True, linestyle='-', alpha=0.7, **spec.grid)
+            ax.legend(loc='upper left', frameon=True, shadow=True, fontsize=14)
+        self.title = ax.set_title("", pad=spec.title_pad, fontsize=20)
+
+        # Общие настройки
+        ax.set_facecolor('#f8f8f8')
+        self.fig.patch.set_facecolor('#ffffff')
+        ax.grid(True, linestyle='--', alpha=0.7, zorder=0)
+        ax.tick_params(axis='both', which='major', labelsize=12)
+
+    def _clear(self):
+        for artist in self._data_artists:
+            artist.remove()
+        self._data_artists = []
+
+    def _draw_line(self, data):
+        ax, spec = self.ax, self.spec
+        x = [row[0] for row in data]
+        y = [row[1] / spec.value_scale for row in data]
+        ax.xaxis.update_units(x)
+        self.line.set_data(x, y)
+        ax.relim()
+        self._data_artists.append(ax.fill_between(x, y, alpha=0.15, color=spec.color))
+        ax.autoscale_view()
+        plt.setp(ax.get_xticklabels(), rotation=45, ha='right', fontsize=12)
+
+    def _draw_bar(self, data):
+        ax, spec = self.ax, self.spec
+        labels = [row[0] for row in data]
+        y = [float(row[1]) / spec.value_scale for row in data]
+        positions = range(len(y))
+        ax.relim()
+        bars = ax.bar(positions, y, color=_bar_colors(), edgecolor='grey', linewidth=0.8,
+                      alpha=0.85, width=spec.bar_width, zorder=2)
+        self._data_artists.extend(bars)
+        ax.set_xticks(positions)
+        ax.set_xticklabels(labels, rotation=45, ha='right', fontsize=spec.xtick_fontsize)
+        offset = max(y) * 0.05
+        for bar in bars:
+            yval = bar.get_height()
+            self._data_artists.append(ax.text(
+                bar.get_x() + bar.get_width() / 2, yval + offset, spec.bar_label_format.format(yval),
+                ha='center', va='bottom', fontsize=12, fontweight='bold', rotation=spec.bar_label_rotation))
+        ax.autoscale_view()
+
+    def _draw_pie(self, data):
+        ax, spec = self.ax, self.spec
+        labels = [row[0] for row in data]
+        sizes = [row[1] for row in data]
+        wedges, texts, autotexts = ax.pie(
+            sizes, labels=labels, autopct='%1.1f%%', startangle=90, colors=PIE_COLORS, shadow=False,
+            explode=[0.05] * len(sizes), textprops={'fontsize': 16, 'color': 'white', 'fontweight': 'bold'})
+        self._data_artists.extend([*wedges, *texts, *autotexts])
+        ax.legend(labels=list(spec.legend_labels), loc='upper right', fontsize=16)
+
+    def render(self, start_date, end_date, data, profile):
+        self._clear()
+        getattr(self, f"_draw_{self.spec.kind}")(data)
+        self.title.set_text(f"{self.spec.title} ({start_date.strftime('%d.%m.%Y')} - {end_date.strftime('%d.%m.%Y')})")
+        self.fig.tight_layout()
+        return encode_figure(self.fig, profile)
+
+
+_templates = {}
+
+
+def get_template(query_name):
+    template = _templates.get(query_name)
+    if template is None:
+        template = ChartTemplate(CHART_SPECS[query_name])
+        _templates[query_name] = template
+        logger.info(f"Создана заготовка графика '{query_name}'")
+    return template
+
+
+# Возвращает (буфер, EncodeStats) в формате и разрешении профиля вывода
+def render_chart(query_name, start_date, end_date, data, profile):
+    template = get_template(query_name)
+    try:
+        return template.render(start_date, end_date, data, profile)
+    except Exception:
+        # Заготовка могла остаться в промежуточном состоянии — пересоздадим при следующем вызове
+        _templates.pop(query_name, None)
+        raise
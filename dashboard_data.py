@@ -0,0 +1,129 @@
+import json
+from datetime import date
+from decimal import Decimal
+from typing import NamedTuple
+
+# Все данные дашборда одним запросом: витрины за период читаются по одному разу
+# (CTE oc и sc используются несколько раз, поэтому PostgreSQL материализует их),
+# а каждый набор собирается в JSON-массив внутри одной строки результата.
+# Сортировки и лимиты совпадают с SQL_QUERIES для отдельных графиков.
+DASHBOARD_QUERY = """
+WITH params AS (
+    SELECT %s::date AS date_from, %s::date AS date_to
+),
+oc AS (
+    SELECT oc.*
+    FROM public.orders_cube_daily oc, params p
+    WHERE oc.day BETWEEN p.date_from AND p.date_to
+),
+sc AS (
+    SELECT sc.*
+    FROM public.sales_cube_daily sc, params p
+    WHERE sc.day BETWEEN p.date_from AND p.date_to
+),
+kpi AS (
+    SELECT
+        COALESCE(SUM(revenue) FILTER (WHERE order_status = 'Завершен'), 0) AS total_revenue,
+        COALESCE(SUM(order_count) FILTER (WHERE order_status = 'Завершен'), 0) AS order_count
+    FROM oc
+),
+days AS (
+    SELECT day, SUM(revenue) AS revenue, SUM(order_count) AS orders
+    FROM oc
+    GROUP BY day
+),
+cities AS (
+    SELECT city, SUM(revenue) AS revenue
+    FROM oc
+    GROUP BY city
+    ORDER BY revenue DESC
+    LIMIT 19
+),
+payments AS (
+    SELECT payment_method, SUM(orders_with_goods) AS orders
+    FROM oc
+    WHERE payment_method IS NOT NULL
+    GROUP BY payment_method
+    HAVING SUM(orders_with_goods) > 0
+),
+genders AS (
+    SELECT customer_gender, SUM(order_count) AS customers
+    FROM oc
+    WHERE customer_gender IS NOT NULL
+    GROUP BY customer_gender
+),
+categories AS (
+    SELECT category, SUM(revenue) AS revenue
+    FROM sc
+    GROUP BY category
+),
+goods AS (
+    SELECT good_name, COALESCE(SUM(quantity), 0) AS quantity, COALESCE(SUM(revenue), 0) AS revenue
+    FROM sc
+    WHERE order_status = 'Завершен' AND good_id IS NOT NULL
+    GROUP BY good_name
+    ORDER BY quantity DESC, revenue DESC
+    LIMIT 10
+)
+SELECT json_build_object(
+    'kpi', (SELECT json_build_array(
+                total_revenue,
+                order_count,
+                ROUND(total_revenue / NULLIF(order_count, 0), 2))
+            FROM kpi),
+    'sales_dynamics', (SELECT COALESCE(json_agg(json_build_array(day, revenue) ORDER BY day), '[]') FROM days),
+    'order_dynamics', (SELECT COALESCE(json_agg(json_build_array(day, orders) ORDER BY day), '[]') FROM days),
+    'city_revenue', (SELECT COALESCE(json_agg(json_build_array(city, revenue) ORDER BY revenue DESC), '[]') FROM cities),
+    'category_sales', (SELECT COALESCE(json_agg(json_build_array(category, revenue) ORDER BY revenue DESC), '[]') FROM categories),
+    'top_goods', (SELECT COALESCE(json_agg(json_build_array(good_name, quantity, revenue)
+                                           ORDER BY quantity DESC, revenue DESC), '[]') FROM goods),
+    'payment_methods', (SELECT COALESCE(json_agg(json_build_array(payment_method, orders) ORDER BY orders DESC), '[]') FROM payments),
+    'gender_stats', (SELECT COALESCE(json_agg(json_build_array(customer_gender, customers) ORDER BY customers DESC), '[]') FROM genders)
+)::text;
+"""
+
+
+# Набор данных для create_dashboard. Ряды — списки кортежей в том же виде,
+# что возвращают соответствующие запросы из SQL_QUERIES
+class DashboardData(NamedTuple):
+    total_revenue: Decimal
+    order_count: int
+    avg_check: Decimal
+    sales_dynamics: list
+    order_dynamics: list
+    city_revenue: list
+    category_sales: list
+    top_goods: list
+    payment_methods: list
+    gender_stats: list
+
+
+def _rows(items):
+    return [tuple(item) for item in items]
+
+
+def _dated_rows(items):
+    return [(date.fromisoformat(day), value) for day, value in items]
+
+
+def parse_dashboard_data(raw):
+    # parse_float=Decimal: суммы остаются Decimal, как при обычном запросе
+    payload = json.loads(raw, parse_float=Decimal)
+    total_revenue, order_count, avg_check = payload["kpi"]
+    return DashboardData(
+        total_revenue=total_revenue,
+        order_count=order_count,
+        avg_check=avg_check if avg_check is not None else 0,
+        sales_dynamics=_dated_rows(payload["sales_dynamics"]),
+        order_dynamics=_dated_rows(payload["order_dynamics"]),
+        city_revenue=_rows(payload["city_revenue"]),
+        category_sales=_rows(payload["category_sales"]),
+        top_goods=_rows(payload["top_goods"]),
+        payment_methods=_rows(payload["payment_methods"]),
+        gender_stats=_rows(payload["gender_stats"]),
+    )
+
+
+async def load_dashboard_data(db, start_date, end_date):
+    raw = await db.fetchval(DASHBOARD_QUERY, start_date, end_date)
+    return parse_dashboard_data(raw)
@@ -0,0 +1,4 @@
+-- Откат миграции 001_sales_cube.sql
+DROP FUNCTION IF EXISTS public.refresh_sales_cube(date, date);
+DROP TABLE IF EXISTS public.orders_cube_daily;
+DROP TABLE IF EXISTS public.sales_cube_daily;
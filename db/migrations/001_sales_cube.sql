@@ -0,0 +1,133 @@
+-- Предагрегированные дневные витрины продаж для запросов бота (SQL_QUERIES).
+--
+-- sales_cube_daily  — строки заказов, свернутые до (день, товар, категория, бренд,
+--                     город, канал, способ оплаты, статус заказа).
+-- orders_cube_daily — заказы, свернутые до (день, город, канал, способ оплаты,
+--                     статус заказа, пол покупателя). Количество заказов не аддитивно
+--                     по товарам, поэтому хранится в отдельной витрине без товарного разреза.
+--
+-- Город считается так же, как в исходном запросе city_revenue: для онлайн-заказов
+-- с доставкой — город адреса доставки, иначе — город магазина.
+
+CREATE TABLE IF NOT EXISTS public.sales_cube_daily (
+    day             date    NOT NULL,
+    good_id         integer,
+    good_name       text,
+    category        text    NOT NULL,
+    brand           text,
+    city            text    NOT NULL,
+    channel         text,
+    payment_method  text,
+    order_status    text,
+    revenue         numeric NOT NULL DEFAULT 0,
+    quantity        bigint  NOT NULL DEFAULT 0,
+    order_lines     bigint  NOT NULL DEFAULT 0
+);
+
+CREATE INDEX IF NOT EXISTS sales_cube_daily_day_idx
+    ON public.sales_cube_daily (day);
+CREATE INDEX IF NOT EXISTS sales_cube_daily_status_day_idx
+    ON public.sales_cube_daily (order_status, day);
+
+CREATE TABLE IF NOT EXISTS public.orders_cube_daily (
+    day                date    NOT NULL,
+    city               text    NOT NULL,
+    channel            text,
+    payment_method     text,
+    order_status       text,
+    -- NULL, если покупатель заказа не найден; 'Не указан', если пол не заполнен
+    customer_gender    text,
+    order_count        bigint  NOT NULL DEFAULT 0,
+    orders_with_goods  bigint  NOT NULL DEFAULT 0,
+    revenue            numeric NOT NULL DEFAULT 0
+);
+
+CREATE INDEX IF NOT EXISTS orders_cube_daily_day_idx
+    ON public.orders_cube_daily (day);
+
+-- Пересчет витрин за диапазон дней [p_from, p_to]. Выполняется в одной транзакции,
+-- поэтому читатели видят либо старые, либо новые строки за эти дни.
+CREATE OR REPLACE FUNCTION public.refresh_sales_cube(p_from date, p_to date)
+RETURNS void
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    DELETE FROM public.sales_cube_daily WHERE day BETWEEN p_from AND p_to;
+    DELETE FROM public.orders_cube_daily WHERE day BETWEEN p_from AND p_to;
+
+    INSERT INTO public.sales_cube_daily (
+        day, good_id, good_name, category, brand, city, channel, payment_method, order_status,
+        revenue, quantity, order_lines
+    )
+    SELECT
+        o."Date_order"::date,
+        g."GoodID",
+        g."Goods",
+        COALESCE(cg."Category", 'Без категории'),
+        g."Brend",
+        COALESCE(
+            CASE
+                WHEN o."Buying_method" = 'Онлайн' AND o."DeliveriID" != 0 AND d."AdressID" != 0 THEN a."City"
+                ELSE s."City"
+            END,
+            'Не указан'
+        ),
+        o."Buying_method",
+        p."Method_payment",
+        o."Order status",
+        COALESCE(SUM(og."Sum_and_discont_og"), 0),
+        COALESCE(SUM(og."Quantity_goods"), 0),
+        COUNT(*)
+    FROM public."Order" o
+    JOIN public."Order_goods" og ON og."OrderID" = o."OrderID"
+    LEFT JOIN public."Goods" g ON g."GoodID" = og."GoodID"
+    LEFT JOIN public."Category_goods" cg ON cg."Category_goodsID" = g."Category_goodsID"
+    LEFT JOIN public."Payment" p ON p."PaymentID" = o."PaymentID"
+    LEFT JOIN public."Realization" r ON r."RealizationID" = o."RealizationID"
+    LEFT JOIN public."Store" s ON s."StoreID" = r."StoreID"
+    LEFT JOIN public."Delivery" d ON d."DeliveryID" = o."DeliveriID"
+    LEFT JOIN public."Address" a ON a."AddressID" = d."AdressID"
+    WHERE o."Date_order" >= p_from AND o."Date_order" < p_to + 1
+    GROUP BY 1, 2, 3, 4, 5, 6, 7, 8, 9;
+
+    INSERT INTO public.orders_cube_daily (
+        day, city, channel, payment_method, order_status, customer_gender,
+        order_count, orders_with_goods, revenue
+    )
+    WITH order_lines AS (
+        SELECT og."OrderID",
+               COUNT(*) AS lines,
+               SUM(og."Sum_and_discont_og") AS revenue
+        FROM public."Order_goods" og
+        JOIN public."Order" o ON o."OrderID" = og."OrderID"
+        WHERE o."Date_order" >= p_from AND o."Date_order" < p_to + 1
+        GROUP BY og."OrderID"
+    )
+    SELECT
+        o."Date_order"::date,
+        COALESCE(
+            CASE
+                WHEN o."Buying_method" = 'Онлайн' AND o."DeliveriID" != 0 AND d."AdressID" != 0 THEN a."City"
+                ELSE s."City"
+            END,
+            'Не указан'
+        ),
+        o."Buying_method",
+        p."Method_payment",
+        o."Order status",
+        CASE WHEN c."CustomerID" IS NULL THEN NULL ELSE COALESCE(c."Gender", 'Не указан') END,
+        COUNT(*),
+        COUNT(*) FILTER (WHERE ol.lines > 0),
+        COALESCE(SUM(ol.revenue), 0)
+    FROM public."Order" o
+    LEFT JOIN order_lines ol ON ol."OrderID" = o."OrderID"
+    LEFT JOIN public."Payment" p ON p."PaymentID" = o."PaymentID"
+    LEFT JOIN public."Customer" c ON c."CustomerID" = o."CustomerID"
+    LEFT JOIN public."Realization" r ON r."RealizationID" = o."RealizationID"
+    LEFT JOIN public."Store" s ON s."StoreID" = r."StoreID"
+    LEFT JOIN public."Delivery" d ON d."DeliveryID" = o."DeliveriID"
+    LEFT JOIN public."Address" a ON a."AddressID" = d."AdressID"
+    WHERE o."Date_order" >= p_from AND o."Date_order" < p_to + 1
+    GROUP BY 1, 2, 3, 4, 5, 6;
+END;
+$$;
@@ -0,0 +1,124 @@
+import logging
+import os
+import threading
+import time
+
+from flask import g
+from psycopg2.pool import ThreadedConnectionPool
+
+logger = logging.getLogger(__name__)
+
+# Границы пула соединений на один рабочий процесс веб-приложения
+DB_POOL_MIN_CONN = int(os.getenv("DB_POOL_MIN_CONN", "1"))
+DB_POOL_MAX_CONN = int(os.getenv("DB_POOL_MAX_CONN", "5"))
+# Сколько секунд запрос ждет свободное соединение, прежде чем вернуть ошибку
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "10"))
+
+
+# Ограниченный пул соединений psycopg2 с метриками использования.
+# ThreadedConnectionPool при исчерпании сразу бросает PoolError,
+# поэтому выдача соединений дополнительно ограничена семафором с ожиданием.
+class ConnectionPool:
+    def __init__(self, db_config, minconn=DB_POOL_MIN_CONN, maxconn=DB_POOL_MAX_CONN):
+        self.db_config = db_config
+        self.minconn = minconn
+        self.maxconn = max(minconn, maxconn)
+        self._pool = None
+        self._pid = None
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(self.maxconn)
+        self._metrics = {
+            "checkouts": 0,
+            "checkins": 0,
+            "discarded": 0,
+            "timeouts": 0,
+            "wait_seconds_total": 0.0,
+            "in_use": 0,
+        }
+
+    def _get_pool(self):
+        # Пул создается заново после fork: соединения нельзя делить между процессами
+        pid = os.getpid()
+        if self._pool is None or self._pid != pid:
+            with self._lock:
+                if self._pool is None or self._pid != pid:
+                    self._pool = ThreadedConnectionPool(self.minconn, self.maxconn, **self.db_config)
+                    self._pid = pid
+                    self._slots = threading.BoundedSemaphore(self.maxconn)
+                    self._metrics["in_use"] = 0
+                    logger.info(f"Создан пул соединений: min={self.minconn}, max={self.maxconn}, pid={pid}")
+        return self._pool
+
+    def getconn(self):
+        pool = self._get_pool()
+        started = time.perf_counter()
+        if not self._slots.acquire(timeout=DB_POOL_TIMEOUT):
+            with self._lock:
+                self._metrics["timeouts"] += 1
+            raise TimeoutError(f"Нет свободных соединений с базой данных за {DB_POOL_TIMEOUT} сек")
+        try:
+            conn = pool.getconn()
+            if conn.closed:
+                pool.putconn(conn, close=True)
+                conn = pool.getconn()
+            # Все запросы приложений только читают данные: autocommit не дает ошибке
+            # одного запроса сломать транзакцию для остальных в рамках страницы
+            conn.autocommit = True
+        except Exception:
+            self._slots.release()
+            raise
+        with self._lock:
+            self._metrics["checkouts"] += 1
+            self._metrics["in_use"] += 1
+            self._metrics["wait_seconds_total"] += time.perf_counter() - started
+        return conn
+
+    def putconn(self, conn, close=False):
+        close = close or bool(conn.closed)
+        try:
+            self._get_pool().putconn(conn, close=close)
+        finally:
+            self._slots.release()
+            with self._lock:
+                self._metrics["checkins"] += 1
+                self._metrics["in_use"] -= 1
+                if close:
+                    self._metrics["discarded"] += 1
+
+    def metrics(self):
+        with self._lock:
+            snapshot = dict(self._metrics)
+        snapshot["max_size"] = self.maxconn
+        snapshot["min_size"] = self.minconn
+        snapshot["available"] = self.maxconn - snapshot["in_use"]
+        return snapshot
+
+    def closeall(self):
+        if self._pool is not None and self._pid == os.getpid():
+            self._pool.closeall()
+            self._pool = None
+
+
+# Подключает пул к Flask-приложению: одно соединение на запрос,
+# возвращается в пул при завершении контекста приложения
+def init_app(app, db_config):
+    pool = ConnectionPool(db_config)
+    app.extensions["db_pool"] = pool
+
+    @app.teardown_appcontext
+    def release_db_connection(exception):
+        conn = g.pop("db_conn", None)
+        if conn is not None:
+            pool.putconn(conn)
+
+    return pool
+
+
+# Соединение текущего запроса: берется из пула при первом обращении
+# и переиспользуется всеми функциями, вызванными в этом запросе
+def get_request_connection(pool):
+    conn = g.get("db_conn")
+    if conn is None:
+        conn = pool.getconn()
+        g.db_conn = conn
+    return conn
@@ -0,0 +1,69 @@
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+
+logger = logging.getLogger(__name__)
+
+# Файл SQLite с file_id уже загруженных в Telegram графиков и документов
+FILE_REGISTRY_DB = os.getenv("FILE_REGISTRY_DB", "file_ids.db")
+
+
+def content_hash(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+# Реестр file_id по хэшу содержимого. file_id фото нельзя отправить как документ
+# и наоборот, поэтому ключ — (хэш, тип вложения)
+class FileIdRegistry:
+    def __init__(self, path=FILE_REGISTRY_DB):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS file_ids (
+                content_hash TEXT NOT NULL,
+                media TEXT NOT NULL,
+                file_id TEXT NOT NULL,
+                created_at TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP,
+                PRIMARY KEY (content_hash, media)
+            )
+        """)
+        self._conn.commit()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, digest, media):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT file_id FROM file_ids WHERE content_hash = ? AND media = ?", (digest, media)).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return row[0]
+
+    def put(self, digest, media, file_id):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO file_ids (content_hash, media, file_id) VALUES (?, ?, ?)",
+                (digest, media, file_id))
+            self._conn.commit()
+
+    def forget(self, digest, media):
+        with self._lock:
+            self._conn.execute("DELETE FROM file_ids WHERE content_hash = ? AND media = ?", (digest, media))
+            self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+# file_id из отправленного сообщения: для фото берется самый крупный размер
+def message_file_id(message, media):
+    if media == "photo":
+        return message.photo[-1].file_id if message.photo else None
+    attachment = getattr(message, media, None)
+    return attachment.file_id if attachment else None
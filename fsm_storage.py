@@ -0,0 +1,182 @@
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import BaseStorage
+
+logger = logging.getLogger(__name__)
+
+# Где хранится состояние диалогов: memory, sqlite или redis://... (нужен пакет redis)
+FSM_STORAGE = os.getenv("FSM_STORAGE", "memory")
+# Файл SQLite для FSM_STORAGE=sqlite; его могут использовать несколько процессов бота
+FSM_SQLITE_PATH = os.getenv("FSM_SQLITE_PATH", "fsm_state.db")
+# Через сколько секунд без действий состояние пользователя удаляется
+FSM_STATE_TTL = int(os.getenv("FSM_STATE_TTL", "21600"))
+# Максимум состояний в памяти; самые давние вытесняются первыми
+FSM_MEMORY_MAX_ENTRIES = int(os.getenv("FSM_MEMORY_MAX_ENTRIES", "10000"))
+# Как часто (сек) удалять истекшие состояния
+FSM_SWEEP_INTERVAL = 60
+
+
+def _storage_key(key):
+    return f"{key.bot_id}:{key.chat_id}:{key.user_id}:{key.thread_id or ''}:{key.destiny}"
+
+
+def _state_name(state):
+    return state.state if isinstance(state, State) else state
+
+
+# Компактная сериализация данных состояния: JSON без пробелов.
+# Кортежи (например, границы недель) сохраняются как списки
+def dump_data(data):
+    return json.dumps(data, ensure_ascii=False, separators=(",", ":"))
+
+
+def load_data(raw):
+    return json.loads(raw) if raw else {}
+
+
+# Хранилище в памяти процесса: данные лежат сериализованными, записи без
+# обращений дольше ttl удаляются, общее число записей ограничено
+class TTLMemoryStorage(BaseStorage):
+    def __init__(self, ttl=FSM_STATE_TTL, max_entries=FSM_MEMORY_MAX_ENTRIES):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # ключ -> [истекает, состояние, данные]
+        self._swept_at = time.monotonic()
+
+    def _sweep(self, now):
+        if now - self._swept_at < FSM_SWEEP_INTERVAL:
+            return
+        self._swept_at = now
+        # Записи упорядочены по последнему обращению, истекшие — в начале
+        while self._entries:
+            key, entry = next(iter(self._entries.items()))
+            if entry[0] > now:
+                break
+            del self._entries[key]
+
+    def _get(self, key):
+        now = time.monotonic()
+        self._sweep(now)
+        entry = self._entries.get(_storage_key(key))
+        if entry is None or entry[0] <= now:
+            return None
+        return entry
+
+    def _put(self, key, state=None, data=None):
+        now = time.monotonic()
+        name = _storage_key(key)
+        entry = self._entries.pop(name, None)
+        if entry is None or entry[0] <= now:
+            entry = [0.0, None, ""]
+        if state is not None:
+            entry[1] = state or None
+        if data is not None:
+            entry[2] = data
+        if entry[1] is None and not entry[2]:
+            return
+        entry[0] = now + self.ttl
+        self._entries[name] = entry
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    async def set_state(self, key, state=None):
+        self._put(key, state=_state_name(state) or "")
+
+    async def get_state(self, key):
+        entry = self._get(key)
+        return entry[1] if entry else None
+
+    async def set_data(self, key, data):
+        self._put(key, data=dump_data(data) if data else "")
+
+    async def get_data(self, key):
+        entry = self._get(key)
+        return load_data(entry[2]) if entry else {}
+
+    async def close(self):
+        self._entries.clear()
+
+
+# Хранилище в локальном файле SQLite: переживает перезапуск бота и доступно
+# нескольким процессам на одной машине (режим WAL)
+class SQLiteStorage(BaseStorage):
+    def __init__(self, path=FSM_SQLITE_PATH, ttl=FSM_STATE_TTL):
+        self.path = path
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=5)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS fsm_state (
+                key TEXT PRIMARY KEY,
+                state TEXT,
+                data TEXT NOT NULL DEFAULT '',
+                expires_at REAL NOT NULL
+            )
+        """)
+        self._conn.commit()
+        self._swept_at = 0.0
+
+    def _sweep(self, now):
+        if now - self._swept_at < FSM_SWEEP_INTERVAL:
+            return
+        self._swept_at = now
+        deleted = self._conn.execute("DELETE FROM fsm_state WHERE expires_at <= ?", (now,)).rowcount
+        if deleted:
+            logger.info(f"Удалено истекших состояний FSM: {deleted}")
+
+    def _get(self, key):
+        with self._lock:
+            return self._conn.execute(
+                "SELECT state, data FROM fsm_state WHERE key = ? AND expires_at > ?",
+                (_storage_key(key), time.time())).fetchone()
+
+    def _put(self, key, column, value):
+        now = time.time()
+        name = _storage_key(key)
+        with self._lock:
+            self._sweep(now)
+            self._conn.execute("DELETE FROM fsm_state WHERE key = ? AND expires_at <= ?", (name, now))
+            self._conn.execute(
+                f"INSERT INTO fsm_state (key, {column}, expires_at) VALUES (?, ?, ?) "
+                f"ON CONFLICT(key) DO UPDATE SET {column} = excluded.{column}, expires_at = excluded.expires_at",
+                (name, value, now + self.ttl))
+            self._conn.execute("DELETE FROM fsm_state WHERE key = ? AND state IS NULL AND data = ''", (name,))
+            self._conn.commit()
+
+    async def set_state(self, key, state=None):
+        self._put(key, "state", _state_name(state))
+
+    async def get_state(self, key):
+        row = self._get(key)
+        return row[0] if row else None
+
+    async def set_data(self, key, data):
+        self._put(key, "data", dump_data(data) if data else "")
+
+    async def get_data(self, key):
+        row = self._get(key)
+        return load_data(row[1]) if row else {}
+
+    async def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def create_storage(backend=FSM_STORAGE):
+    if backend == "memory":
+        return TTLMemoryStorage()
+    if backend == "sqlite":
+        return SQLiteStorage()
+    if backend.startswith(("redis://", "rediss://")):
+        from aiogram.fsm.storage.redis import RedisStorage
+        return RedisStorage.from_url(backend, state_ttl=FSM_STATE_TTL, data_ttl=FSM_STATE_TTL)
+    raise ValueError(f"Неизвестное хранилище состояния FSM_STORAGE='{backend}'")
+
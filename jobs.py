@@ -0,0 +1,212 @@
+import asyncio
+import contextvars
+import itertools
+import logging
+import os
+import time
+from collections import Counter
+
+from aiogram.exceptions import TelegramBadRequest
+
+logger = logging.getLogger(__name__)
+
+# Сколько тяжелых задач (графики, отчеты) выполняется одновременно
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "4"))
+# Сколько задач может ждать в очереди; сверх этого новые запросы отклоняются
+JOB_QUEUE_SIZE = int(os.getenv("JOB_QUEUE_SIZE", "50"))
+# Сколько задач одновременно может быть у одного пользователя (в очереди и в работе)
+JOB_USER_LIMIT = int(os.getenv("JOB_USER_LIMIT", "2"))
+# Минимальный интервал (сек) между правками сообщения о статусе
+JOB_STATUS_INTERVAL = float(os.getenv("JOB_STATUS_INTERVAL", "2"))
+
+# Классы приоритета: меньше — раньше
+PRIORITY_CHART = 0
+PRIORITY_REPORT = 1
+PRIORITY_BACKGROUND = 2
+
+# Статус задачи, которую выполняет текущий исполнитель (наследуется задачами, созданными внутри нее)
+_current_status = contextvars.ContextVar("job_status", default=None)
+
+
+# Задача не принята в очередь; текст исключения показывается пользователю
+class JobRejected(Exception):
+    pass
+
+
+# Сообщение о ходе выполнения задачи: редактируется не чаще JOB_STATUS_INTERVAL
+class JobStatus:
+    def __init__(self, bot, chat_id, message_id, title):
+        self.bot = bot
+        self.chat_id = chat_id
+        self.message_id = message_id
+        self.title = title
+        self._text = None
+        self._updated_at = 0.0
+
+    @classmethod
+    async def create(cls, bot, chat_id, title):
+        message = await bot.send_message(chat_id=chat_id, text=f"{title}: запрос принят...")
+        return cls(bot, chat_id, message.message_id, title)
+
+    async def update(self, stage, force=False):
+        text = f"{self.title}: {stage}"
+        now = time.monotonic()
+        if text == self._text or (not force and now - self._updated_at < JOB_STATUS_INTERVAL):
+            return
+        self._text = text
+        self._updated_at = now
+        try:
+            await self.bot.edit_message_text(text=text, chat_id=self.chat_id, message_id=self.message_id)
+        except TelegramBadRequest as e:
+            logger.debug(f"Не удалось обновить статус задачи: {str(e)}")
+
+    async def delete(self):
+        try:
+            await self.bot.delete_message(chat_id=self.chat_id, message_id=self.message_id)
+        except TelegramBadRequest as e:
+            logger.debug(f"Не удалось удалить статус задачи: {str(e)}")
+
+
+# Сообщает этап выполнения текущей задачи (запрос к базе, построение, ...) в ее статусе.
+# Вне задачи из очереди и для задач без статуса (фоновых) ничего не делает
+async def report_stage(stage):
+    status = _current_status.get()
+    if status is not None:
+        await status.update(stage, force=True)
+
+
+class _Job:
+    __slots__ = ("priority", "seq", "func", "user_id", "status", "future")
+
+    def __init__(self, priority, seq, func, user_id, status, future):
+        self.priority = priority
+        self.seq = seq
+        self.func = func
+        self.user_id = user_id
+        self.status = status
+        self.future = future
+
+    def __lt__(self, other):
+        return (self.priority, self.seq) < (other.priority, other.seq)
+
+
+# Очередь тяжелых задач бота: ограниченный размер, классы приоритета,
+# лимит задач на пользователя и фиксированное число исполнителей.
+# Позиция в очереди и этап выполнения показываются в сообщении о статусе
+class JobQueue:
+    def __init__(self, workers=JOB_WORKERS, max_queued=JOB_QUEUE_SIZE, user_limit=JOB_USER_LIMIT):
+        self.workers = max(1, workers)
+        self.max_queued = max_queued
+        self.user_limit = user_limit
+        self._queue = asyncio.PriorityQueue()
+        self._pending = set()
+        self._user_jobs = Counter()
+        self._seq = itertools.count()
+        self._tasks = []
+        # Фоновые обновления позиций: ссылки держим до завершения, чтобы задачи не собрал сборщик мусора
+        self._background = set()
+        self.running = 0
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+
+    def start(self):
+        for _ in range(self.workers):
+            self._tasks.append(asyncio.create_task(self._worker()))
+        logger.info(f"Очередь задач запущена: исполнителей={self.workers}, очередь={self.max_queued}, "
+                    f"задач на пользователя={self.user_limit}")
+
+    async def stop(self):
+        tasks = self._tasks + list(self._background)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._tasks = []
+        self._background.clear()
+        for job in self._pending:
+            if not job.future.done():
+                job.future.cancel()
+        self._pending.clear()
+
+    # Ждет, пока очередь опустеет и выполняющиеся задачи завершатся
+    async def drain(self, timeout):
+        deadline = time.monotonic() + timeout
+        while (self._pending or self.running) and time.monotonic() < deadline:
+            await asyncio.sleep(0.1)
+        if self._pending or self.running:
+            logger.warning(f"Очередь задач не опустела за {timeout} сек: в очереди {len(self._pending)}, "
+                           f"выполняется {self.running}")
+
+    def position(self, job):
+        return 1 + sum(1 for other in self._pending if other < job)
+
+    def queued(self):
+        return len(self._pending)
+
+    # Ставит задачу в очередь и ждет ее результата. func — корутинная функция без аргументов
+    async def submit(self, func, priority, user_id=None, status=None):
+        if user_id is not None and self._user_jobs[user_id] >= self.user_limit:
+            self.rejected += 1
+            raise JobRejected(f"у вас уже выполняется запросов: {self._user_jobs[user_id]}. "
+                              f"Дождитесь их завершения.")
+        if len(self._pending) >= self.max_queued:
+            self.rejected += 1
+            logger.warning(f"Очередь задач заполнена ({len(self._pending)}), запрос отклонен")
+            raise JobRejected("сейчас слишком много запросов. Попробуйте через минуту.")
+
+        job = _Job(priority, next(self._seq), func, user_id, status, asyncio.get_running_loop().create_future())
+        self._pending.add(job)
+        self._queue.put_nowait(job)
+        if user_id is not None:
+            self._user_jobs[user_id] += 1
+        try:
+            if status is not None:
+                await status.update(f"в очереди, позиция {self.position(job)}", force=True)
+            return await job.future
+        finally:
+            if user_id is not None:
+                self._user_jobs[user_id] -= 1
+                if self._user_jobs[user_id] <= 0:
+                    del self._user_jobs[user_id]
+
+    async def _refresh_positions(self):
+        for job in sorted(self._pending):
+            if job.status is not None:
+                await job.status.update(f"в очереди, позиция {self.position(job)}")
+
+    def _background_done(self, task):
+        self._background.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            logger.error(f"Ошибка обновления позиций в очереди: {str(task.exception())}")
+
+    async def _worker(self):
+        while True:
+            job = await self._queue.get()
+            self._pending.discard(job)
+            if job.future.done():
+                # Ожидающий обработчик уже отменен
+                continue
+            task = asyncio.create_task(self._refresh_positions())
+            self._background.add(task)
+            task.add_done_callback(self._background_done)
+            self.running += 1
+            token = _current_status.set(job.status)
+            try:
+                if job.status is not None:
+                    await job.status.update("формирование...", force=True)
+                result = await job.func()
+            except asyncio.CancelledError:
+                if not job.future.done():
+                    job.future.cancel()
+                raise
+            except Exception as e:
+                self.failed += 1
+                if not job.future.done():
+                    job.future.set_exception(e)
+            else:
+                self.completed += 1
+                if not job.future.done():
+                    job.future.set_result(result)
+            finally:
+                _current_status.reset(token)
+                self.running -= 1
@@ -0,0 +1,172 @@
+import atexit
+import logging
+import multiprocessing
+import os
+import queue
+import random
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+
+# Запись логов вынесена из потоков приложения: обработчики (цикл событий бота,
+# потоки Flask, рабочие процессы рендеринга) только кладут запись в очередь,
+# а в файл и на консоль ее пишет отдельный поток QueueListener
+
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
+LOG_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+# Ротация файла лога по размеру; LOG_MAX_BYTES=0 — без ротации
+LOG_MAX_BYTES = int(os.getenv("LOG_MAX_BYTES", str(20 * 1024 * 1024)))
+LOG_BACKUP_COUNT = int(os.getenv("LOG_BACKUP_COUNT", "5"))
+# Сколько записей может ждать записи; сверх этого записи отбрасываются, а не блокируют приложение
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+# Выборка записей уровня INFO и ниже по логгерам: "renderers=0.1,werkzeug=0.5" —
+# доля записей, которая попадает в лог. Предупреждения и ошибки пишутся всегда
+LOG_SAMPLE_RATES = os.getenv("LOG_SAMPLE_RATES", "")
+# Сколько строк набора данных показывать в записи вместо полного содержимого
+LOG_ROWS_PREVIEW = int(os.getenv("LOG_ROWS_PREVIEW", "3"))
+
+# Строковые значения, которые не маскируются
+PUBLIC_VALUES = ['Не указан', 'Без категории']
+
+_handlers = []
+_listeners = []
+_child_queue = None
+stats = {"dropped": 0, "sampled_out": 0}
+
+
+# Функция маскирует чувствительные данные
+def sanitize_log_data(data):
+    if not data:
+        return data
+    sanitized_data = []
+    for row in data:
+        sanitized_row = []
+        for item in row:
+            if isinstance(item, str) and item not in PUBLIC_VALUES:
+                sanitized_row.append("***")
+            else:
+                sanitized_row.append(item)
+        sanitized_data.append(tuple(sanitized_row))
+    return sanitized_data
+
+
+# Краткое описание набора строк для записи лога: число строк и первые
+# LOG_ROWS_PREVIEW строк после маскирования. Передается аргументом логгера
+# (logger.info("Данные: %s", RowsSummary(data))), а не внутри f-строки:
+# текст собирается только для записи, прошедшей фильтр уровня и выборку,
+# поэтому для отброшенных записей строки не перебираются и не маскируются
+class RowsSummary:
+    __slots__ = ("rows", "sanitize")
+
+    def __init__(self, rows, sanitize=sanitize_log_data):
+        self.rows = rows
+        self.sanitize = sanitize
+
+    def __str__(self):
+        if not self.rows:
+            return "строк: 0"
+        rows = list(self.rows)
+        preview = [tuple(row) for row in rows[:LOG_ROWS_PREVIEW]]
+        if self.sanitize is not None:
+            preview = self.sanitize(preview)
+        more = " ..." if len(rows) > len(preview) else ""
+        return f"строк: {len(rows)} {preview}{more}"
+
+
+def parse_sample_rates(value):
+    rates = {}
+    for item in value.split(","):
+        name, _, rate = item.partition("=")
+        if name.strip() and rate.strip():
+            rates[name.strip()] = min(1.0, max(0.0, float(rate)))
+    return rates
+
+
+# Выборка записей по имени логгера; правило для "renderers" действует и на "renderers.*"
+class SamplingFilter(logging.Filter):
+    def __init__(self, rates):
+        super().__init__()
+        self.rates = rates
+        self._resolved = {}
+
+    def _rate(self, name):
+        rate = self._resolved.get(name)
+        if rate is None:
+            rate = 1.0
+            parts = name.split(".")
+            for i in range(len(parts), 0, -1):
+                prefix = ".".join(parts[:i])
+                if prefix in self.rates:
+                    rate = self.rates[prefix]
+                    break
+            self._resolved[name] = rate
+        return rate
+
+    def filter(self, record):
+        if record.levelno > logging.INFO:
+            return True
+        rate = self._rate(record.name)
+        if rate >= 1.0 or random.random() < rate:
+            return True
+        stats["sampled_out"] += 1
+        return False
+
+
+# Постановка записи в очередь без ожидания: при переполненной очереди запись отбрасывается
+class NonBlockingQueueHandler(QueueHandler):
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            stats["dropped"] += 1
+
+
+def _install(handler, level):
+    handler.addFilter(SamplingFilter(parse_sample_rates(LOG_SAMPLE_RATES)))
+    root = logging.getLogger()
+    for old in root.handlers[:]:
+        root.removeHandler(old)
+    root.addHandler(handler)
+    root.setLevel(level)
+
+
+def _stop_listeners():
+    for listener in _listeners:
+        listener.stop()
+    _listeners.clear()
+
+
+# Настройка логирования процесса: файл filename с ротацией и консоль через очередь.
+# В рабочих процессах пула рендеринга ничего не делает: им очередь передает
+# сам пул (configure_worker), и записи пишет основной процесс
+def setup_logging(filename, level=LOG_LEVEL):
+    if multiprocessing.parent_process() is not None or _handlers:
+        return
+    formatter = logging.Formatter(LOG_FORMAT)
+    file_handler = RotatingFileHandler(filename, maxBytes=LOG_MAX_BYTES, backupCount=LOG_BACKUP_COUNT,
+                                       encoding="utf-8")
+    stream_handler = logging.StreamHandler()
+    for handler in (file_handler, stream_handler):
+        handler.setFormatter(formatter)
+        _handlers.append(handler)
+    log_queue = queue.Queue(maxsize=LOG_QUEUE_SIZE)
+    listener = QueueListener(log_queue, *_handlers, respect_handler_level=True)
+    listener.start()
+    _listeners.append(listener)
+    atexit.register(_stop_listeners)
+    _install(NonBlockingQueueHandler(log_queue), level)
+
+
+# Очередь для записей из рабочих процессов (создается один раз, пишет те же обработчики)
+def worker_log_queue(context):
+    global _child_queue
+    if _child_queue is None and _handlers:
+        _child_queue = context.Queue(maxsize=LOG_QUEUE_SIZE)
+        listener = QueueListener(_child_queue, *_handlers, respect_handler_level=True)
+        listener.start()
+        _listeners.append(listener)
+    return _child_queue
+
+
+# Выполняется в рабочем процессе: записи уходят в очередь основного процесса
+def configure_worker(log_queue, level=LOG_LEVEL):
+    if log_queue is not None:
+        _install(NonBlockingQueueHandler(log_queue), level)
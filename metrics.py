@@ -0,0 +1,240 @@
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from log_setup import stats as log_stats
+
+logger = logging.getLogger(__name__)
+
+# Метрики бота и веб-приложений в текстовом формате Prometheus.
+# Бот отдает их отдельным локальным HTTP-сервером (start_metrics_server),
+# веб-приложения — по маршруту /metrics (instrument_flask), если он включен
+
+# Адрес сервера метрик бота; METRICS_PORT=0 — сервер не запускается
+METRICS_HOST = os.getenv("METRICS_HOST", "127.0.0.1")
+METRICS_PORT = int(os.getenv("METRICS_PORT", "9101"))
+METRICS_PATH = "/metrics"
+# Маршрут /metrics веб-приложений: off — не создается, local — отвечает только на прямые
+# запросы с этой же машины (без заголовков прокси), остальным — 404
+METRICS_FLASK_ROUTE = os.getenv("METRICS_FLASK_ROUTE", "off")
+LOOPBACK_ADDRESSES = ("127.0.0.1", "::1")
+PROXY_HEADERS = ("X-Forwarded-For", "X-Real-IP", "Forwarded")
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Границы корзин гистограмм длительности, сек
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def _labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+def _number(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name, help, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(labels[name] for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            values = dict(self._values)
+        return [(self.name, self.labelnames, key, (), value) for key, value in values.items()]
+
+
+class Histogram:
+    kind = "histogram"
+
+    def __init__(self, name, help, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets)) + (float("inf"),)
+        self._values = {}  # метки -> [счетчики корзин, сумма, количество]
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(labels[name] for name in self.labelnames)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    entry[0][i] += 1
+                    break
+            entry[1] += value
+            entry[2] += 1
+
+    def samples(self):
+        with self._lock:
+            values = {key: (list(entry[0]), entry[1], entry[2]) for key, entry in self._values.items()}
+        result = []
+        for key, (counts, total, count) in values.items():
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                result.append((f"{self.name}_bucket", self.labelnames, key, (("le", _number(bound)),), cumulative))
+            result.append((f"{self.name}_sum", self.labelnames, key, (), total))
+            result.append((f"{self.name}_count", self.labelnames, key, (), count))
+        return result
+
+
+# Метрика, значение которой читается при каждом запросе /metrics из уже
+# существующих счетчиков (очередь задач, кэши, пулы). func возвращает число или
+# словарь {значение метки или кортеж значений: число}
+class Callback:
+    def __init__(self, name, kind, help, func, labelnames=()):
+        self.name = name
+        self.kind = kind
+        self.help = help
+        self.func = func
+        self.labelnames = tuple(labelnames)
+
+    def samples(self):
+        value = self.func()
+        if not isinstance(value, dict):
+            return [(self.name, (), (), (), value)]
+        return [(self.name, self.labelnames, key if isinstance(key, tuple) else (key,), (), item)
+                for key, item in value.items()]
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _add(self, metric):
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"Метрика '{metric.name}' уже зарегистрирована")
+            self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name, help, labelnames=()):
+        return self._add(Counter(name, help, labelnames))
+
+    def histogram(self, name, help, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self._add(Histogram(name, help, labelnames, buckets))
+
+    def callback(self, name, kind, help, func, labelnames=()):
+        return self._add(Callback(name, kind, help, func, labelnames))
+
+    def render(self):
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            try:
+                samples = metric.samples()
+            except Exception as e:
+                # Одна сломанная метрика не должна скрывать остальные
+                logger.warning(f"Не удалось получить метрику '{metric.name}': {str(e)}")
+                continue
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for name, labelnames, values, extra, value in samples:
+                lines.append(f"{name}{_labels(labelnames, values, extra)} {_number(value)}")
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+# Длительность этапов: stage — db, render, upload, page; name — ключ SQL_QUERIES,
+# тип графика или отчета, вид отправляемого файла, маршрут страницы
+STAGE_SECONDS = REGISTRY.histogram("app_stage_duration_seconds", "Длительность этапов обработки, сек",
+                                   ("stage", "name"))
+STAGE_ERRORS = REGISTRY.counter("app_stage_errors_total", "Ошибки этапов обработки", ("stage", "name"))
+REGISTRY.callback("app_log_records_discarded_total", "counter", "Записи лога, не попавшие в файл",
+                  lambda: {"dropped": log_stats["dropped"], "sampled_out": log_stats["sampled_out"]},
+                  ("reason",))
+
+
+# Замер этапа: with observe("db", query_name): ... Исключение внутри блока
+# учитывается как ошибка этапа и пробрасывается дальше
+@contextmanager
+def observe(stage, name):
+    started = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        STAGE_ERRORS.inc(stage=stage, name=name)
+        raise
+    finally:
+        STAGE_SECONDS.observe(time.perf_counter() - started, stage=stage, name=name)
+
+
+# Ошибка этапа, о которой сообщил результат, а не исключение (например, график не построен)
+def record_error(stage, name):
+    STAGE_ERRORS.inc(stage=stage, name=name)
+
+
+# Локальный HTTP-сервер метрик для бота (aiohttp уже есть как зависимость aiogram)
+async def start_metrics_server(host=METRICS_HOST, port=METRICS_PORT):
+    if not port:
+        return None
+    from aiohttp import web
+
+    async def handle(request):
+        return web.Response(body=REGISTRY.render().encode("utf-8"), headers={"Content-Type": CONTENT_TYPE})
+
+    app = web.Application()
+    app.router.add_get(METRICS_PATH, handle)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    logger.info(f"Метрики доступны на http://{host}:{port}{METRICS_PATH}")
+    return runner
+
+
+# Метрики Flask-приложения: длительность страниц по маршруту, ответы 5xx
+# (в том числе необработанные исключения) и маршрут /metrics (см. METRICS_FLASK_ROUTE)
+def instrument_flask(app, route_mode=METRICS_FLASK_ROUTE):
+    from flask import Response, abort, g, request
+
+    @app.before_request
+    def start_page_timer():
+        g.metrics_started = time.perf_counter()
+
+    @app.after_request
+    def observe_page(response):
+        started = g.pop("metrics_started", None)
+        if started is not None and request.url_rule is not None and request.url_rule.rule != METRICS_PATH:
+            route = request.url_rule.rule
+            STAGE_SECONDS.observe(time.perf_counter() - started, stage="page", name=route)
+            if response.status_code >= 500:
+                record_error("page", route)
+        return response
+
+    if route_mode != "local":
+        return
+
+    @app.route(METRICS_PATH)
+    def metrics():
+        # Запрос через nginx тоже приходит с 127.0.0.1, поэтому проверяются и заголовки прокси
+        if request.remote_addr not in LOOPBACK_ADDRESSES or any(request.headers.get(name) for name in PROXY_HEADERS):
+            abort(404)
+        return Response(REGISTRY.render(), headers={"Content-Type": CONTENT_TYPE})
@@ -0,0 +1,258 @@
+from datetime import date
+from functools import lru_cache
+from typing import Optional
+
+from aiogram.filters.callback_data import CallbackData
+from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
+
+from periods import month_weeks
+
+# Кнопки меню выбора периода несут все параметры выбора в callback_data
+# (не длиннее 64 байт), поэтому любое нажатие обрабатывается без состояния
+# на сервере: после перезапуска бота или на другом процессе открытое меню работает.
+# Год 0 означает текущий год на момент нажатия. Пустое строковое поле aiogram
+# распаковывает как None, поэтому необязательный вид периода объявлен как Optional
+
+
+# Возврат к списку графиков (section="graph") или отчетов (section="report")
+class MenuNav(CallbackData, prefix="menu"):
+    section: str
+
+
+# Шаги выбора графика: period — вид периода, year — страница года,
+# month — выбор месяца, week — выбор недели, build — построение
+class ChartNav(CallbackData, prefix="g"):
+    step: str
+    chart: str
+    period: Optional[str] = None
+    year: int = 0
+    month: int = 0
+    part: int = 0
+
+
+# Шаги выбора отчета; report: d — дашборд, w — еженедельный, m — ежемесячный
+class ReportNav(CallbackData, prefix="r"):
+    step: str
+    report: str
+    period: Optional[str] = None
+    year: int = 0
+    month: int = 0
+    part: int = 0
+
+
+# Включение и выключение подписки чата на рассылку (kind из SUBSCRIPTION_KINDS)
+class SubscriptionNav(CallbackData, prefix="sub"):
+    kind: str
+
+
+CHART_MENU = [
+    ("sales_dynamics", "Динамика выручки"),
+    ("category_sales", "Категории товаров"),
+    ("city_revenue", "Выручка по городам"),
+    ("payment_methods", "Методы оплаты"),
+    ("gender_stats", "Пол покупателей"),
+    ("top_goods", "Топ-10 товаров"),
+    ("order_dynamics", "Динамика заказов"),
+    ("top_brend", "Топ-15 брендов"),
+]
+
+CHART_PERIODS = [
+    ("y", "Год"),
+    ("h", "Полгода"),
+    ("q", "Кварталы"),
+    ("m", "Месяц"),
+    ("w", "Недели"),
+]
+
+CHART_YEAR_TITLES = {
+    "y": "Выберите год для графика:",
+    "h": "Выберите полугодие для графика:",
+    "q": "Выберите квартал для графика:",
+    "m": "Выберите год для месяца:",
+    "w": "Выберите год для недельного графика:",
+}
+
+REPORT_TYPES = {
+    "d": "Дашборд",
+    "w": "Еженедельный",
+    "m": "Ежемесячный",
+}
+
+# Клавиатуры зависят только от своих аргументов (тип графика или отчета, вид периода,
+# год, месяц), поэтому строятся один раз и дальше берутся из кэша: частые нажатия
+# «⬅️/➡️» и переходы по шагам не пересобирают дерево кнопок
+KEYBOARD_CACHE_SIZE = 2048
+_KEYBOARD_BUILDERS = []
+
+
+def _cached_keyboard(builder):
+    cached = lru_cache(maxsize=KEYBOARD_CACHE_SIZE)(builder)
+    _KEYBOARD_BUILDERS.append(cached)
+    return cached
+
+
+# Попадания и промахи кэша клавиатур по всем построителям
+def keyboard_cache_info():
+    hits = misses = size = 0
+    for builder in _KEYBOARD_BUILDERS:
+        info = builder.cache_info()
+        hits += info.hits
+        misses += info.misses
+        size += info.currsize
+    return {"hits": hits, "misses": misses, "size": size}
+
+
+MONTH_SHORT_NAMES = ["Янв", "Фев", "Мар", "Апр", "Май", "Июн", "Июл", "Авг", "Сен", "Окт", "Ноя", "Дек"]
+MONTH_NAMES = ["январь", "февраль", "март", "апрель", "май", "июнь",
+               "июль", "август", "сентябрь", "октябрь", "ноябрь", "декабрь"]
+MONTH_NAMES_GENITIVE = ["января", "февраля", "марта", "апреля", "мая", "июня",
+                        "июля", "августа", "сентября", "октября", "ноября", "декабря"]
+
+
+def resolve_year(year):
+    return year or date.today().year
+
+
+def _button(text, callback_data):
+    return InlineKeyboardButton(text=text, callback_data=callback_data.pack())
+
+
+def _year_row(year, page, select):
+    return [
+        _button("⬅️", page(year - 1)),
+        _button(str(year), select),
+        _button("➡️", page(year + 1)),
+    ]
+
+
+def _month_rows(make):
+    return [
+        [_button(MONTH_SHORT_NAMES[month - 1], make(month)) for month in range(row * 3 + 1, row * 3 + 4)]
+        for row in range(4)
+    ]
+
+
+def _week_rows(year, month, make):
+    return [
+        [_button(
+            f"Неделя {i+1} ({date(year, month, start).strftime('%d.%m')} - {date(year, month, end).strftime('%d.%m')})",
+            make(i))]
+        for i, (start, end) in enumerate(month_weeks(year, month))
+    ]
+
+
+# Подпись выбранного периода: «2024 год», «1-е полугодие 2024», «март 2024»...
+def period_label(period, year, month=0, part=0):
+    if period == "y":
+        return f"{year} год"
+    if period == "h":
+        return f"{part}-е полугодие {year}"
+    if period == "q":
+        return f"{part}-й квартал {year}"
+    if period == "m":
+        return f"{MONTH_NAMES[month - 1]} {year}"
+    return f"{part + 1}-ю неделю {MONTH_NAMES_GENITIVE[month - 1]} {year}"
+
+
+# Меню графиков
+
+@_cached_keyboard
+def graph_menu_keyboard():
+    return InlineKeyboardMarkup(inline_keyboard=[
+        [_button(title, ChartNav(step="period", chart=chart))] for chart, title in CHART_MENU
+    ])
+
+
+@_cached_keyboard
+def graph_period_keyboard(chart):
+    return InlineKeyboardMarkup(inline_keyboard=[
+        [_button(title, ChartNav(step="year", chart=chart, period=period))] for period, title in CHART_PERIODS
+    ] + [[_button("Назад", MenuNav(section="graph"))]])
+
+
+@_cached_keyboard
+def graph_year_keyboard(chart, period, year):
+    def page(value):
+        return ChartNav(step="year", chart=chart, period=period, year=value)
+
+    if period == "y":
+        select = ChartNav(step="build", chart=chart, period=period, year=year)
+    elif period in ("m", "w"):
+        select = ChartNav(step="month", chart=chart, period=period, year=year)
+    else:
+        select = page(year)
+    rows = [_year_row(year, page, select)]
+    if period == "h":
+        rows.append([_button(f"{half}-е полугодие", ChartNav(step="build", chart=chart, period=period,
+                                                             year=year, part=half)) for half in (1, 2)])
+    elif period == "q":
+        rows.append([_button(f"{quarter} кв", ChartNav(step="build", chart=chart, period=period,
+                                                       year=year, part=quarter)) for quarter in (1, 2, 3, 4)])
+    rows.append([_button("Назад", ChartNav(step="period", chart=chart))])
+    return InlineKeyboardMarkup(inline_keyboard=rows)
+
+
+@_cached_keyboard
+def graph_month_keyboard(chart, period, year):
+    next_step = "build" if period == "m" else "week"
+    return InlineKeyboardMarkup(inline_keyboard=_month_rows(
+        lambda month: ChartNav(step=next_step, chart=chart, period=period, year=year, month=month)
+    ) + [[_button("Назад", ChartNav(step="year", chart=chart, period=period, year=year))]])
+
+
+@_cached_keyboard
+def graph_week_keyboard(chart, year, month):
+    return InlineKeyboardMarkup(inline_keyboard=_week_rows(
+        year, month, lambda i: ChartNav(step="build", chart=chart, period="w", year=year, month=month, part=i)
+    ) + [[_button("Назад", ChartNav(step="month", chart=chart, period="w", year=year))]])
+
+
+# Меню отчетов
+
+@_cached_keyboard
+def report_menu_keyboard():
+    return InlineKeyboardMarkup(inline_keyboard=[
+        [_button(title, ReportNav(step="period" if report == "d" else "year", report=report,
+                                  period=None if report == "d" else report))]
+        for report, title in REPORT_TYPES.items()
+    ])
+
+
+@_cached_keyboard
+def dashboard_period_keyboard():
+    return InlineKeyboardMarkup(inline_keyboard=[
+        [_button("По году", ReportNav(step="year", report="d", period="y"))],
+        [_button("По месяцам", ReportNav(step="year", report="d", period="m"))],
+        [_button("Назад", MenuNav(section="report"))],
+    ])
+
+
+@_cached_keyboard
+def report_year_keyboard(report, period, year):
+    def page(value):
+        return ReportNav(step="year", report=report, period=period, year=value)
+
+    if report == "d" and period == "y":
+        select = ReportNav(step="build", report=report, period=period, year=year)
+    else:
+        select = ReportNav(step="month", report=report, period=period, year=year)
+    back = ReportNav(step="period", report=report) if report == "d" else MenuNav(section="report")
+    return InlineKeyboardMarkup(inline_keyboard=[
+        _year_row(year, page, select),
+        [_button("Назад", back)],
+    ])
+
+
+@_cached_keyboard
+def report_month_keyboard(report, period, year):
+    next_step = "week" if report == "w" else "build"
+    return InlineKeyboardMarkup(inline_keyboard=_month_rows(
+        lambda month: ReportNav(step=next_step, report=report, period=period, year=year, month=month)
+    ) + [[_button("Назад", ReportNav(step="year", report=report, period=period, year=year))]])
+
+
+@_cached_keyboard
+def report_week_keyboard(year, month):
+    return InlineKeyboardMarkup(inline_keyboard=_week_rows(
+        year, month, lambda i: ReportNav(step="build", report="w", period="w", year=year, month=month, part=i)
+    ) + [[_button("Назад", ReportNav(step="month", report="w", period="w", year=year))]])
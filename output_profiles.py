@@ -0,0 +1,89 @@
+import io
+import logging
+import os
+import threading
+import time
+from typing import NamedTuple
+
+logger = logging.getLogger(__name__)
+
+
+# Профиль вывода графика: формат файла и размер растра.
+# max_side — длинная сторона в пикселях (dpi подбирается под размер фигуры),
+# None — сохранять с фиксированным dpi (исходное разрешение)
+class OutputProfile(NamedTuple):
+    name: str
+    format: str
+    extension: str
+    max_side: int = None
+    dpi: int = 300
+    pil_kwargs: dict = {}
+
+
+# Telegram пережимает фото до 1280 px по длинной стороне, поэтому больше не рисуем
+TELEGRAM_PHOTO_SIDE = 1280
+
+OUTPUT_PROFILES = {
+    "telegram": OutputProfile("telegram", "png", "png", max_side=TELEGRAM_PHOTO_SIDE,
+                              pil_kwargs={"optimize": True}),
+    "telegram_jpeg": OutputProfile("telegram_jpeg", "jpeg", "jpg", max_side=TELEGRAM_PHOTO_SIDE,
+                                   pil_kwargs={"quality": 85, "optimize": True, "progressive": True}),
+    "webp": OutputProfile("webp", "webp", "webp", max_side=TELEGRAM_PHOTO_SIDE,
+                          pil_kwargs={"quality": 90, "method": 4}),
+    "full": OutputProfile("full", "png", "png", dpi=300),
+}
+
+# Профиль графиков, которые бот отправляет как фото
+CHART_OUTPUT_PROFILE = os.getenv("CHART_OUTPUT_PROFILE", "telegram")
+if CHART_OUTPUT_PROFILE not in OUTPUT_PROFILES:
+    logger.warning(f"Неизвестный профиль графиков '{CHART_OUTPUT_PROFILE}', используется 'telegram'")
+    CHART_OUTPUT_PROFILE = "telegram"
+
+
+# Результат кодирования: сколько заняло построение растра и кодирование, размер файла
+class EncodeStats(NamedTuple):
+    profile: str
+    seconds: float
+    size: int
+
+
+def get_profile(name):
+    return OUTPUT_PROFILES[name]
+
+
+def encode_figure(fig, profile):
+    if profile.max_side:
+        dpi = profile.max_side / max(fig.get_size_inches())
+    else:
+        dpi = profile.dpi
+    started = time.perf_counter()
+    buffer = io.BytesIO()
+    fig.savefig(buffer, format=profile.format, dpi=dpi, bbox_inches='tight',
+                pil_kwargs=dict(profile.pil_kwargs) or None)
+    seconds = time.perf_counter() - started
+    buffer.seek(0)
+    return buffer, EncodeStats(profile.name, seconds, buffer.getbuffer().nbytes)
+
+
+# Накопленная статистика по профилям. Кодирование идет в рабочих процессах,
+# поэтому статистику передают обратно и записывают в основном процессе
+_stats = {}
+_stats_lock = threading.Lock()
+
+
+def record_encode(stats):
+    with _stats_lock:
+        entry = _stats.setdefault(stats.profile, {
+            "count": 0, "seconds_total": 0.0, "bytes_total": 0, "last_seconds": 0.0, "last_bytes": 0,
+        })
+        entry["count"] += 1
+        entry["seconds_total"] += stats.seconds
+        entry["bytes_total"] += stats.size
+        entry["last_seconds"] = stats.seconds
+        entry["last_bytes"] = stats.size
+    logger.info(f"График в профиле '{stats.profile}': {stats.size} байт, кодирование {stats.seconds:.2f} сек")
+
+
+def profile_stats():
+    with _stats_lock:
+        return {name: dict(entry) for name, entry in _stats.items()}
@@ -0,0 +1,59 @@
+import calendar
+from datetime import date, timedelta
+from calendar import monthrange
+from functools import lru_cache
+
+
+# Недели месяца так, как их показывает бот: неделя начинается с понедельника
+# этого месяца и обрезается по последнему дню месяца. Возвращает ((день начала, день конца), ...).
+# Границы считаются один раз на месяц и затем берутся из кэша
+@lru_cache(maxsize=512)
+def month_weeks(year, month):
+    weeks = []
+    last_day = monthrange(year, month)[1]
+    cal = calendar.Calendar(firstweekday=0)
+    for week in cal.monthdayscalendar(year, month):
+        if week[0] != 0:
+            start_day = week[0]
+            end_day = week[6] if week[6] != 0 else last_day
+            if start_day <= last_day and end_day <= last_day:
+                weeks.append((start_day, end_day))
+    return tuple(weeks)
+
+
+# Недели (start_date, end_date), которые закончились в указанный день
+def weeks_ending_on(day):
+    return [
+        (date(day.year, day.month, start_day), date(day.year, day.month, end_day))
+        for start_day, end_day in month_weeks(day.year, day.month)
+        if end_day == day.day
+    ]
+
+
+# Месяц (start_date, end_date), если указанный день — последний день месяца
+def month_ending_on(day):
+    if day.day != monthrange(day.year, day.month)[1]:
+        return None
+    return date(day.year, day.month, 1), day
+
+
+def yesterday():
+    return date.today() - timedelta(days=1)
+
+
+# Границы периода, выбранного в меню: y — год, h — полугодие part, q — квартал part,
+# m — месяц month, w — неделя номер part (с нуля) из month_weeks(year, month)
+def period_range(period, year, month=0, part=0):
+    if period == "y":
+        return date(year, 1, 1), date(year, 12, 31)
+    if period in ("h", "q"):
+        length = 6 if period == "h" else 3
+        first_month = (part - 1) * length + 1
+        last_month = first_month + length - 1
+        return date(year, first_month, 1), date(year, last_month, monthrange(year, last_month)[1])
+    if period == "m":
+        return date(year, month, 1), date(year, month, monthrange(year, month)[1])
+    if period == "w":
+        start_day, end_day = month_weeks(year, month)[part]
+        return date(year, month, start_day), date(year, month, end_day)
+    raise ValueError(f"Неизвестный период '{period}'")
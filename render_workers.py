@@ -0,0 +1,99 @@
+import asyncio
+import importlib
+import logging
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from log_setup import configure_worker, worker_log_queue
+
+logger = logging.getLogger(__name__)
+
+# Количество рабочих процессов для построения графиков и отчетов
+RENDER_WORKERS = int(os.getenv("RENDER_WORKERS", os.cpu_count() or 2))
+# После скольких задач рабочий процесс перезапускается (защита от утечек памяти matplotlib)
+RENDER_MAX_TASKS_PER_WORKER = int(os.getenv("RENDER_MAX_TASKS_PER_WORKER", "50"))
+# Модули, которые рабочий процесс импортирует при запуске, до первой задачи
+RENDER_PRELOAD = [name for name in os.getenv("RENDER_PRELOAD", "renderers").split(",") if name]
+
+
+# Ошибка задачи, выполнявшейся в рабочем процессе рендеринга
+class RenderError(Exception):
+    pass
+
+
+# Выполняется в рабочем процессе при его запуске: записи лога направляются
+# в очередь основного процесса, затем загружаются модули из RENDER_PRELOAD
+def _init_worker(log_queue, modules):
+    configure_worker(log_queue)
+    for name in modules:
+        importlib.import_module(name)
+
+
+# Вызов функции, заданной строкой "модуль:функция". Так основной процесс
+# передает задачу, не импортируя тяжелый модуль сам
+def _call_by_name(target, *args):
+    module_name, _, func_name = target.partition(":")
+    return getattr(importlib.import_module(module_name), func_name)(*args)
+
+
+# Пул процессов, в котором выполняются тяжелые синхронные функции бота.
+# Обработчики aiogram ожидают результат через await pool.run(func, ...),
+# поэтому цикл событий не блокируется на время построения графиков.
+# func — функция или строка "модуль:функция" (модуль импортируется только в рабочих процессах)
+class RenderPool:
+    def __init__(self, max_workers=RENDER_WORKERS, max_tasks_per_worker=RENDER_MAX_TASKS_PER_WORKER,
+                 preload=RENDER_PRELOAD):
+        self.max_workers = max(1, max_workers)
+        self.max_tasks_per_worker = max_tasks_per_worker
+        self.preload = list(preload)
+        self.pending = 0
+        self._executor = None
+
+    def _get_executor(self):
+        # Пул создается лениво: в рабочих процессах этот объект тоже импортируется
+        if self._executor is None:
+            context = multiprocessing.get_context("spawn")
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                mp_context=context,
+                max_tasks_per_child=self.max_tasks_per_worker or None,
+                initializer=_init_worker,
+                initargs=(worker_log_queue(context), self.preload),
+            )
+            logger.info(f"Запущен пул рендеринга: процессов={self.max_workers}, "
+                        f"задач на процесс={self.max_tasks_per_worker}")
+        return self._executor
+
+    def _reset(self):
+        executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    async def run(self, func, *args):
+        loop = asyncio.get_running_loop()
+        if isinstance(func, str):
+            name = func
+            func, args = _call_by_name, (func, *args)
+        else:
+            name = func.__name__
+        self.pending += 1
+        try:
+            return await loop.run_in_executor(self._get_executor(), func, *args)
+        except BrokenProcessPool as e:
+            # Рабочий процесс упал (например, OOM) — пересоздаем пул для следующих задач
+            logger.error(f"Пул рендеринга поврежден при выполнении '{name}': {str(e)}")
+            self._reset()
+            raise RenderError(f"Рабочий процесс аварийно завершился при выполнении '{name}'") from e
+        except Exception as e:
+            logger.error(f"Ошибка в задаче рендеринга '{name}': {str(e)}")
+            raise RenderError(f"Ошибка при выполнении '{name}': {str(e)}") from e
+        finally:
+            self.pending -= 1
+
+    def shutdown(self, wait=True):
+        if self._executor is not None:
+            self._executor.shutdown(wait=wait, cancel_futures=not wait)
+            self._executor = None
+            logger.info("Пул рендеринга остановлен.")
@@ -0,0 +1,914 @@
+import io
+import json
+import logging
+import os
+from datetime import datetime, timedelta
+
+import matplotlib
+import matplotlib.pyplot as plt
+import seaborn as sns
+from matplotlib import font_manager
+from reportlab.lib import colors
+from reportlab.lib.colors import Color
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.ttfonts import TTFont
+from reportlab.pdfgen import canvas
+from reportlab.graphics import renderPDF
+from reportlab.graphics.shapes import Drawing, String
+from reportlab.graphics.charts.barcharts import VerticalBarChart
+from reportlab.graphics.charts.piecharts import Pie
+from reportlab.graphics.charts.lineplots import LinePlot
+from reportlab.graphics.charts.textlabels import Label
+from reportlab.graphics.widgets.markers import makeMarker
+from docx import Document
+from docx.shared import Pt, Inches, RGBColor
+from docx.enum.text import WD_PARAGRAPH_ALIGNMENT
+
+from chart_templates import render_chart
+from log_setup import RowsSummary
+from output_profiles import CHART_OUTPUT_PROFILE, get_profile
+
+# Функции построения графиков, дашборда и отчетов. Модуль тяжелый (matplotlib,
+# seaborn, reportlab, python-docx), поэтому бот его не импортирует: функции
+# вызываются в пуле рендеринга по имени ("renderers:create_graph"), и модуль
+# загружается только в рабочих процессах
+
+logger = logging.getLogger(__name__)
+
+# Файл с результатом поиска шрифта для matplotlib: перебор fontManager.ttflist
+# выполняется один раз, а рабочие процессы (в том числе перезапущенные после
+# RENDER_MAX_TASKS_PER_WORKER задач) читают готовый ответ
+FONT_CACHE_PATH = os.getenv("FONT_CACHE_PATH", "font_cache.json")
+DEJAVU_FONT_PATH = '/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf'
+PREFERRED_FONTS = ['DejaVu Sans', 'Arial', 'Times New Roman', 'Liberation Sans']
+# Логотип в шапке недельного и месячного отчетов; если файла нет, отчет строится без него
+REPORT_LOGO_PATH = os.getenv("REPORT_LOGO_PATH", "/home/appuser/telegram-bot/logo.png")
+
+
+def _discover_font():
+    available_fonts = {f.name for f in font_manager.fontManager.ttflist}
+    return next((font for font in PREFERRED_FONTS if font in available_fonts), None)
+
+
+# Выбранный шрифт из кэша; кэш действителен для той же версии matplotlib
+# и того же списка предпочтительных шрифтов
+def select_font():
+    key = {"matplotlib": matplotlib.__version__, "preferred": PREFERRED_FONTS}
+    try:
+        with open(FONT_CACHE_PATH, encoding="utf-8") as f:
+            cached = json.load(f)
+        if cached.get("key") == key:
+            return cached.get("font")
+    except (OSError, ValueError):
+        pass
+    font = _discover_font()
+    # Запись через временный файл: несколько процессов могут стартовать одновременно
+    tmp_path = f"{FONT_CACHE_PATH}.{os.getpid()}.tmp"
+    try:
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"key": key, "font": font}, f)
+        os.replace(tmp_path, FONT_CACHE_PATH)
+    except OSError as e:
+        logger.warning(f"Не удалось сохранить кэш шрифтов {FONT_CACHE_PATH}: {str(e)}")
+    return font
+
+
+# Установка стиля seaborn для красивого оформления
+sns.set_style("ticks")  # Белый фон с легкой сеткой
+plt.style.use("seaborn-v0_8")  # Современный стиль seaborn
+
+# Настройка шрифтов
+plt.rcParams['font.family'] = 'DejaVu Sans'  # Или другой шрифт из available_fonts
+plt.rcParams['font.size'] = 14  # Базовый размер шрифта
+plt.rcParams['axes.titlesize'] = 18  # Размер заголовка
+plt.rcParams['axes.labelsize'] = 14  # Размер меток осей
+plt.rcParams['xtick.labelsize'] = 12  # Размер подписей на осях
+plt.rcParams['ytick.labelsize'] = 12
+plt.rcParams['legend.fontsize'] = 12
+plt.rcParams['figure.figsize'] = [13, 7]  # Увеличенный размер графиков по умолчанию
+
+# Настройка шрифтов для matplotlib
+selected_font = select_font()
+
+if selected_font:
+    logger.info(f"Выбран шрифт для matplotlib: {selected_font}")
+    matplotlib.rcParams['font.family'] = selected_font
+else:
+    try:
+        font_manager.fontManager.addfont(DEJAVU_FONT_PATH)
+        matplotlib.rcParams['font.family'] = 'DejaVu Sans'
+        logger.info("Шрифт DejaVuSans загружен вручную.")
+    except Exception as e:
+        logger.error(f"Не удалось загрузить шрифт DejaVuSans: {str(e)}")
+        matplotlib.rcParams['font.family'] = 'sans-serif'
+
+matplotlib.rcParams['font.size'] = 12
+
+# Регистрация шрифта в reportlab
+try:
+    pdfmetrics.registerFont(TTFont('DejaVuSans', DEJAVU_FONT_PATH))
+    logger.info("Шрифт DejaVuSans зарегистрирован в reportlab.")
+except Exception as e:
+    logger.error(f"Не удалось зарегистрировать шрифт DejaVuSans в reportlab: {str(e)}")
+
+# Функция создания графика
+def create_graph(query_name, start_date, end_date, data, profile=CHART_OUTPUT_PROFILE):
+    try:
+        if not data:
+            logger.warning(f"Нет данных для графика '{query_name}' за период {start_date} - {end_date}")
+            return None, f"Нет данных для графика '{query_name}' за период {start_date} - {end_date}.", None
+        
+        logger.info("Данные для графика '%s': %s", query_name, RowsSummary(data))
+        
+        # Оформление каждого типа графика описано в chart_templates.CHART_SPECS
+        buffer, encode_stats = render_chart(query_name, start_date, end_date, data, get_profile(profile))
+        return buffer, None, encode_stats
+    except Exception as e:
+        logger.error(f"Ошибка при создании графика '{query_name}': {str(e)}")
+        return None, f"Ошибка при создании графика: {str(e)}", None
+
+# Линейный график для дашборда средствами reportlab (векторный, без PNG).
+# points — список (дата, значение), подписи дат в формате ДД.ММ
+def dashboard_line_chart(points, width, height, xlabel, ylabel):
+    drawing = Drawing(width, height)
+    if not points:
+        drawing.add(String(width/2, height/2, "Нет данных", fontName="DejaVuSans", fontSize=12, textAnchor="middle"))
+        return drawing
+    ordinals = [day.toordinal() for day, _ in points]
+    lp = LinePlot()
+    # Отступы под подписи осей
+    lp.x = 60
+    lp.y = 55
+    lp.width = width - 80
+    lp.height = height - 75
+    lp.data = [[(ordinal, value) for ordinal, (_, value) in zip(ordinals, points)]]
+    lp.lines[0].strokeColor = colors.blue
+    lp.lines[0].strokeWidth = 2
+    lp.lines[0].symbol = makeMarker('FilledCircle', size=4, fillColor=colors.blue)
+    lp.xValueAxis.valueMin = ordinals[0]
+    lp.xValueAxis.valueMax = ordinals[-1] if ordinals[-1] > ordinals[0] else ordinals[0] + 1
+    # Не больше ~20 подписей дат по оси X
+    step = max(1, len(ordinals) // 20)
+    lp.xValueAxis.valueSteps = ordinals[::step]
+    lp.xValueAxis.labelTextFormat = lambda value: datetime.fromordinal(int(value)).strftime('%d.%m')
+    lp.xValueAxis.labels.angle = 45
+    lp.xValueAxis.labels.boxAnchor = 'ne'
+    lp.xValueAxis.labels.fontName = 'DejaVuSans'
+    lp.xValueAxis.labels.fontSize = 8
+    lp.yValueAxis.labels.fontName = 'DejaVuSans'
+    lp.yValueAxis.labels.fontSize = 8
+    lp.yValueAxis.visibleGrid = True
+    lp.yValueAxis.gridStrokeColor = colors.lightgrey
+    lp.yValueAxis.gridStrokeDashArray = (3, 3)
+    lp.xValueAxis.visibleGrid = True
+    lp.xValueAxis.gridStrokeColor = colors.lightgrey
+    lp.xValueAxis.gridStrokeDashArray = (3, 3)
+    drawing.add(lp)
+    drawing.add(String(lp.x + lp.width/2, 2, xlabel, fontName="DejaVuSans", fontSize=10, textAnchor="middle"))
+    y_label = Label()
+    y_label.setOrigin(12, lp.y + lp.height/2)
+    y_label.angle = 90
+    y_label.fontName = "DejaVuSans"
+    y_label.fontSize = 10
+    y_label.setText(ylabel)
+    drawing.add(y_label)
+    return drawing
+
+def create_dashboard(start_date, end_date, dashboard_data):
+    try:
+
+        # Создаём PDF с размером страницы
+        pdf_buffer = io.BytesIO()
+        c = canvas.Canvas(pdf_buffer, pagesize=(2318, 1980))
+        width, height = 2318, 1980
+
+        # Устанавливаем фон страницы (темнее: #f5f5f5)
+        c.setFillColor(Color(0.956, 0.956, 0.956))  # f5f5f5
+        c.rect(0, 0, width, height, fill=1, stroke=0)
+
+        # --- Заголовки и метрики ---
+        c.setFont("DejaVuSans", 24)
+        c.setFillColor(Color(0, 0, 0))  # Чёрный текст
+
+        # Параметры закруглённого прямоугольника под заголовком "Дашборд"
+        c.setFillColor(Color(1, 1, 1))  # Белый фон для прямоугольника
+        #c.setStrokeColor(Color(0.5, 0.5, 0.5))  # Серая обводка
+        # Параметры прямоугольника: x, y, ширина, высота, радиус скругления
+        c.roundRect(0, height - 25 - 12 - 30, 510, 50, radius=10, stroke=1, fill=1)
+        # Текст заголовка
+        c.setFillColor(Color(0, 0, 0))  # Чёрный текст
+        c.drawString(15, height - 35 - 12, f"Дашборд ({start_date.strftime('%Y-%m-%d')} - {end_date.strftime('%Y-%m-%d')})")
+
+        # Получаем данные для метрик
+        total_revenue = dashboard_data.total_revenue
+        order_count = dashboard_data.order_count
+        avg_check = dashboard_data.avg_check
+        logger.info(f"Данные для заголовков: {total_revenue}, {order_count}, {avg_check}")
+
+        # Параметры закруглённого прямоугольника под метриками (единый для всех трёх)
+        c.setFillColor(Color(1, 1, 1))
+        #c.setStrokeColor(Color(0.5, 0.5, 0.5))
+        # Параметры прямоугольника: x, y, ширина, высота, радиус скругления
+        c.roundRect(790, height - 25 - 12 - 30, 1420, 50, radius=10, stroke=1, fill=1)
+        # Метрики
+        c.setFillColor(Color(0, 0, 0))
+        c.drawString(800, height - 35 - 12, f"Общая выручка: {total_revenue} ₽")
+        c.drawString(1300, height - 35 - 12, f"Кол-во заказов: {order_count}")
+        c.drawString(1750, height - 35 - 12, f"Средний чек: {avg_check} ₽")
+
+        # --- Панельный график (Динамика выручки) 1 график ---
+        # Параметры закруглённого прямоугольника под графиком
+        c.setFillColor(Color(1, 1, 1))
+        #c.setStrokeColor(Color(0.5, 0.5, 0.5))
+        # Параметры прямоугольника: x, y, ширина, высота, радиус скругления
+        c.roundRect(53, height - 165 - 358 - 20, 2165 + 20, 358 + 40, radius=15, stroke=1, fill=1)
+        # Заголовок
+        c.setFillColor(Color(0, 0, 0))
+        c.drawString(50, height - 119 - 12, "Динамика выручки")
+        data = dashboard_data.sales_dynamics
+        logger.info("Данные для sales_dynamics: %s", RowsSummary(data))
+        sales = [(row[0], float(row[1]) if row[1] is not None else 0) for row in data]
+        # Параметры графика: размер области (ширина, высота в пунктах) и подписи осей
+        drawing = dashboard_line_chart(sales, 2135, 366, "Дата продажи", "Выручка, ₽")
+        # Параметры вставки графика: x, y
+        renderPDF.draw(drawing, c, 77, height - 165 - 358)
+
+        # --- Панельный график (Динамика заказов) 2 график ---
+        # Параметры закруглённого прямоугольника под графиком
+        c.setFillColor(Color(1, 1, 1))
+        #c.setStrokeColor(Color(0.5, 0.5, 0.5))
+        # Параметры прямоугольника: x, y, ширина, высота, радиус скругления
+        c.roundRect(53, height - 815 - 347 - 10, 710 + 20, 510 + 40, radius=15, stroke=1, fill=1)
+        # Заголовок
+        c.setFillColor(Color(0, 0, 0))
+        c.drawString(53, height - 596 - 12, "Динамика заказов")
+        data = dashboard_data.order_dynamics
+        logger.info("Данные для order_dynamics: %s", RowsSummary(data))
+        orders = [(row[0], int(row[1]) if row[1] is not None else 0) for row in data]
+        # Параметры графика: размер области (ширина, высота в пунктах) и подписи осей
+        drawing = dashboard_line_chart(orders, 645, 517, "Дата заказа", "Количество")
+        # Параметры вставки графика: x, y
+        renderPDF.draw(drawing, c, 60, height - 650 - 517)
+
+        # --- Столбчатая диаграмма (Выручка по городам) 3 график ---
+        # Параметры закруглённого прямоугольника под графиком
+        c.setFillColor(Color(1, 1, 1))
+        #c.setStrokeColor(Color(0.5, 0.5, 0.5))
+        # Параметры прямоугольника: x, y, ширина, высота, радиус скругления
+        c.roundRect(844, height - 815 - 347 - 10, 710 + 20, 510 + 40, radius=15, stroke=1, fill=1)
+        # Заголовок
+        c.setFillColor(Color(0, 0, 0))
+        c.drawString(850, height - 596 - 12, "Выручка по городам")
+        # Параметры графика: размер области для графика (ширина, высота в пунктах)
+        drawing = Drawing(645, 347)
+        data = dashboard_data.city_revenue
+        logger.info("Данные для city_revenue: %s", RowsSummary(data))
+        if data:
+            cities = [row[0] for row in data]
+            revenue = [float(row[1]) if row[1] is not None else 0 for row in data]
+            bc = VerticalBarChart()
+            # Настройка стиля графика
+            bc.x = 0
+            bc.y = 0
+            bc.width = 645
+            bc.height = 347
+            bc.data = [revenue]
+            bc.bars[0].fillColor = Color(0.957, 0.957, 0.957)
+            bc.valueAxis.valueMin = 0
+            bc.valueAxis.valueMax = max(revenue) * 1.1 if revenue else 100
+            bc.categoryAxis.categoryNames = cities
+            bc.categoryAxis.labels.angle = 45
+            bc.categoryAxis.labels.boxAnchor = 'ne'
+            drawing.add(bc)
+        else:
+            drawing.add(String(645/2, 347/2, "Нет данных", fontName="DejaVuSans", fontSize=12, textAnchor="middle"))
+        # Параметры вставки графика: x, y
+        renderPDF.draw(drawing, c, 920, height - 700 - 347)
+
+        # --- Столбчатая диаграмма (Топ категорий) 6 график ---
+        # Параметры закруглённого прямоугольника под графиком
+        c.setFillColor(Color(1, 1, 1))
+        #c.setStrokeColor(Color(0.5, 0.5, 0.5))
+        # Параметры прямоугольника: x, y, ширина, высота, радиус скругления
+        c.roundRect(830, height - 1480 - 347 - 10, 710 + 20, 510 + 40, radius=15, stroke=1, fill=1)
+        # Заголовок
+        c.setFillColor(Color(0, 0, 0))
+        c.drawString(855, height - 1255 - 12, "Топ категорий")
+        # Параметры графика: размер области для графика (ширина, высота в пунктах)
+        drawing = Drawing(645, 347)
+        data = dashboard_data.category_sales
+        logger.info("Данные для category_sales: %s", RowsSummary(data))
+        if data:
+            categories = [row[0] for row in data]
+            revenue = [float(row[1]) if row[1] is not None else 0 for row in data]
+            bc = VerticalBarChart()
+            # Настройка стиля графика
+            bc.x = 0
+            bc.y = 0
+            bc.width = 645
+            bc.height = 347
+            bc.data = [revenue]
+            bc.bars[0].fillColor = Color(0.957, 0.957, 0.957)
+            bc.valueAxis.valueMin = 0
+            bc.valueAxis.valueMax = max(revenue) * 1.1 if revenue else 100
+            bc.categoryAxis.categoryNames = categories
+            bc.categoryAxis.labels.angle = 45
+            bc.categoryAxis.labels.boxAnchor = 'ne'
+            drawing.add(bc)
+        else:
+            drawing.add(String(645/2, 347/2, "Нет данных", fontName="DejaVuSans", fontSize=12, textAnchor="middle"))
+        # Параметры вставки графика: x, y
+        renderPDF.draw(drawing, c, 920, height - 1330 - 347)
+
+        # --- Столбчатая диаграмма (Топ товаров) 5 график ---
+        # Параметры закруглённого прямоугольника под графиком
+        c.setFillColor(Color(1, 1, 1))
+        #c.setStrokeColor(Color(0.5, 0.5, 0.5))
+        # Параметры прямоугольника: x, y, ширина, высота, радиус скругления
+        c.roundRect(53, height - 1480 - 347 - 20, 710 + 20, 510 + 40, radius=15, stroke=1, fill=1)
+        # Заголовок
+        c.setFillColor(Color(0, 0, 0))
+        c.drawString(53, height - 1250 - 12, "Топ товаров")
+        # Параметры графика: размер области для графика (ширина, высота в пунктах)
+        drawing = Drawing(645, 347)
+        data = dashboard_data.top_goods
+        logger.info("Данные для top_goods: %s", RowsSummary(data))
+        if data:
+            goods = [row[0] for row in data]
+            quantities = [int(row[1]) if row[1] is not None else 0 for row in data]
+            bc = VerticalBarChart()
+            # Настройка стиля графика
+            bc.x = 0
+            bc.y = 0
+            bc.width = 645
+            bc.height = 347
+            bc.data = [quantities]
+            bc.bars[0].fillColor = Color(0.957, 0.957, 0.957)
+            bc.valueAxis.valueMin = 0
+            bc.valueAxis.valueMax = max(quantities) * 1.1 if quantities else 100
+            bc.categoryAxis.categoryNames = goods
+            bc.categoryAxis.labels.angle = 45
+            bc.categoryAxis.labels.boxAnchor = 'ne'
+            drawing.add(bc)
+        else:
+            drawing.add(String(53, 347/2, "Нет данных", fontName="DejaVuSans", fontSize=12, textAnchor="middle"))
+        # Параметры вставки графика: x, y
+        renderPDF.draw(drawing, c, 110, height - 1330 - 347)
+
+        # --- Круговой график (Методы оплаты) 4 график ---
+        # Параметры закруглённого прямоугольника под графиком
+        c.setFillColor(Color(1, 1, 1))
+        #c.setStrokeColor(Color(0.5, 0.5, 0.5))
+        # Параметры прямоугольника: x, y, ширина, высота, радиус скругления
+        c.roundRect(1710, height - 860 - 300 - 10, 510 + 20, 510 + 40, radius=15, stroke=1, fill=1)
+        # Заголовок
+        c.setFillColor(Color(0, 0, 0))
+        c.drawString(1710, height - 596 - 12, "Методы оплаты")
+        # Параметры графика: размер области для графика (ширина, высота в пунктах)
+        drawing = Drawing(300, 300)
+        data = dashboard_data.payment_methods
+        logger.info("Данные для payment_methods: %s", RowsSummary(data))
+        if data:
+            labels = [row[0] for row in data]
+            sizes = [int(row[1]) if row[1] is not None else 0 for row in data]
+            pie = Pie()
+            # Настройка стиля графика
+            pie.x = 0
+            pie.y = 0
+            pie.width = 400
+            pie.height = 400
+            pie.data = sizes
+            pie.labels = labels
+            pie.slices.strokeColor = None
+            pie.slices[0].fillColor = Color(0.957, 0.957, 0.957)
+            pie.slices[1].fillColor = Color(0.8, 0.8, 0.8)
+            pie.slices[2].fillColor = Color(0.6, 0.6, 0.6)
+            drawing.add(pie)
+        else:
+            drawing.add(String(300/2, 300/2, "Нет данных", fontName="DejaVuSans", fontSize=12, textAnchor="middle"))
+        # Параметры вставки графика: x, y
+        renderPDF.draw(drawing, c, 1780, height - 760 - 300)
+
+        # --- Круговой график (Распределение по гендеру) 7 график ---
+        # Параметры закруглённого прямоугольника под графиком
+        c.setFillColor(Color(1, 1, 1))
+        #c.setStrokeColor(Color(0.5, 0.5, 0.5))
+        # Параметры прямоугольника: x, y, ширина, высота, радиус скругления
+        c.roundRect(1710, height - 1530 - 300 - 10, 510 + 20, 510 + 40, radius=15, stroke=1, fill=1)
+        # Заголовок
+        c.setFillColor(Color(0, 0, 0))
+        c.drawString(1710, height - 1260 - 12, "Распределение по гендеру")
+        # Параметры графика: размер области для графика (ширина, высота в пунктах)
+        drawing = Drawing(300, 300)
+        data = dashboard_data.gender_stats
+        logger.info("Данные для gender_stats: %s", RowsSummary(data))
+        if data:
+            labels = [row[0] for row in data]
+            sizes = [int(row[1]) if row[1] is not None else 0 for row in data]
+            pie = Pie()
+            # Настройка стиля графика
+            pie.x = 0
+            pie.y = 0
+            pie.width = 400
+            pie.height = 400
+            pie.data = sizes
+            pie.labels = labels
+            pie.slices.strokeColor = None
+            pie.slices[0].fillColor = Color(0.957, 0.957, 0.957)
+            pie.slices[1].fillColor = Color(0.8, 0.8, 0.8)
+            pie.slices[2].fillColor = Color(0.6, 0.6, 0.6)
+            drawing.add(pie)
+        else:
+            drawing.add(String(300/2, 300/2, "Нет данных", fontName="DejaVuSans", fontSize=12, textAnchor="middle"))
+        # Параметры вставки графика: x, y
+        renderPDF.draw(drawing, c, 1780, height - 1440 - 300)
+
+        # Сохраняем PDF
+        c.showPage()
+        c.save()
+        pdf_buffer.seek(0)
+        return pdf_buffer
+
+    except Exception as e:
+        logger.error(f"Ошибка при создании дашборда: {str(e)}")
+        return None
+    
+# Форма для недельного отчета
+def create_weekly_word_report(start_date, end_date, data):
+    doc = Document()
+    doc.styles['Normal'].font.name = 'Times New Roman'
+    doc.styles['Normal'].font.size = Pt(12)
+
+    # Table for Logo and Company Info
+    table = doc.add_table(rows=1, cols=2)
+    table.autofit = True
+
+    # Left cell: Logo
+    logo_cell = table.cell(0, 0)
+    logo_cell.width = Inches(2.0)
+    logo_paragraph = logo_cell.paragraphs[0]
+    logo_run = logo_paragraph.add_run()
+    if os.path.exists(REPORT_LOGO_PATH):
+        logo_run.add_picture(REPORT_LOGO_PATH, width=Inches(2.5))  # Увеличил размер логотипа до 1.5 дюйма
+    else:
+        logger.warning(f"Логотип для отчета не найден: {REPORT_LOGO_PATH}")
+
+    # Right cell: Company Info
+    company_cell = table.cell(0, 1)
+    company_cell.width = Inches(4.5)
+    company_info = (
+        "ООО «Пример Компании»\n"
+        "Рябиновая улица, 55с2, Москва, 121471\n"
+        "Тел: +7 (495) 123-45-67, info@primercompany.ru\n"
+        "ИНН: 1234567890, ОГРН: 1234567890123\n\n"
+        "LLC «Example Company»\n"
+        "Ryabinovaya street, 55c2, Moscow, 121471\n"
+        "Phone: +7 (495) 123-45-67, info@primercompany.ru\n"
+        "INN: 1234567890, OGRN: 1234567890123"
+    )
+    company_paragraph = company_cell.paragraphs[0]
+    company_paragraph.alignment = WD_PARAGRAPH_ALIGNMENT.RIGHT
+    company_run = company_paragraph.add_run(company_info)
+    company_run.font.name = 'Times New Roman'
+    company_run.font.size = Pt(10)
+    company_run.font.color.rgb = RGBColor(0, 0, 0)
+
+    # Add some spacing after the table
+    doc.add_paragraph()
+
+    # Title: Report Title and Period
+    title = doc.add_paragraph("ЕЖЕНЕДЕЛЬНЫЙ ОТЧЕТ ПО ПРОДАЖАМ")
+    title.alignment = WD_PARAGRAPH_ALIGNMENT.CENTER
+    title_run = title.runs[0]
+    title_run.font.name = 'Times New Roman'
+    title_run.font.size = Pt(14)
+    title_run.font.bold = True
+    title_run.font.color.rgb = RGBColor(0, 0, 0)
+
+    period = doc.add_paragraph(f"Отчетный период: {start_date.strftime('%d.%m.%Y')} - {end_date.strftime('%d.%m.%Y')}")
+    period.alignment = WD_PARAGRAPH_ALIGNMENT.CENTER
+    period_run = period.runs[0]
+    period_run.font.name = 'Times New Roman'
+    period_run.font.size = Pt(12)
+    period_run.font.color.rgb = RGBColor(0, 0, 0)
+
+    doc.add_paragraph()  # Empty line
+
+    # Section 1: Основные показатели
+    heading = doc.add_paragraph("1. Общие показатели")
+    heading.style = doc.styles['Heading 1']
+    heading.runs[0].font.name = 'Times New Roman'
+    heading.runs[0].font.color.rgb = RGBColor(0, 0, 0)
+
+    items = [
+        f"Общая выручка: {data['total_revenue']:.2f} ₽",
+        f"Количество продаж: {data['sales_count']}",
+        f"Средний чек: {data['avg_check']:.2f} ₽",
+        f"Динамика продаж: {data['sales_dynamics']:.2f}%",
+        f"Количество новых покупателей: {data['new_customers']}"
+    ]
+    for item in items:
+        p = doc.add_paragraph(item, style='List Bullet')
+        p.style.font.name = 'Times New Roman'
+        p.runs[0].font.color.rgb = RGBColor(0, 0, 0)
+        p.paragraph_format.space_after = Pt(12)
+
+    # Section 2: Анализ продаж
+    heading = doc.add_paragraph("2. Анализ продаж")
+    heading.style = doc.styles['Heading 2']
+    heading.runs[0].font.name = 'Times New Roman'
+    heading.runs[0].font.color.rgb = RGBColor(0, 0, 0)
+    top_product = data['top_products'][0] if data['top_products'] else ("Не указан", 0)
+    items = [
+        f"Лучший продаваемый товар/услуга: {top_product[0]}",
+        f"Количество проданных единиц: {top_product[1]}",
+        f"Выручка от данного товара/услуги: {data.get('top_product_revenue', top_product[1] * 1000):.2f} ₽"
+    ]
+    for item in items:
+        p = doc.add_paragraph(item, style='List Bullet')
+        p.style.font.name = 'Times New Roman'
+        p.runs[0].font.color.rgb = RGBColor(0, 0, 0)
+        p.paragraph_format.space_after = Pt(12)
+
+    # Section 3: Анализ каналов продаж
+    heading = doc.add_paragraph("3. Анализ каналов продаж")
+    heading.style = doc.styles['Heading 2']
+    heading.runs[0].font.name = 'Times New Roman'
+    heading.runs[0].font.color.rgb = RGBColor(0, 0, 0)
+
+    table = doc.add_table(rows=len(data['channels']) + 1, cols=3)
+    table.style = 'Table Grid'
+    table.autofit = True
+    table.allow_autofit = True
+    table.columns[0].width = Inches(2)
+    table.columns[1].width = Inches(1.5)
+    table.columns[2].width = Inches(1.5)
+
+    headers = ["Канал продаж", "Количество продаж", "Выручка (₽)"]
+    for i, header in enumerate(headers):
+        cell = table.cell(0, i)
+        cell.text = header
+        cell.paragraphs[0].runs[0].font.name = 'Times New Roman'
+        cell.paragraphs[0].runs[0].font.bold = True
+        cell.paragraphs[0].runs[0].font.color.rgb = RGBColor(0, 0, 0)
+        cell.paragraphs[0].alignment = WD_PARAGRAPH_ALIGNMENT.CENTER
+
+    for row_idx, (channel, sales, revenue) in enumerate(data['channels'], 1):
+        table.cell(row_idx, 0).text = channel
+        table.cell(row_idx, 1).text = str(sales)
+        table.cell(row_idx, 2).text = f"{revenue:.2f}"
+        for col_idx in range(3):
+            cell = table.cell(row_idx, col_idx)
+            cell.paragraphs[0].runs[0].font.name = 'Times New Roman'
+            cell.paragraphs[0].runs[0].font.color.rgb = RGBColor(0, 0, 0)
+            cell.paragraphs[0].alignment = WD_PARAGRAPH_ALIGNMENT.CENTER
+
+    # Section 4: Динамика продаж за неделю
+    heading = doc.add_paragraph("4. Динамика продаж за неделю")
+    heading.style = doc.styles['Heading 2']
+    heading.runs[0].font.name = 'Times New Roman'
+    heading.runs[0].font.color.rgb = RGBColor(0, 0, 0)
+
+    table = doc.add_table(rows=8, cols=5)
+    table.style = 'Table Grid'
+    table.autofit = True
+    table.allow_autofit = True
+    table.columns[0].width = Inches(2)
+    table.columns[1].width = Inches(1.5)
+    table.columns[2].width = Inches(1.5)
+    table.columns[3].width = Inches(1.5)
+    table.columns[4].width = Inches(2)
+
+    headers = ["Дата", "Выручка (₽)", "Количество продаж", "Средний чек (₽)", "Изменение vs. прошлой недели (%)"]
+    for i, header in enumerate(headers):
+        cell = table.cell(0, i)
+        cell.text = header
+        cell.paragraphs[0].runs[0].font.name = 'Times New Roman'
+        cell.paragraphs[0].runs[0].font.bold = True
+        cell.paragraphs[0].runs[0].font.color.rgb = RGBColor(0, 0, 0)
+        cell.paragraphs[0].alignment = WD_PARAGRAPH_ALIGNMENT.CENTER
+
+    daily_data = data.get('daily_data', [])
+    if not daily_data:
+        current_date = start_date
+        delta = (end_date - start_date).days + 1
+        for row_idx in range(1, min(delta + 1, 7)):
+            daily_revenue = data['total_revenue'] / delta if delta > 0 else 0
+            daily_sales = data['sales_count'] / delta if delta > 0 else 0
+            daily_avg_check = data['avg_check']
+            change = data['sales_dynamics'] / delta if delta > 0 else 0
+            table.cell(row_idx, 0).text = current_date.strftime('%d.%m.%Y')
+            table.cell(row_idx, 1).text = f"{daily_revenue:.2f}"
+            table.cell(row_idx, 2).text = f"{int(daily_sales)}"
+            table.cell(row_idx, 3).text = f"{daily_avg_check:.2f}"
+            table.cell(row_idx, 4).text = f"{change:.2f}"
+            for col_idx in range(5):
+                cell = table.cell(row_idx, col_idx)
+                cell.paragraphs[0].runs[0].font.name = 'Times New Roman'
+                cell.paragraphs[0].runs[0].font.color.rgb = RGBColor(0, 0, 0)
+                cell.paragraphs[0].alignment = WD_PARAGRAPH_ALIGNMENT.CENTER
+            current_date += timedelta(days=1)
+    else:
+        for row_idx, (date, revenue, sales, avg_check, change) in enumerate(daily_data[:6], 1):
+            table.cell(row_idx, 0).text = date.strftime('%d.%m.%Y')
+            table.cell(row_idx, 1).text = f"{revenue:.2f}"
+            table.cell(row_idx, 2).text = f"{sales}"
+            table.cell(row_idx, 3).text = f"{avg_check:.2f}"
+            table.cell(row_idx, 4).text = f"{change:.2f}"
+            for col_idx in range(5):
+                cell = table.cell(row_idx, col_idx)
+                cell.paragraphs[0].runs[0].font.name = 'Times New Roman'
+                cell.paragraphs[0].runs[0].font.color.rgb = RGBColor(0, 0, 0)
+                cell.paragraphs[0].alignment = WD_PARAGRAPH_ALIGNMENT.CENTER
+
+    total_row_idx = min((end_date - start_date).days + 1, 7)
+    table.cell(total_row_idx, 0).text = "Итого"
+    table.cell(total_row_idx, 1).text = f"{data['total_revenue']:.2f}"
+    table.cell(total_row_idx, 2).text = f"{data['sales_count']}"
+    table.cell(total_row_idx, 3).text = f"{data['avg_check']:.2f}"
+    table.cell(total_row_idx, 4).text = f"{data['sales_dynamics']:.2f}"
+    for col_idx in range(5):
+        cell = table.cell(total_row_idx, col_idx)
+        cell.paragraphs[0].runs[0].font.name = 'Times New Roman'
+        cell.paragraphs[0].runs[0].font.bold = True
+        cell.paragraphs[0].runs[0].font.color.rgb = RGBColor(0, 0, 0)
+        cell.paragraphs[0].alignment = WD_PARAGRAPH_ALIGNMENT.CENTER
+
+    # Section 5: Доставка
+    heading = doc.add_paragraph("5. Доставка")
+    heading.style = doc.styles['Heading 2']
+    heading.runs[0].font.name = 'Times New Roman'
+    heading.runs[0].font.color.rgb = RGBColor(0, 0, 0)
+
+    items = [
+        f"Количество заказов с доставкой: {data['shipped_orders']}",
+        f"Среднее время доставки: {data['avg_delivery_time']}",
+        f"Основные регионы доставки: {data['main_regions']}"
+    ]
+    for item in items:
+        p = doc.add_paragraph(item, style='List Bullet')
+        p.style.font.name = 'Times New Roman'
+        p.runs[0].font.color.rgb = RGBColor(0, 0, 0)
+        p.paragraph_format.space_after = Pt(12)
+
+    # Footer: Date and Signature
+    doc.add_paragraph()
+    date = doc.add_paragraph(f'Дата составления отчета: {datetime.now().strftime("%d.%m.%Y")}')
+    for run in date.runs:
+        run.font.name = 'Times New Roman'
+        run.font.size = Pt(12)
+        run.font.color.rgb = RGBColor(0, 0, 0)
+
+    table = doc.add_table(rows=1, cols=6)
+    table.style = 'Table Grid'
+    headers = ['Материально ответственное лицо', 'Аналитик продаж', '', 'подпись', '', 'расшифровка подписи']
+    for col_idx, header in enumerate(headers):
+        cell = table.cell(0, col_idx)
+        cell.text = header
+        for p in cell.paragraphs:
+            for run in p.runs:
+                run.font.name = 'Times New Roman'
+                run.font.size = Pt(12)
+                run.font.color.rgb = RGBColor(0, 0, 0)
+    table.cell(0, 5).text = 'А. В. Калинина'
+    for p in table.cell(0, 5).paragraphs:
+        for run in p.runs:
+            run.font.name = 'Times New Roman'
+            run.font.size = Pt(12)
+            run.font.color.rgb = RGBColor(0, 0, 0)
+
+    buffer = io.BytesIO()
+    doc.save(buffer)
+    buffer.seek(0)
+    return buffer
+
+def create_monthly_word_report(start_date, end_date, data):
+    doc = Document()
+    doc.styles['Normal'].font.name = 'Times New Roman'
+    doc.styles['Normal'].font.size = Pt(12)
+
+    # Table for Logo and Company Info
+    table = doc.add_table(rows=1, cols=2)
+    table.autofit = True
+
+    # Left cell: Logo
+    logo_cell = table.cell(0, 0)
+    logo_cell.width = Inches(2.0)
+    logo_paragraph = logo_cell.paragraphs[0]
+    logo_run = logo_paragraph.add_run()
+    if os.path.exists(REPORT_LOGO_PATH):
+        logo_run.add_picture(REPORT_LOGO_PATH, width=Inches(2.5))  # Увеличил размер логотипа до 1.5 дюйма
+    else:
+        logger.warning(f"Логотип для отчета не найден: {REPORT_LOGO_PATH}")
+
+    # Right cell: Company Info
+    company_cell = table.cell(0, 1)
+    company_cell.width = Inches(4.5)
+    company_info = (
+        "ООО «Пример Компании»\n"
+        "Рябиновая улица, 55с2, Москва, 121471\n"
+        "Тел: +7 (495) 123-45-67, info@primercompany.ru\n"
+        "ИНН: 1234567890, ОГРН: 1234567890123\n\n"
+        "LLC «Example Company»\n"
+        "Ryabinovaya street, 55c2, Moscow, 121471\n"
+        "Phone: +7 (495) 123-45-67, info@primercompany.ru\n"
+        "INN: 1234567890, OGRN: 1234567890123"
+    )
+    company_paragraph = company_cell.paragraphs[0]
+    company_paragraph.alignment = WD_PARAGRAPH_ALIGNMENT.RIGHT
+    company_run = company_paragraph.add_run(company_info)
+    company_run.font.name = 'Times New Roman'
+    company_run.font.size = Pt(10)
+    company_run.font.color.rgb = RGBColor(0, 0, 0)
+
+    # Add some spacing after the table
+    doc.add_paragraph()
+
+    # Title: Report Title and Period
+    title = doc.add_paragraph("ЕЖЕМЕСЯЧНЫЙ ОТЧЕТ ПО ПРОДАЖАМ")
+    title.alignment = WD_PARAGRAPH_ALIGNMENT.CENTER
+    title_run = title.runs[0]
+    title_run.font.name = 'Times New Roman'
+    title_run.font.size = Pt(14)
+    title_run.font.bold = True
+    title_run.font.color.rgb = RGBColor(0, 0, 0)
+
+    period = doc.add_paragraph(f"Отчетный период: {start_date.strftime('%d.%m.%Y')} - {end_date.strftime('%d.%m.%Y')}")
+    period.alignment = WD_PARAGRAPH_ALIGNMENT.CENTER
+    period_run = period.runs[0]
+    period_run.font.name = 'Times New Roman'
+    period_run.font.size = Pt(12)
+    period_run.font.color.rgb = RGBColor(0, 0, 0)
+
+    doc.add_paragraph()  # Empty line
+
+    # Section 1: Основные показатели
+    heading = doc.add_paragraph("1. Общие показатели")
+    heading.style = doc.styles['Heading 1']
+    heading.runs[0].font.name = 'Times New Roman'
+    heading.runs[0].font.color.rgb = RGBColor(0, 0, 0)
+
+    items = [
+        f"Общая выручка: {data['total_revenue']:.2f} ₽",
+        f"Количество продаж: {data['sales_count']}",
+        f"Средний чек: {data['avg_check']:.2f} ₽",
+        f"Динамика продаж: {data['sales_dynamics']:.2f}%",
+        f"Количество новых покупателей: {data['new_customers']}"
+    ]
+    for item in items:
+        p = doc.add_paragraph(item, style='List Bullet')
+        p.style.font.name = 'Times New Roman'
+        p.runs[0].font.color.rgb = RGBColor(0, 0, 0)
+        p.paragraph_format.space_after = Pt(6)
+
+    # Section 2: Анализ продаж
+    heading = doc.add_paragraph("2. Анализ продаж")
+    heading.style = doc.styles['Heading 2']
+    heading.runs[0].font.name = 'Times New Roman'
+    heading.runs[0].font.color.rgb = RGBColor(0, 0, 0)
+    top_product = data['top_products'][0] if data['top_products'] else ("Не указан", 0)
+    items = [
+        f"Лучший продаваемый товар/услуга: {top_product[0]}",
+        f"Количество проданных единиц: {top_product[1]}",
+        f"Выручка от данного товара/услуги: {data.get('top_product_revenue', top_product[1] * 1000):.2f} ₽"
+    ]
+    for item in items:
+        p = doc.add_paragraph(item, style='List Bullet')
+        p.style.font.name = 'Times New Roman'
+        p.runs[0].font.color.rgb = RGBColor(0, 0, 0)
+        p.paragraph_format.space_after = Pt(6)
+
+    # Section 3: Анализ каналов продаж
+    heading = doc.add_paragraph("3. Анализ каналов продаж")
+    heading.style = doc.styles['Heading 2']
+    heading.runs[0].font.name = 'Times New Roman'
+    heading.runs[0].font.color.rgb = RGBColor(0, 0, 0)
+
+    table = doc.add_table(rows=len(data['channels']) + 1, cols=3)
+    table.style = 'Table Grid'
+    table.autofit = True
+    table.allow_autofit = True
+    table.columns[0].width = Inches(2)
+    table.columns[1].width = Inches(1.5)
+    table.columns[2].width = Inches(1.5)
+
+    headers = ["Канал продаж", "Количество продаж", "Выручка (₽)"]
+    for i, header in enumerate(headers):
+        cell = table.cell(0, i)
+        cell.text = header
+        cell.paragraphs[0].runs[0].font.name = 'Times New Roman'
+        cell.paragraphs[0].runs[0].font.bold = True
+        cell.paragraphs[0].runs[0].font.color.rgb = RGBColor(0, 0, 0)
+        cell.paragraphs[0].alignment = WD_PARAGRAPH_ALIGNMENT.CENTER
+
+    for row_idx, (channel, sales, revenue) in enumerate(data['channels'], 1):
+        table.cell(row_idx, 0).text = channel
+        table.cell(row_idx, 1).text = str(sales)
+        table.cell(row_idx, 2).text = f"{revenue:.2f}"
+        for col_idx in range(3):
+            cell = table.cell(row_idx, col_idx)
+            cell.paragraphs[0].runs[0].font.name = 'Times New Roman'
+            cell.paragraphs[0].runs[0].font.color.rgb = RGBColor(0, 0, 0)
+            cell.paragraphs[0].alignment = WD_PARAGRAPH_ALIGNMENT.CENTER
+
+    # Section 4: Динамика продаж за месяц
+    heading = doc.add_paragraph("4. Динамика продаж за месяц")
+    heading.style = doc.styles['Heading 2']
+    heading.runs[0].font.name = 'Times New Roman'
+    heading.runs[0].font.color.rgb = RGBColor(0, 0, 0)
+
+    table = doc.add_table(rows=3, cols=5)
+    table.style = 'Table Grid'
+    table.autofit = True
+    table.allow_autofit = True
+    table.columns[0].width = Inches(2)
+    table.columns[1].width = Inches(1.5)
+    table.columns[2].width = Inches(1.5)
+    table.columns[3].width = Inches(1.5)
+    table.columns[4].width = Inches(2)
+
+    headers = ["Дата", "Выручка (₽)", "Количество продаж", "Средний чек (₽)", "Изменение vs. прошлый месяц (%)"]
+    for i, header in enumerate(headers):
+        cell = table.cell(0, i)
+        cell.text = header
+        cell.paragraphs[0].runs[0].font.name = 'Times New Roman'
+        cell.paragraphs[0].runs[0].font.bold = True
+        cell.paragraphs[0].runs[0].font.color.rgb = RGBColor(0, 0, 0)
+        cell.paragraphs[0].alignment = WD_PARAGRAPH_ALIGNMENT.CENTER
+
+    monthly_data = data.get('monthly_data', [])
+    if not monthly_data:
+        prev_date = start_date - timedelta(days=30)
+        table.cell(1, 0).text = f"Прошлый месяц {prev_date.strftime('%d.%m.%Y')}"
+        table.cell(1, 1).text = f"{data['total_revenue'] * 0.9:.2f}"
+        table.cell(1, 2).text = f"{int(data['sales_count'] * 0.9)}"
+        table.cell(1, 3).text = f"{data['avg_check'] * 0.9:.2f}"
+        table.cell(1, 4).text = "0.00"
+        table.cell(2, 0).text = f"Нынешний месяц {start_date.strftime('%d.%m.%Y')}"
+        table.cell(2, 1).text = f"{data['total_revenue']:.2f}"
+        table.cell(2, 2).text = f"{data['sales_count']}"
+        table.cell(2, 3).text = f"{data['avg_check']:.2f}"
+        table.cell(2, 4).text = f"{data['sales_dynamics']:.2f}"
+    else:
+        for row_idx, (date, revenue, sales, avg_check, change) in enumerate(monthly_data[:2], 1):
+            table.cell(row_idx, 0).text = date.strftime('%d.%m.%Y')
+            table.cell(row_idx, 1).text = f"{revenue:.2f}"
+            table.cell(row_idx, 2).text = f"{sales}"
+            table.cell(row_idx, 3).text = f"{avg_check:.2f}"
+            table.cell(row_idx, 4).text = f"{change:.2f}"
+
+    for row_idx in range(1, 3):
+        for col_idx in range(5):
+            cell = table.cell(row_idx, col_idx)
+            cell.paragraphs[0].runs[0].font.name = 'Times New Roman'
+            cell.paragraphs[0].runs[0].font.color.rgb = RGBColor(0, 0, 0)
+            cell.paragraphs[0].alignment = WD_PARAGRAPH_ALIGNMENT.CENTER
+
+    # Section 5: Доставка
+    heading = doc.add_paragraph("5. Доставка")
+    heading.style = doc.styles['Heading 2']
+    heading.runs[0].font.name = 'Times New Roman'
+    heading.runs[0].font.color.rgb = RGBColor(0, 0, 0)
+
+    items = [
+        f"Количество заказов с доставкой: {data['shipped_orders']}",
+        f"Среднее время доставки: {data['avg_delivery_time']}",
+        f"Основные регионы доставки: {data['main_regions']}"
+    ]
+    for item in items:
+        p = doc.add_paragraph(item, style='List Bullet')
+        p.style.font.name = 'Times New Roman'
+        p.runs[0].font.color.rgb = RGBColor(0, 0, 0)
+        p.paragraph_format.space_after = Pt(6)
+
+    # Footer: Date and Signature
+    doc.add_paragraph()
+    date = doc.add_paragraph(f'Дата составления отчета: {datetime.now().strftime("%d.%m.%Y")}')
+    for run in date.runs:
+        run.font.name = 'Times New Roman'
+        run.font.size = Pt(12)
+        run.font.color.rgb = RGBColor(0, 0, 0)
+
+    table = doc.add_table(rows=1, cols=6)
+    table.style = 'Table Grid'
+    headers = ['Материально ответственное лицо', 'Аналитик продаж', '', '', '', 'расшифровка подписи']
+    for col_idx, header in enumerate(headers):
+        cell = table.cell(0, col_idx)
+        cell.text = header
+        for p in cell.paragraphs:
+            for run in p.runs:
+                run.font.name = 'Times New Roman'
+                run.font.size = Pt(12)
+                run.font.color.rgb = RGBColor(0, 0, 0)
+    table.cell(0, 5).text = 'А. В. Калинина'
+    for p in table.cell(0, 5).paragraphs:
+        for run in p.runs:
+            run.font.name = 'Times New Roman'
+            run.font.size = Pt(12)
+            run.font.color.rgb = RGBColor(0, 0, 0)
+
+    buffer = io.BytesIO()
+    doc.save(buffer)
+    buffer.seek(0)
+    return buffer
+
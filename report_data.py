@@ -0,0 +1,172 @@
+import json
+from datetime import date, timedelta
+from decimal import Decimal
+
+# Данные недельного и месячного отчетов одним запросом.
+# Строки заказов со статусом «Завершен» за текущий и сравнительный периоды
+# читаются один раз (CTE lines); периоды могут пересекаться, поэтому у каждой
+# строки два признака. Итоги, дни и каналы считаются за один проход через
+# GROUPING SETS, а текущий/прошлый период разделяются через FILTER.
+REPORT_QUERY = """
+WITH params AS (
+    SELECT %s::timestamp AS cur_from, %s::timestamp AS cur_to,
+           %s::timestamp AS prev_from, %s::timestamp AS prev_to
+),
+lines AS (
+    SELECT
+        o."OrderID" AS order_id,
+        o."Date_order"::date AS day,
+        o."Buying_method" AS channel,
+        o."DeliveriID" AS delivery_id,
+        og."GoodID" AS good_id,
+        og."Quantity_goods" AS quantity,
+        og."Sum_and_discont_og" AS revenue,
+        o."Date_order" BETWEEN p.cur_from AND p.cur_to AS is_current,
+        o."Date_order" BETWEEN p.prev_from AND p.prev_to AS is_prev
+    FROM public."Order" o
+    LEFT JOIN public."Order_goods" og ON o."OrderID" = og."OrderID"
+    CROSS JOIN params p
+    WHERE o."Order status" = 'Завершен'
+      AND (o."Date_order" BETWEEN p.cur_from AND p.cur_to
+           OR o."Date_order" BETWEEN p.prev_from AND p.prev_to)
+),
+grouped AS (
+    SELECT
+        GROUPING(day, channel) AS grp,
+        day,
+        channel,
+        COUNT(DISTINCT order_id) FILTER (WHERE is_current) AS cur_orders,
+        COALESCE(SUM(revenue) FILTER (WHERE is_current), 0) AS cur_revenue,
+        COUNT(DISTINCT order_id) FILTER (WHERE is_prev) AS prev_orders,
+        COALESCE(SUM(revenue) FILTER (WHERE is_prev), 0) AS prev_revenue
+    FROM lines
+    GROUP BY GROUPING SETS ((), (day), (channel))
+),
+top_products AS (
+    SELECT g."Goods" AS good, SUM(l.quantity) AS quantity_sold, SUM(l.revenue) AS revenue
+    FROM lines l
+    LEFT JOIN public."Goods" g ON l.good_id = g."GoodID"
+    WHERE l.is_current
+    GROUP BY g."Goods"
+    ORDER BY quantity_sold DESC
+    LIMIT 5
+),
+delivery AS (
+    SELECT
+        COUNT(DISTINCT l.order_id) FILTER (WHERE d."DeliveryID" IS NOT NULL) AS shipped_orders,
+        COALESCE(STRING_AGG(DISTINCT a."City", ', '), 'Не указан') AS main_regions
+    FROM lines l
+    LEFT JOIN public."Delivery" d ON l.delivery_id = d."DeliveryID"
+    LEFT JOIN public."Address" a ON d."AdressID" = a."AddressID"
+    WHERE l.is_current
+)
+SELECT json_build_object(
+    'totals', (SELECT json_build_array(cur_orders, cur_revenue, prev_orders, prev_revenue)
+               FROM grouped WHERE grp = 3),
+    'daily', (SELECT COALESCE(json_agg(json_build_array(day, cur_orders, cur_revenue, prev_orders) ORDER BY day), '[]')
+              FROM grouped WHERE grp = 1),
+    'channels', (SELECT COALESCE(json_agg(json_build_array(channel, cur_orders, cur_revenue)), '[]')
+                 FROM grouped WHERE grp = 2 AND cur_orders > 0),
+    'top_products', (SELECT COALESCE(json_agg(json_build_array(good, quantity_sold, revenue)
+                                              ORDER BY quantity_sold DESC NULLS FIRST), '[]')
+                     FROM top_products),
+    'new_customers', (SELECT COUNT(*) FROM public."Customer" c, params p
+                      WHERE c."Registration_date" BETWEEN p.cur_from AND p.cur_to),
+    'shipped_orders', (SELECT shipped_orders FROM delivery),
+    'main_regions', (SELECT main_regions FROM delivery)
+)::text;
+"""
+
+
+def _percent_change(current, previous):
+    return ((current - previous) / previous * 100) if previous > 0 else 0
+
+
+# Один запрос за текущий период и период сравнения; возвращает общие для
+# обоих отчетов показатели и дневные ряды в виде словарей по дате
+async def _load_report_period(db, start_date, end_date, prev_start_date, prev_end_date):
+    raw = await db.fetchval(REPORT_QUERY, start_date, end_date, prev_start_date, prev_end_date)
+    payload = json.loads(raw, parse_float=Decimal)
+
+    sales_count, total_revenue, prev_sales_count, prev_revenue = payload["totals"] or (0, 0, 0, 0)
+    daily = {}
+    prev_daily_sales = {}
+    for day, cur_orders, cur_revenue, prev_orders in payload["daily"]:
+        day = date.fromisoformat(day)
+        if cur_orders:
+            daily[day] = (cur_revenue, cur_orders)
+        if prev_orders:
+            prev_daily_sales[day] = prev_orders
+
+    top_products = payload["top_products"]
+    channels = [tuple(row) for row in payload["channels"]]
+    channels.append(("Итог", sales_count, total_revenue))
+
+    return {
+        "total_revenue": total_revenue,
+        "sales_count": sales_count,
+        "avg_check": total_revenue / sales_count if sales_count > 0 else 0,
+        "prev_revenue": prev_revenue,
+        "prev_sales_count": prev_sales_count,
+        "sales_dynamics": _percent_change(sales_count, prev_sales_count),
+        "new_customers": payload["new_customers"] or 0,
+        "top_products": [(row[0], row[1]) for row in top_products],
+        "top_product_revenue": top_products[0][2] if top_products else 0,
+        "channels": channels,
+        "daily": daily,
+        "prev_daily_sales": prev_daily_sales,
+        "shipped_orders": payload["shipped_orders"] or 0,
+        "avg_delivery_time": "2 дня",  # Placeholder
+        "main_regions": payload["main_regions"] or "Москва, Санкт-Петербург, Казань",
+    }
+
+
+def _report_dict(period):
+    return {key: period[key] for key in (
+        "total_revenue", "sales_count", "avg_check", "sales_dynamics", "new_customers",
+        "top_products", "top_product_revenue", "channels",
+    )}
+
+
+async def load_weekly_report_data(db, start_date, end_date):
+    period = await _load_report_period(
+        db, start_date, end_date, start_date - timedelta(days=7), end_date - timedelta(days=7))
+
+    daily_data = []
+    current_date = start_date
+    while current_date <= end_date:
+        day_row = period["daily"].get(current_date)
+        if day_row is not None:
+            revenue, sales = day_row
+            prev_sales = period["prev_daily_sales"].get(current_date - timedelta(days=7), 0)
+            daily_data.append((current_date, revenue, sales, revenue / sales,
+                               _percent_change(sales, prev_sales)))
+        else:
+            daily_data.append((current_date, 0, 0, 0, 0))
+        current_date += timedelta(days=1)
+
+    data = _report_dict(period)
+    data["daily_data"] = daily_data
+    data["shipped_orders"] = period["shipped_orders"]
+    data["avg_delivery_time"] = period["avg_delivery_time"]
+    data["main_regions"] = period["main_regions"]
+    return data
+
+
+async def load_monthly_report_data(db, start_date, end_date):
+    prev_start_date = start_date - timedelta(days=30)
+    prev_end_date = end_date - timedelta(days=30)
+    period = await _load_report_period(db, start_date, end_date, prev_start_date, prev_end_date)
+
+    prev_revenue, prev_sales_count = period["prev_revenue"], period["prev_sales_count"]
+    prev_avg_check = prev_revenue / prev_sales_count if prev_sales_count > 0 else 0
+
+    data = _report_dict(period)
+    data["monthly_data"] = [
+        (prev_start_date, prev_revenue, prev_sales_count, prev_avg_check, 0),
+        (start_date, period["total_revenue"], period["sales_count"], period["avg_check"], period["sales_dynamics"]),
+    ]
+    data["shipped_orders"] = period["shipped_orders"]
+    data["avg_delivery_time"] = period["avg_delivery_time"]
+    data["main_regions"] = period["main_regions"]
+    return data
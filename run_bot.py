@@ -0,0 +1,9 @@
+# Точка входа бота: python run_bot.py
+# Пул рендеринга запускает рабочие процессы методом spawn, и каждый из них (в том числе
+# при перезапуске после RENDER_MAX_TASKS_PER_WORKER задач) заново импортирует главный
+# модуль процесса как __mp_main__. Поэтому главным модулем служит этот файл: вне блока
+# __main__ в нем ничего нет, а bot4g2 с ботом, хранилищами, базой и планировщиком
+# импортируется только в основном процессе
+if __name__ == "__main__":
+    import bot4g2
+    bot4g2.run()
@@ -1,37 +1,36 @@
 from flask import Flask, render_template, request
-import psycopg2
 from datetime import datetime, timedelta
-import plotly.graph_objects as go
-import plotly.express as px
-import pandas as pd
 import logging
+from functools import lru_cache
 from dateutil.relativedelta import relativedelta
 from dotenv import load_dotenv
 import os
-from cryptography.fernet import Fernet
+#Загружаем переменные окружения из .env до импорта модулей, читающих настройки при импорте
+load_dotenv()
+import db_pool
+from log_setup import setup_logging, RowsSummary
+from metrics import REGISTRY, instrument_flask
 
 app = Flask(__name__)
 
 # Настройка логирования
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[logging.FileHandler("sales.log"), logging.StreamHandler()]
-)
+setup_logging("sales.log")
 logger = logging.getLogger(__name__)
 
-# Загружаем переменные окружения из .env
-load_dotenv()
-
 ENCRYPTION_KEY = os.getenv("ENCRYPTION_KEY")
-cipher = Fernet(ENCRYPTION_KEY)
+
+# Шифр создается при первом использовании: cryptography не загружается при запуске
+@lru_cache(maxsize=1)
+def get_cipher():
+    from cryptography.fernet import Fernet
+    return Fernet(ENCRYPTION_KEY)
 
 # Определяем функции шифрования
 def encrypt_data(data: str) -> bytes:
-    return cipher.encrypt(data.encode())
+    return get_cipher().encrypt(data.encode())
 
 def decrypt_data(encrypted_data: bytes) -> str:
-    return cipher.decrypt(encrypted_data).decode()
+    return get_cipher().decrypt(encrypted_data).decode()
 
 DB_CONFIG = {
     "dbname": os.getenv("DB_NAME"),
@@ -42,24 +41,20 @@ DB_CONFIG = {
     "sslmode": "require"
 }
 
-def sanitize_log_data(data):
-    if not data:
-        return data
-    sanitized_data = []
-    for row in data:
-        sanitized_row = []
-        for item in row:
-            if isinstance(item, str) and item not in ['Не указан', 'Без категории']:
-                sanitized_row.append("***")
-            else:
-                sanitized_row.append(item)
-        sanitized_data.append(tuple(sanitized_row))
-    return sanitized_data
+# Пул соединений рабочего процесса; одно соединение используется всеми запросами страницы
+pool = db_pool.init_app(app, DB_CONFIG)
+
+# Метрики страниц и пула соединений: /metrics
+instrument_flask(app)
+REGISTRY.callback("app_db_pool_connections", "gauge", "Соединения пула базы данных",
+                  lambda: {state: pool.metrics()[state] for state in ("in_use", "available", "max_size")}, ("state",))
+REGISTRY.callback("app_db_pool_checkouts_total", "counter", "Выдачи соединений из пула", lambda: pool.metrics()["checkouts"])
+REGISTRY.callback("app_db_pool_wait_seconds_total", "counter", "Ожидание соединения из пула, сек",
+                  lambda: pool.metrics()["wait_seconds_total"])
 
 def get_db_connection():
     try:
-        conn = psycopg2.connect(**DB_CONFIG)
-        return conn
+        return db_pool.get_request_connection(pool)
     except Exception as e:
         logger.error(f"Ошибка подключения к базе данных: {str(e)}")
         raise
@@ -78,7 +73,6 @@ def get_categories():
         result = cur.fetchall()
         logger.info(f"Получено {len(result)} категорий")
         cur.close()
-        conn.close()
         return [row[0] for row in result]
     except Exception as e:
         logger.error(f"Ошибка при получении списка категорий: {str(e)}")
@@ -163,9 +157,8 @@ def get_summary_stats(start_date, end_date):
         """
         cur.execute(query, (start_date, end_date, start_date, end_date, start_date, end_date))
         result = cur.fetchone()
-        logger.info(f"Получены сводные данные: {sanitize_log_data([result])}")
+        logger.info("Получены сводные данные: %s", RowsSummary([result]))
         cur.close()
-        conn.close()
         return {
             'total_revenue': result[0] or 0,
             'net_profit': result[1] or 0,
@@ -257,7 +250,6 @@ def get_gross_profit(start_date, end_date):
         result = cur.fetchall()
         logger.info(f"Получено {len(result)} записей для валовой прибыли")
         cur.close()
-        conn.close()
         return result
     except Exception as e:
         logger.error(f"Ошибка при получении валовой прибыли: {str(e)}")
@@ -288,7 +280,6 @@ def get_orders_count(start_date, end_date):
         result = cur.fetchall()
         logger.info(f"Получено {len(result)} записей для количества заказов")
         cur.close()
-        conn.close()
         return result
     except Exception as e:
         logger.error(f"Ошибка при получении количества заказов: {str(e)}")
@@ -321,7 +312,6 @@ def get_avg_order_value(start_date, end_date):
         result = cur.fetchall()
         logger.info(f"Получено {len(result)} записей для среднего чека")
         cur.close()
-        conn.close()
         return result
     except Exception as e:
         logger.error(f"Ошибка при получении среднего чека: {str(e)}")
@@ -364,7 +354,6 @@ def get_revenue_by_store(start_date, end_date, category=None):
         result = cur.fetchall()
         logger.info(f"Получено {len(result)} записей для выручки по магазинам")
         cur.close()
-        conn.close()
         return result
     except Exception as e:
         logger.error(f"Ошибка при получении выручки по магазинам: {str(e)}")
@@ -407,7 +396,6 @@ def get_orders_by_store(start_date, end_date, category=None):
         result = cur.fetchall()
         logger.info(f"Получено {len(result)} записей для заказов по магазинам")
         cur.close()
-        conn.close()
         return result
     except Exception as e:
         logger.error(f"Ошибка при получении заказов по магазинам: {str(e)}")
@@ -443,7 +431,6 @@ def get_top_brands(start_date, end_date):
         result = cur.fetchall()
         logger.info(f"Получено {len(result)} записей для топ брендов")
         cur.close()
-        conn.close()
         return result
     except Exception as e:
         logger.error(f"Ошибка при получении топ брендов: {str(e)}")
@@ -481,7 +468,6 @@ def get_top_categories(start_date, end_date):
         result = cur.fetchall()
         logger.info(f"Получено {len(result)} записей для топ категорий")
         cur.close()
-        conn.close()
         return result
     except Exception as e:
         logger.error(f"Ошибка при получении топ категорий: {str(e)}")
@@ -516,7 +502,6 @@ def get_sales_by_manager(start_date, end_date):
         result = cur.fetchall()
         logger.info(f"Получено {len(result)} записей для продаж по менеджерам")
         cur.close()
-        conn.close()
         return result
     except Exception as e:
         logger.error(f"Ошибка при получении продаж по менеджерам: {str(e)}")
@@ -559,7 +544,6 @@ def get_arpu(start_date, end_date):
         result = cur.fetchone()
         logger.info(f"Получено ARPU: {result}")
         cur.close()
-        conn.close()
         return result
     except Exception as e:
         logger.error(f"Ошибка при получении ARPU: {str(e)}")
@@ -602,7 +586,6 @@ def get_category_stats(start_date, end_date, category=None):
         result = cur.fetchall()
         logger.info(f"Получено {len(result)} записей для статистики по категориям")
         cur.close()
-        conn.close()
         return result
     except Exception as e:
         logger.error(f"Ошибка при получении статистики по категориям: {str(e)}")
@@ -681,9 +664,8 @@ def get_profitability(start_date, end_date):
         """
         cur.execute(query, (start_date, end_date, start_date, end_date))
         result = cur.fetchone()
-        logger.info(f"Получены данные маржинальности: {sanitize_log_data([result])}")
+        logger.info("Получены данные маржинальности: %s", RowsSummary([result]))
         cur.close()
-        conn.close()
         return result
     except Exception as e:
         logger.error(f"Ошибка при получении расширенной маржинальности: {str(e)}")
@@ -700,6 +682,11 @@ def format_currency(value):
 
 @app.route('/sales')
 def sales_dashboard():
+    # pandas и plotly нужны только этой странице, поэтому загружаются при первом запросе к ней
+    import pandas as pd
+    import plotly.express as px
+    import plotly.graph_objects as go
+
     period_type = request.args.get('period_type', 'custom')
     start_date_str = request.args.get('start_date')
     end_date_str = request.args.get('end_date')
@@ -0,0 +1,140 @@
+import argparse
+import logging
+import os
+from datetime import date, datetime, timedelta
+
+import psycopg2
+from dotenv import load_dotenv
+
+# Миграции и пересчет дневных витрин продаж (sales_cube_daily, orders_cube_daily).
+#
+#   python sales_cube.py migrate                 — применить новые миграции из db/migrations
+#   python sales_cube.py rollback 001_sales_cube — откатить миграцию (*.down.sql)
+#   python sales_cube.py refresh --days 3        — пересчитать последние 3 дня (для cron)
+#   python sales_cube.py refresh --from 2024-01-01 --to 2024-12-31
+#   python sales_cube.py refresh --full          — пересчитать всю историю заказов
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+    handlers=[logging.StreamHandler()]
+)
+logger = logging.getLogger(__name__)
+
+load_dotenv()
+
+DB_CONFIG = {
+    "dbname": os.getenv("DB_NAME"),
+    "user": os.getenv("DB_USER"),
+    "password": os.getenv("DB_PASSWORD"),
+    "host": os.getenv("DB_HOST"),
+    "port": os.getenv("DB_PORT"),
+    # Локальной базе без SSL достаточно DB_SSLMODE=prefer или disable
+    "sslmode": os.getenv("DB_SSLMODE", "require")
+}
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "db", "migrations")
+
+# Полный пересчет идет по месяцам, чтобы не держать одну огромную транзакцию
+REFRESH_CHUNK_DAYS = 31
+
+
+def list_migrations():
+    return sorted(
+        name[:-len(".sql")] for name in os.listdir(MIGRATIONS_DIR)
+        if name.endswith(".sql") and not name.endswith(".down.sql")
+    )
+
+
+def migrate(conn):
+    with conn.cursor() as cur:
+        cur.execute("""
+            CREATE TABLE IF NOT EXISTS public.schema_migrations (
+                name text PRIMARY KEY,
+                applied_at timestamptz NOT NULL DEFAULT now()
+            );
+        """)
+        cur.execute("SELECT name FROM public.schema_migrations;")
+        applied = {row[0] for row in cur.fetchall()}
+    conn.commit()
+
+    for name in list_migrations():
+        if name in applied:
+            continue
+        with open(os.path.join(MIGRATIONS_DIR, f"{name}.sql"), encoding="utf-8") as f:
+            sql = f.read()
+        with conn.cursor() as cur:
+            cur.execute(sql)
+            cur.execute("INSERT INTO public.schema_migrations (name) VALUES (%s);", (name,))
+        conn.commit()
+        logger.info(f"Применена миграция {name}")
+
+
+def rollback(conn, name):
+    with open(os.path.join(MIGRATIONS_DIR, f"{name}.down.sql"), encoding="utf-8") as f:
+        sql = f.read()
+    with conn.cursor() as cur:
+        cur.execute(sql)
+        cur.execute("DELETE FROM public.schema_migrations WHERE name = %s;", (name,))
+    conn.commit()
+    logger.info(f"Откачена миграция {name}")
+
+
+def refresh(conn, date_from, date_to):
+    current = date_from
+    while current <= date_to:
+        chunk_end = min(current + timedelta(days=REFRESH_CHUNK_DAYS - 1), date_to)
+        started = datetime.now()
+        with conn.cursor() as cur:
+            cur.execute("SELECT public.refresh_sales_cube(%s, %s);", (current, chunk_end))
+        conn.commit()
+        logger.info(f"Витрины пересчитаны за {current} - {chunk_end} "
+                    f"за {(datetime.now() - started).total_seconds():.1f} сек")
+        current = chunk_end + timedelta(days=1)
+
+
+def get_orders_date_range(conn):
+    with conn.cursor() as cur:
+        cur.execute('SELECT MIN("Date_order")::date, MAX("Date_order")::date FROM public."Order";')
+        return cur.fetchone()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Миграции и пересчет витрин продаж")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    subparsers.add_parser("migrate", help="применить новые миграции")
+    rollback_parser = subparsers.add_parser("rollback", help="откатить миграцию")
+    rollback_parser.add_argument("name", help="имя миграции без расширения, например 001_sales_cube")
+    refresh_parser = subparsers.add_parser("refresh", help="пересчитать витрины")
+    refresh_parser.add_argument("--from", dest="date_from", type=date.fromisoformat)
+    refresh_parser.add_argument("--to", dest="date_to", type=date.fromisoformat)
+    refresh_parser.add_argument("--days", type=int, help="пересчитать последние N дней, включая сегодня")
+    refresh_parser.add_argument("--full", action="store_true", help="пересчитать всю историю")
+    args = parser.parse_args()
+
+    conn = psycopg2.connect(**DB_CONFIG)
+    try:
+        if args.command == "migrate":
+            migrate(conn)
+        elif args.command == "rollback":
+            rollback(conn, args.name)
+        elif args.command == "refresh":
+            if args.full:
+                date_from, date_to = get_orders_date_range(conn)
+                if date_from is None:
+                    logger.warning("В таблице заказов нет данных, пересчитывать нечего.")
+                    return
+            elif args.days:
+                date_to = date.today()
+                date_from = date_to - timedelta(days=args.days - 1)
+            elif args.date_from and args.date_to:
+                date_from, date_to = args.date_from, args.date_to
+            else:
+                parser.error("укажите --full, --days или пару --from/--to")
+            refresh(conn, date_from, date_to)
+    finally:
+        conn.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,115 @@
+import asyncio
+import logging
+from datetime import datetime, timedelta
+
+logger = logging.getLogger(__name__)
+
+_FIELD_RANGES = [
+    ("minute", 0, 59),
+    ("hour", 0, 23),
+    ("day", 1, 31),
+    ("month", 1, 12),
+    ("weekday", 0, 7),  # 0 и 7 — воскресенье, как в cron
+]
+
+
+def _parse_field(value, low, high):
+    allowed = set()
+    for part in value.split(","):
+        step = 1
+        if "/" in part:
+            part, step_value = part.split("/", 1)
+            step = int(step_value)
+        if part == "*":
+            start, end = low, high
+        elif "-" in part:
+            start, end = (int(item) for item in part.split("-", 1))
+        else:
+            start = end = int(part)
+        if start < low or end > high or start > end or step < 1:
+            raise ValueError(f"Значение '{value}' вне диапазона {low}-{high}")
+        allowed.update(range(start, end + 1, step))
+    return allowed
+
+
+# Расписание в формате cron из пяти полей: "минута час день месяц день_недели".
+# Поддерживаются *, списки через запятую, диапазоны a-b и шаг */n
+class CronSchedule:
+    def __init__(self, expression):
+        fields = expression.split()
+        if len(fields) != 5:
+            raise ValueError(f"Ожидается 5 полей расписания, получено: '{expression}'")
+        self.expression = expression
+        parsed = {name: _parse_field(field, low, high)
+                  for field, (name, low, high) in zip(fields, _FIELD_RANGES)}
+        self.minutes = parsed["minute"]
+        self.hours = parsed["hour"]
+        self.days = parsed["day"]
+        self.months = parsed["month"]
+        # В cron 7 тоже означает воскресенье; переводим в нумерацию Python (0 — понедельник)
+        self.weekdays = {(weekday - 1) % 7 for weekday in parsed["weekday"]}
+        # Как в cron, поле считается неограниченным, только если начинается с * (*, */2);
+        # явный диапазон вроде 1-31 — это ограничение и участвует в правиле «или»
+        self._day_any = fields[2].startswith("*")
+        self._weekday_any = fields[4].startswith("*")
+
+    def _day_matches(self, moment):
+        if moment.month not in self.months:
+            return False
+        day_ok = moment.day in self.days
+        weekday_ok = moment.weekday() in self.weekdays
+        # Как в cron: если заданы и день месяца, и день недели, достаточно одного совпадения
+        if not self._day_any and not self._weekday_any:
+            return day_ok or weekday_ok
+        return day_ok and weekday_ok
+
+    def next_after(self, moment):
+        candidate = moment.replace(second=0, microsecond=0) + timedelta(minutes=1)
+        limit = candidate + timedelta(days=366 * 5)
+        while candidate < limit:
+            if not self._day_matches(candidate):
+                candidate = (candidate + timedelta(days=1)).replace(hour=0, minute=0)
+                continue
+            if candidate.hour not in self.hours:
+                candidate = (candidate + timedelta(hours=1)).replace(minute=0)
+                continue
+            if candidate.minute not in self.minutes:
+                candidate += timedelta(minutes=1)
+                continue
+            return candidate
+        raise ValueError(f"Расписание '{self.expression}' никогда не срабатывает")
+
+
+# Фоновый планировщик внутри цикла событий бота: у каждой задачи своя
+# asyncio-задача, которая спит до следующего срабатывания расписания
+class Scheduler:
+    def __init__(self):
+        self._jobs = []
+        self._tasks = []
+
+    def add_job(self, name, expression, func):
+        self._jobs.append((name, CronSchedule(expression), func))
+
+    def start(self):
+        for name, schedule, func in self._jobs:
+            self._tasks.append(asyncio.create_task(self._run(name, schedule, func)))
+            logger.info(f"Задача '{name}' запланирована по расписанию '{schedule.expression}'")
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def _run(self, name, schedule, func):
+        while True:
+            next_run = schedule.next_after(datetime.now())
+            await asyncio.sleep(max(0.0, (next_run - datetime.now()).total_seconds()))
+            started = datetime.now()
+            try:
+                await func()
+                logger.info(f"Задача '{name}' выполнена за {(datetime.now() - started).total_seconds():.1f} сек")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Ошибка в задаче '{name}': {str(e)}")
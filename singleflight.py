@@ -0,0 +1,37 @@
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+# Объединение одинаковых одновременных запросов: пока вычисление по ключу
+# выполняется, остальные вызовы с тем же ключом ждут его и получают тот же
+# результат (или то же исключение). Вычисление идет отдельной задачей, поэтому
+# отмена одного из ожидающих не прерывает его для остальных
+class SingleFlight:
+    def __init__(self):
+        self._inflight = {}
+        self.started = 0
+        self.coalesced = 0
+
+    def _done(self, key, task):
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        # Помечаем исключение как полученное, даже если все ожидающие были отменены
+        if not task.cancelled():
+            task.exception()
+
+    async def do(self, key, func):
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.create_task(func())
+            self._inflight[key] = task
+            task.add_done_callback(lambda done: self._done(key, done))
+            self.started += 1
+        else:
+            self.coalesced += 1
+            logger.info(f"Запрос присоединен к уже выполняющемуся вычислению {key[:12]}")
+        return await asyncio.shield(task)
+
+    def in_flight(self):
+        return len(self._inflight)
@@ -0,0 +1,124 @@
+import asyncio
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+from aiogram.exceptions import TelegramBadRequest, TelegramForbiddenError, TelegramRetryAfter
+from aiogram.types import BufferedInputFile
+
+logger = logging.getLogger(__name__)
+
+# Файл SQLite с подписками чатов на отчеты
+SUBSCRIPTIONS_DB = os.getenv("SUBSCRIPTIONS_DB", "subscriptions.db")
+# Ограничение рассылки: Bot API допускает около 30 сообщений в секунду на бота
+SUBSCRIPTIONS_SEND_RATE = float(os.getenv("SUBSCRIPTIONS_SEND_RATE", "25"))
+
+# Виды подписок и их названия для меню
+SUBSCRIPTION_KINDS = {
+    "weekly": "Еженедельный отчет",
+    "monthly": "Ежемесячный отчет",
+    "dashboard": "Дашборд за месяц",
+}
+
+
+class SubscriptionStore:
+    def __init__(self, path=SUBSCRIPTIONS_DB):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS subscriptions (
+                chat_id INTEGER NOT NULL,
+                kind TEXT NOT NULL,
+                created_at TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP,
+                PRIMARY KEY (chat_id, kind)
+            )
+        """)
+        self._conn.commit()
+
+    def _execute(self, query, params=()):
+        with self._lock:
+            rows = self._conn.execute(query, params).fetchall()
+            self._conn.commit()
+            return rows
+
+    def subscribe(self, chat_id, kind):
+        self._execute("INSERT OR IGNORE INTO subscriptions (chat_id, kind) VALUES (?, ?)", (chat_id, kind))
+
+    def unsubscribe(self, chat_id, kind=None):
+        if kind is None:
+            self._execute("DELETE FROM subscriptions WHERE chat_id = ?", (chat_id,))
+        else:
+            self._execute("DELETE FROM subscriptions WHERE chat_id = ? AND kind = ?", (chat_id, kind))
+
+    def kinds_for_chat(self, chat_id):
+        return {row[0] for row in self._execute("SELECT kind FROM subscriptions WHERE chat_id = ?", (chat_id,))}
+
+    def chats_for(self, kind):
+        return [row[0] for row in self._execute(
+            "SELECT chat_id FROM subscriptions WHERE kind = ? ORDER BY created_at", (kind,))]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+# Равномерный темп отправки: не чаще rate сообщений в секунду
+class RateLimiter:
+    def __init__(self, rate=SUBSCRIPTIONS_SEND_RATE):
+        self.interval = 1.0 / rate if rate > 0 else 0.0
+        self._next_at = 0.0
+        self._lock = asyncio.Lock()
+
+    async def wait(self):
+        async with self._lock:
+            now = time.monotonic()
+            if self._next_at > now:
+                await asyncio.sleep(self._next_at - now)
+            self._next_at = max(now, self._next_at) + self.interval
+
+
+# Рассылка одного документа всем подписчикам: файл загружается в Telegram один раз
+# (или не загружается вовсе, если передан известный file_id), остальным чатам уходит
+# полученный file_id. Чаты, заблокировавшие бота, отписываются
+async def fan_out_document(bot, store, kind, chat_ids, data, filename, caption, limiter,
+                           reply_markup=None, file_id=None):
+    delivered = 0
+    for chat_id in chat_ids:
+        document = file_id or BufferedInputFile(data, filename=filename)
+        while True:
+            await limiter.wait()
+            try:
+                message = await bot.send_document(chat_id=chat_id, document=document, caption=caption,
+                                                  reply_markup=reply_markup)
+                if file_id is None and message.document:
+                    file_id = message.document.file_id
+                delivered += 1
+                break
+            except TelegramRetryAfter as e:
+                logger.warning(f"Рассылка '{kind}': превышен лимит Telegram, пауза {e.retry_after} сек")
+                await asyncio.sleep(e.retry_after)
+            except TelegramForbiddenError as e:
+                logger.warning(f"Рассылка '{kind}': бот заблокирован в чате {chat_id}, подписки удалены: {str(e)}")
+                store.unsubscribe(chat_id)
+                break
+            except TelegramBadRequest as e:
+                if isinstance(document, str) and "chat not found" not in str(e).lower():
+                    # Сохраненный file_id больше не действует — загружаем файл заново
+                    logger.warning(f"Рассылка '{kind}': file_id не принят, файл будет загружен заново: {str(e)}")
+                    file_id = None
+                    document = BufferedInputFile(data, filename=filename)
+                    continue
+                if "chat not found" in str(e).lower():
+                    logger.warning(f"Рассылка '{kind}': чат {chat_id} не найден, подписки удалены")
+                    store.unsubscribe(chat_id)
+                else:
+                    logger.error(f"Рассылка '{kind}': ошибка отправки в чат {chat_id}: {str(e)}")
+                break
+            except Exception as e:
+                logger.error(f"Рассылка '{kind}': ошибка отправки в чат {chat_id}: {str(e)}")
+                break
+    logger.info(f"Рассылка '{kind}' ({filename}): доставлено {delivered} из {len(chat_ids)}")
+    return file_id
@@ -0,0 +1,79 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("aiogram")
+
+from callback_router import CallbackRouter
+from navigation import MenuNav, ChartNav, ReportNav
+
+
+def make_router(calls):
+    router = CallbackRouter()
+
+    def handler(name):
+        async def handle(callback, callback_data, **kwargs):
+            calls.append((name, callback_data, kwargs))
+        return handle
+
+    router.route(MenuNav)(handler("menu"))
+    router.route(ChartNav, "period")(handler("chart_period"))
+    router.route(ChartNav, "build")(handler("chart_build"))
+    router.route(ReportNav)(handler("report_any"))
+    router.route(ReportNav, "build")(handler("report_build"))
+    return router
+
+
+def dispatch(router, data, **kwargs):
+    return asyncio.run(router.dispatch(SimpleNamespace(data=data), **kwargs))
+
+
+def test_routes_by_prefix_and_step():
+    calls = []
+    router = make_router(calls)
+    assert dispatch(router, ChartNav(step="build", chart="top_goods", period="m", year=2024, month=5).pack())
+    assert dispatch(router, ChartNav(step="period", chart="top_goods").pack())
+    assert [name for name, _, _ in calls] == ["chart_build", "chart_period"]
+    callback_data = calls[0][1]
+    assert isinstance(callback_data, ChartNav)
+    assert (callback_data.chart, callback_data.period, callback_data.year, callback_data.month) == ("top_goods", "m", 2024, 5)
+
+
+def test_route_without_step_catches_other_steps():
+    calls = []
+    router = make_router(calls)
+    assert dispatch(router, ReportNav(step="build", report="w").pack())
+    assert dispatch(router, ReportNav(step="year", report="w").pack())
+    assert dispatch(router, MenuNav(section="graph").pack())
+    assert [name for name, _, _ in calls] == ["report_build", "report_any", "menu"]
+    assert calls[2][1].section == "graph"
+
+
+def test_kwargs_are_passed_to_handler():
+    calls = []
+    router = make_router(calls)
+    assert dispatch(router, MenuNav(section="report").pack(), state="s")
+    assert calls[0][2] == {"state": "s"}
+
+
+@pytest.mark.parametrize("data", [
+    None,
+    "",
+    "graph_sales_dynamics",              # формат кнопок до перехода на CallbackData
+    "g:unknown:top_goods:::::",          # шаг без маршрута и без маршрута по умолчанию
+    "zzz:build:x",                       # неизвестный префикс
+    "g:build:top_goods:m:not_a_year:5:0",  # не разбирается фабрикой
+])
+def test_stale_or_unknown_data_falls_back(data):
+    calls = []
+    router = make_router(calls)
+    assert dispatch(router, data) is False
+    assert calls == []
+
+
+def test_duplicate_route_is_rejected():
+    router = make_router([])
+    with pytest.raises(ValueError):
+        router.route(ChartNav, "build")(lambda callback, callback_data: None)
+    assert len(router) == 5
@@ -0,0 +1,150 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("aiogram")
+
+from aiogram.fsm.storage.base import StorageKey
+
+import fsm_storage
+from fsm_storage import SQLiteStorage, TTLMemoryStorage, create_storage
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    # Подменяем часы только в модуле хранилища: цикл событий пользуется настоящими
+    monkeypatch.setattr(fsm_storage, "time", SimpleNamespace(monotonic=clock, time=clock))
+    return clock
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def storage(request, tmp_path, clock):
+    if request.param == "memory":
+        storage = TTLMemoryStorage(ttl=100, max_entries=3)
+    else:
+        storage = SQLiteStorage(path=str(tmp_path / "fsm.db"), ttl=100)
+    yield storage
+    asyncio.run(storage.close())
+
+
+def key(user_id):
+    return StorageKey(bot_id=1, chat_id=user_id, user_id=user_id)
+
+
+def test_state_and_data_round_trip(storage):
+    async def scenario():
+        await storage.set_state(key(1), "menu:period")
+        await storage.set_data(key(1), {"weeks": (1, 7), "year": 2024})
+        assert await storage.get_state(key(1)) == "menu:period"
+        # Кортежи сохраняются как списки (JSON)
+        assert await storage.get_data(key(1)) == {"weeks": [1, 7], "year": 2024}
+        assert await storage.get_state(key(2)) is None
+        assert await storage.get_data(key(2)) == {}
+
+    asyncio.run(scenario())
+
+
+def test_entries_expire_after_ttl(storage, clock):
+    async def scenario():
+        await storage.set_state(key(1), "menu")
+        await storage.set_data(key(1), {"a": 1})
+        clock.now += 99
+        assert await storage.get_state(key(1)) == "menu"
+        clock.now += 1
+        assert await storage.get_state(key(1)) is None
+        assert await storage.get_data(key(1)) == {}
+        # После истечения запись начинается заново, старые данные не возвращаются
+        await storage.set_state(key(1), "menu")
+        assert await storage.get_data(key(1)) == {}
+
+    asyncio.run(scenario())
+
+
+def test_write_extends_ttl(storage, clock):
+    async def scenario():
+        await storage.set_data(key(1), {"a": 1})
+        clock.now += 80
+        await storage.set_data(key(1), {"a": 2})
+        clock.now += 80
+        assert await storage.get_data(key(1)) == {"a": 2}
+
+    asyncio.run(scenario())
+
+
+def test_clearing_state_and_data_removes_entry(storage):
+    async def scenario():
+        await storage.set_state(key(1), "menu")
+        await storage.set_data(key(1), {"a": 1})
+        await storage.set_state(key(1), None)
+        await storage.set_data(key(1), {})
+        assert await storage.get_state(key(1)) is None
+        assert await storage.get_data(key(1)) == {}
+
+    asyncio.run(scenario())
+
+
+def test_memory_storage_evicts_least_recently_written(clock):
+    storage = TTLMemoryStorage(ttl=100, max_entries=3)
+
+    async def scenario():
+        for user_id in range(1, 5):
+            await storage.set_state(key(user_id), "menu")
+            clock.now += 1
+        assert len(storage._entries) == 3
+        assert await storage.get_state(key(1)) is None
+        # Повторная запись переносит ключ в конец очереди вытеснения
+        await storage.set_data(key(2), {"a": 1})
+        await storage.set_state(key(5), "menu")
+        assert await storage.get_state(key(2)) == "menu"
+        assert await storage.get_state(key(3)) is None
+
+    asyncio.run(scenario())
+
+
+def test_memory_storage_sweeps_expired_entries(clock):
+    storage = TTLMemoryStorage(ttl=10, max_entries=100)
+
+    async def scenario():
+        for user_id in range(5):
+            await storage.set_state(key(user_id), "menu")
+        clock.now += fsm_storage.FSM_SWEEP_INTERVAL + 1
+        await storage.get_state(key(100))
+        assert len(storage._entries) == 0
+
+    asyncio.run(scenario())
+
+
+def test_sqlite_storage_survives_restart_and_sweeps(tmp_path, clock):
+    path = str(tmp_path / "fsm.db")
+
+    async def scenario():
+        storage = SQLiteStorage(path=path, ttl=10)
+        await storage.set_data(key(1), {"a": 1})
+        await storage.set_data(key(2), {"b": 2})
+        await storage.close()
+
+        storage = SQLiteStorage(path=path, ttl=10)
+        assert await storage.get_data(key(1)) == {"a": 1}
+        clock.now += fsm_storage.FSM_SWEEP_INTERVAL + 1
+        await storage.set_data(key(3), {"c": 3})
+        rows = storage._conn.execute("SELECT COUNT(*) FROM fsm_state").fetchone()[0]
+        assert rows == 1
+        await storage.close()
+
+    asyncio.run(scenario())
+
+
+def test_create_storage_rejects_unknown_backend():
+    assert isinstance(create_storage("memory"), TTLMemoryStorage)
+    with pytest.raises(ValueError):
+        create_storage("mongodb://localhost")
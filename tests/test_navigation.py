@@ -0,0 +1,63 @@
+import pytest
+
+pytest.importorskip("aiogram")
+
+from navigation import (MenuNav, ChartNav, ReportNav, CHART_MENU, CHART_PERIODS, REPORT_TYPES,
+                        graph_menu_keyboard, graph_period_keyboard, graph_year_keyboard, graph_month_keyboard,
+                        graph_week_keyboard, report_menu_keyboard, dashboard_period_keyboard, report_year_keyboard,
+                        report_month_keyboard, report_week_keyboard)
+
+FACTORIES = {factory.__prefix__: factory for factory in (MenuNav, ChartNav, ReportNav)}
+# Telegram принимает callback_data не длиннее 64 байт
+CALLBACK_DATA_LIMIT = 64
+YEAR = 2024
+
+
+def all_keyboards():
+    yield graph_menu_keyboard()
+    yield report_menu_keyboard()
+    yield dashboard_period_keyboard()
+    for chart, _ in CHART_MENU:
+        yield graph_period_keyboard(chart)
+        for period, _ in CHART_PERIODS:
+            yield graph_year_keyboard(chart, period, YEAR)
+        for period in ("m", "w"):
+            yield graph_month_keyboard(chart, period, YEAR)
+        for month in range(1, 13):
+            yield graph_week_keyboard(chart, YEAR, month)
+    for report in REPORT_TYPES:
+        for period in ("y", "m", report):
+            yield report_year_keyboard(report, period, YEAR)
+            yield report_month_keyboard(report, period, YEAR)
+    for month in range(1, 13):
+        yield report_week_keyboard(YEAR, month)
+
+
+def all_callback_data():
+    for keyboard in all_keyboards():
+        for row in keyboard.inline_keyboard:
+            for button in row:
+                yield button.callback_data
+
+
+def test_callback_data_fits_telegram_limit():
+    longest = max(all_callback_data(), key=lambda data: len(data.encode("utf-8")))
+    assert len(longest.encode("utf-8")) <= CALLBACK_DATA_LIMIT, longest
+
+
+def test_callback_data_round_trips():
+    # Каждую кнопку можно разобрать обратно, в том числе с пустыми полями (вид периода в первом меню)
+    for data in all_callback_data():
+        factory = FACTORIES[data.split(":", 1)[0]]
+        assert factory.unpack(data).pack() == data
+
+
+def test_worst_case_build_button_fits_limit():
+    chart = max((chart for chart, _ in CHART_MENU), key=len)
+    data = ChartNav(step="build", chart=chart, period="w", year=9999, month=12, part=5).pack()
+    assert len(data.encode("utf-8")) <= CALLBACK_DATA_LIMIT
+
+
+def test_too_long_callback_data_is_rejected():
+    with pytest.raises(ValueError):
+        ChartNav(step="build", chart="x" * CALLBACK_DATA_LIMIT).pack()
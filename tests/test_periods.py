@@ -0,0 +1,57 @@
+from datetime import date
+
+import pytest
+
+from periods import month_weeks, month_ending_on, period_range, weeks_ending_on
+
+
+def test_month_weeks_start_on_monday_and_end_on_last_day():
+    # 1 марта 2024 — пятница: дни до первого понедельника в недели не входят
+    assert month_weeks(2024, 3) == ((4, 10), (11, 17), (18, 24), (25, 31))
+    # Високосный февраль: последняя неделя обрезается по 29-му
+    assert month_weeks(2024, 2) == ((5, 11), (12, 18), (19, 25), (26, 29))
+    assert month_weeks(2023, 2) == ((6, 12), (13, 19), (20, 26), (27, 28))
+    # Месяц, начинающийся с понедельника
+    assert month_weeks(2024, 1) == ((1, 7), (8, 14), (15, 21), (22, 28), (29, 31))
+    # Последний день месяца — понедельник: неделя из одного дня
+    assert month_weeks(2024, 9)[-1] == (30, 30)
+
+
+@pytest.mark.parametrize("period, year, month, part, expected", [
+    ("y", 2024, 0, 0, (date(2024, 1, 1), date(2024, 12, 31))),
+    ("h", 2024, 0, 1, (date(2024, 1, 1), date(2024, 6, 30))),
+    ("h", 2024, 0, 2, (date(2024, 7, 1), date(2024, 12, 31))),
+    ("q", 2024, 0, 1, (date(2024, 1, 1), date(2024, 3, 31))),
+    ("q", 2023, 0, 4, (date(2023, 10, 1), date(2023, 12, 31))),
+    ("m", 2024, 2, 0, (date(2024, 2, 1), date(2024, 2, 29))),
+    ("m", 2023, 2, 0, (date(2023, 2, 1), date(2023, 2, 28))),
+    ("m", 2024, 12, 0, (date(2024, 12, 1), date(2024, 12, 31))),
+    ("w", 2024, 3, 0, (date(2024, 3, 4), date(2024, 3, 10))),
+    ("w", 2024, 2, 3, (date(2024, 2, 26), date(2024, 2, 29))),
+])
+def test_period_range(period, year, month, part, expected):
+    assert period_range(period, year, month, part) == expected
+
+
+def test_period_range_rejects_unknown_period_and_week():
+    with pytest.raises(ValueError):
+        period_range("x", 2024)
+    with pytest.raises(IndexError):
+        period_range("w", 2024, 3, 4)
+
+
+def test_weeks_ending_on():
+    # Воскресенье внутри месяца
+    assert weeks_ending_on(date(2024, 3, 17)) == [(date(2024, 3, 11), date(2024, 3, 17))]
+    # Последний день месяца в четверг закрывает обрезанную неделю
+    assert weeks_ending_on(date(2024, 2, 29)) == [(date(2024, 2, 26), date(2024, 2, 29))]
+    # Суббота и воскресенье до первого понедельника месяца недель не закрывают
+    assert weeks_ending_on(date(2024, 3, 16)) == []
+    assert weeks_ending_on(date(2024, 3, 3)) == []
+
+
+def test_month_ending_on():
+    assert month_ending_on(date(2024, 2, 29)) == (date(2024, 2, 1), date(2024, 2, 29))
+    assert month_ending_on(date(2023, 2, 28)) == (date(2023, 2, 1), date(2023, 2, 28))
+    assert month_ending_on(date(2024, 2, 28)) is None
+    assert month_ending_on(date(2024, 12, 31)) == (date(2024, 12, 1), date(2024, 12, 31))
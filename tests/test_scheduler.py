@@ -0,0 +1,76 @@
+from datetime import datetime
+
+import pytest
+
+from scheduler import CronSchedule
+
+
+def test_ranges_lists_and_steps():
+    schedule = CronSchedule("0,30 9-17/4 * * *")
+    assert schedule.minutes == {0, 30}
+    assert schedule.hours == {9, 13, 17}
+    assert CronSchedule("*/15 * * * *").minutes == {0, 15, 30, 45}
+    assert CronSchedule("10-20/5 * * * *").minutes == {10, 15, 20}
+
+
+@pytest.mark.parametrize("expression", [
+    "60 * * * *", "* 24 * * *", "* * 0 * *", "* * * 13 *", "* * * * 8",
+    "5-1 * * * *", "*/0 * * * *", "* * * *",
+])
+def test_invalid_expressions(expression):
+    with pytest.raises(ValueError):
+        CronSchedule(expression)
+
+
+def test_next_after_daily():
+    schedule = CronSchedule("0 5 * * *")
+    assert schedule.next_after(datetime(2024, 3, 10, 4, 59, 30)) == datetime(2024, 3, 10, 5, 0)
+    assert schedule.next_after(datetime(2024, 3, 10, 5, 0)) == datetime(2024, 3, 11, 5, 0)
+    assert schedule.next_after(datetime(2024, 12, 31, 6, 0)) == datetime(2025, 1, 1, 5, 0)
+
+
+@pytest.mark.parametrize("weekday", ["0", "7"])
+def test_sunday_is_0_and_7(weekday):
+    schedule = CronSchedule(f"0 9 * * {weekday}")
+    # 2024-03-13 — среда, ближайшее воскресенье — 17 марта
+    assert schedule.next_after(datetime(2024, 3, 13, 12, 0)) == datetime(2024, 3, 17, 9, 0)
+
+
+def test_weekday_range_with_7():
+    schedule = CronSchedule("0 9 * * 5-7")
+    # пятница, суббота, воскресенье
+    assert schedule.weekdays == {4, 5, 6}
+
+
+def test_day_and_weekday_are_or_when_both_restricted():
+    # 1-е число или любой понедельник
+    schedule = CronSchedule("0 9 1 * 1")
+    assert schedule.next_after(datetime(2024, 3, 2, 0, 0)) == datetime(2024, 3, 4, 9, 0)
+    assert schedule.next_after(datetime(2024, 3, 26, 0, 0)) == datetime(2024, 4, 1, 9, 0)
+    assert schedule.next_after(datetime(2024, 4, 1, 10, 0)) == datetime(2024, 4, 8, 9, 0)
+
+
+def test_star_day_with_weekday_is_and():
+    schedule = CronSchedule("0 9 * * 1")
+    assert schedule.next_after(datetime(2024, 3, 2, 0, 0)) == datetime(2024, 3, 4, 9, 0)
+    assert schedule.next_after(datetime(2024, 3, 4, 10, 0)) == datetime(2024, 3, 11, 9, 0)
+
+
+def test_full_range_field_still_counts_as_restricted():
+    # Как в cron: 1-31 — не *, поэтому работает правило «или» с понедельником,
+    # и задача срабатывает каждый день
+    schedule = CronSchedule("0 9 1-31 * 1")
+    assert schedule.next_after(datetime(2024, 3, 5, 10, 0)) == datetime(2024, 3, 6, 9, 0)
+    # Шаг от * остается неограниченным полем: только понедельники
+    schedule = CronSchedule("0 9 */1 * 1")
+    assert schedule.next_after(datetime(2024, 3, 5, 10, 0)) == datetime(2024, 3, 11, 9, 0)
+
+
+def test_day_of_month_with_star_weekday():
+    schedule = CronSchedule("30 8 31 * *")
+    assert schedule.next_after(datetime(2024, 4, 1, 0, 0)) == datetime(2024, 5, 31, 8, 30)
+
+
+def test_never_matching_schedule():
+    with pytest.raises(ValueError):
+        CronSchedule("0 0 30 2 *").next_after(datetime(2024, 1, 1))
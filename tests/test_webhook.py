@@ -0,0 +1,125 @@
+import asyncio
+
+import pytest
+
+pytest.importorskip("aiogram")
+
+from aiohttp import web
+from aiohttp.test_utils import TestClient, TestServer
+from aiogram import Bot, Dispatcher, F
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.client.telegram import TelegramAPIServer
+
+from webhook import SECRET_HEADER, WebhookServer
+
+SECRET = "test-secret"
+
+
+# Заглушка Bot API (то же, что TELEGRAM_API_SERVER в .env): запоминает вызовы методов
+async def start_fake_api(calls):
+    async def method(request):
+        payload = dict(await request.post())
+        calls.append((request.match_info["method"], payload))
+        result = {"message_id": len(calls), "date": 0, "chat": {"id": int(payload.get("chat_id", 1)), "type": "private"},
+                  "text": payload.get("text", "")}
+        return web.json_response({"ok": True, "result": result})
+
+    app = web.Application()
+    app.router.add_post("/bot{token}/{method}", method)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    return runner, f"http://127.0.0.1:{port}"
+
+
+def make_update(update_id, text):
+    return {"update_id": update_id,
+            "message": {"message_id": update_id, "date": 0, "text": text,
+                        "chat": {"id": update_id, "type": "private"},
+                        "from": {"id": update_id, "is_bot": False, "first_name": "test"}}}
+
+
+async def wait_for(predicate, timeout=5):
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    while not predicate():
+        if loop.time() > deadline:
+            raise AssertionError("условие не выполнено за отведенное время")
+        await asyncio.sleep(0.01)
+
+
+def run_with_server(scenario, concurrency=4):
+    async def main():
+        calls = []
+        api_runner, base = await start_fake_api(calls)
+        bot = Bot("42:TEST", session=AiohttpSession(api=TelegramAPIServer.from_base(base)))
+        dp = Dispatcher()
+        release = asyncio.Event()
+
+        # Медленный обработчик ведет себя как отчет, который ждет задание в JobQueue
+        @dp.message(F.text == "/slow")
+        async def slow(message):
+            await release.wait()
+            await message.answer("slow done")
+
+        @dp.message(F.text == "/ping")
+        async def ping(message):
+            await message.answer("pong")
+
+        server = WebhookServer(dp, bot, secret=SECRET, concurrency=concurrency)
+        client = TestClient(TestServer(server.create_app()))
+        await client.start_server()
+        server.start()
+        try:
+            await scenario(server, client, calls, release)
+        finally:
+            release.set()
+            await server.drain(timeout=5)
+            await client.close()
+            await bot.session.close()
+            await api_runner.cleanup()
+
+    asyncio.run(main())
+
+
+def post(client, server, update, secret=SECRET):
+    return client.post(server.path, json=update, headers={SECRET_HEADER: secret})
+
+
+def test_wrong_secret_is_rejected():
+    async def scenario(server, client, calls, release):
+        response = await post(client, server, make_update(1, "/ping"), secret="wrong")
+        assert response.status == 401
+        assert server.received == 0
+
+    run_with_server(scenario)
+
+
+def test_slow_handlers_do_not_block_other_updates():
+    async def scenario(server, client, calls, release):
+        # Медленных обновлений больше, чем было исполнителей в прежней схеме (8)
+        for update_id in range(1, 11):
+            assert (await post(client, server, make_update(update_id, "/slow"))).status == 200
+        await wait_for(lambda: server.in_progress() == 10)
+        assert (await post(client, server, make_update(100, "/ping"))).status == 200
+        await wait_for(lambda: any(payload.get("text") == "pong" for _, payload in calls))
+        assert not any(payload.get("text") == "slow done" for _, payload in calls)
+        release.set()
+        await wait_for(lambda: sum(payload.get("text") == "slow done" for _, payload in calls) == 10)
+        assert all(method == "sendMessage" for method, _ in calls)
+
+    run_with_server(scenario, concurrency=50)
+
+
+def test_concurrency_limit_holds_updates_in_queue():
+    async def scenario(server, client, calls, release):
+        for update_id in range(1, 4):
+            assert (await post(client, server, make_update(update_id, "/slow"))).status == 200
+        await wait_for(lambda: server.in_progress() == 2 and server.queued() == 1)
+        release.set()
+        await wait_for(lambda: server.in_progress() == 0 and server.queued() == 0)
+        assert server.received == 3
+
+    run_with_server(scenario, concurrency=2)
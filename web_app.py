@@ -1,30 +1,22 @@
 from flask import Flask, render_template, request, send_from_directory, jsonify
 import os
-import psycopg2
 from datetime import datetime, timedelta
 from calendar import monthrange, month_name
-import plotly.graph_objects as go
-import plotly.express as px
-import pandas as pd
 import logging
 from dotenv import load_dotenv
-from cryptography.fernet import Fernet
+#Загружаем переменные окружения из .env до импорта модулей, читающих настройки при импорте
+load_dotenv()
+import db_pool
+from log_setup import setup_logging, RowsSummary
+from metrics import REGISTRY, instrument_flask
 
 app = Flask(__name__)
 
 # Настройка логирования
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[logging.FileHandler("bot.log"), logging.StreamHandler()]
-)
+setup_logging("bot.log")
 logger = logging.getLogger(__name__)
 
-#Загружаем переменные окружения из .env
-load_dotenv()
-
 ENCRYPTION_KEY = os.getenv("ENCRYPTION_KEY")
-cipher = Fernet(ENCRYPTION_KEY)
 
 DB_CONFIG = {
     "dbname": os.getenv("DB_NAME"),
@@ -35,25 +27,20 @@ DB_CONFIG = {
     "sslmode": "require"
 }
 
-# Функция маскирует чувствительные данные 
-def sanitize_log_data(data):
-    if not data:
-        return data
-    sanitized_data = []
-    for row in data:
-        sanitized_row = []
-        for item in row:
-            if isinstance(item, str) and item not in ['Не указан', 'Без категории']:
-                sanitized_row.append("***")
-            else:
-                sanitized_row.append(item)
-        sanitized_data.append(tuple(sanitized_row))
-    return sanitized_data
+# Пул соединений рабочего процесса; одно соединение используется всеми запросами страницы
+pool = db_pool.init_app(app, DB_CONFIG)
+
+# Метрики страниц и пула соединений: /metrics
+instrument_flask(app)
+REGISTRY.callback("app_db_pool_connections", "gauge", "Соединения пула базы данных",
+                  lambda: {state: pool.metrics()[state] for state in ("in_use", "available", "max_size")}, ("state",))
+REGISTRY.callback("app_db_pool_checkouts_total", "counter", "Выдачи соединений из пула", lambda: pool.metrics()["checkouts"])
+REGISTRY.callback("app_db_pool_wait_seconds_total", "counter", "Ожидание соединения из пула, сек",
+                  lambda: pool.metrics()["wait_seconds_total"])
 
 def get_db_connection():
     try:
-        conn = psycopg2.connect(**DB_CONFIG)
-        return conn
+        return db_pool.get_request_connection(pool)
     except Exception as e:
         logger.error(f"Ошибка подключения к базе данных: {str(e)}")
         raise
@@ -65,7 +52,6 @@ def get_countries():
         cur.execute("SELECT DISTINCT \"Country_name\" FROM public.\"Country\" ORDER BY \"Country_name\";")
         countries = [row[0] for row in cur.fetchall()]
         cur.close()
-        conn.close()
         return countries
     except Exception as e:
         logger.error(f"Ошибка при получении списка стран: {str(e)}")
@@ -78,7 +64,6 @@ def get_categories():
         cur.execute("SELECT DISTINCT \"Category\" FROM public.\"Category_goods\" ORDER BY \"Category\";")
         categories = [row[0] for row in cur.fetchall()]
         cur.close()
-        conn.close()
         return categories
     except Exception as e:
         logger.error(f"Ошибка при получении списка категорий: {str(e)}")
@@ -125,7 +110,6 @@ def get_goods_list(filter_type=None, search_name=None, search_id=None, search_co
         cur.execute(query, params)
         goods = cur.fetchall()
         cur.close()
-        conn.close()
         return goods
     except Exception as e:
         logger.error(f"Ошибка при получении списка товаров: {str(e)}")
@@ -150,7 +134,6 @@ def get_product_info(good_id):
         """, (good_id,))
         info = cur.fetchone()
         cur.close()
-        conn.close()
         return info
     except Exception as e:
         logger.error(f"Ошибка при получении информации о товаре: {str(e)}")
@@ -176,7 +159,6 @@ def get_product_popularity(good_id):
         """, (good_id, start_date))
         result = cur.fetchall()
         cur.close()
-        conn.close()
         return result if result else []
     except Exception as e:
         logger.error(f"Ошибка при получении данных о популярности по неделям: {str(e)}")
@@ -201,7 +183,6 @@ def get_product_availability(good_id):
         """, (good_id,))
         availability = cur.fetchall()
         cur.close()
-        conn.close()
         return availability
     except Exception as e:
         logger.error(f"Ошибка при получении данных о наличии: {str(e)}")
@@ -229,7 +210,6 @@ def get_product_suppliers(good_id):
         """, (good_id,))
         suppliers = cur.fetchall()
         cur.close()
-        conn.close()
         return suppliers
     except Exception as e:
         logger.error(f"Ошибка при получении данных о поставщиках: {str(e)}")
@@ -261,9 +241,8 @@ def get_product_ratings(good_id):
         rating_distribution = cur.fetchall()
         
         cur.close()
-        conn.close()
         logger.info(f"Рейтинги для GoodID {good_id}: {ratings}")
-        logger.info(f"Распределение оценок для GoodID {good_id}: {rating_distribution}")
+        logger.info("Распределение оценок для GoodID %s: %s", good_id, RowsSummary(rating_distribution))
         return ratings, rating_distribution
     except Exception as e:
         logger.error(f"Ошибка при получении оценок: {str(e)}")
@@ -297,7 +276,6 @@ def get_sales_dynamics(good_id, start_date=None, end_date=None):
         cur.execute(query, params)
         sales = cur.fetchall()
         cur.close()
-        conn.close()
         return sales
     except Exception as e:
         logger.error(f"Ошибка при получении динамики продаж: {str(e)}")
@@ -321,7 +299,6 @@ def get_gender_distribution(good_id):
         """, (good_id,))
         gender_data = cur.fetchall()
         cur.close()
-        conn.close()
         return gender_data
     except Exception as e:
         logger.error(f"Ошибка при получении данных о поле покупателей: {str(e)}")
@@ -365,8 +342,7 @@ def get_holiday_seasonality(good_id):
         """, (good_id,))
         holiday_data = cur.fetchall()
         cur.close()
-        conn.close()
-        logger.info(f"Данные о сезонности для GoodID {good_id}: {holiday_data}")
+        logger.info("Данные о сезонности для GoodID %s: %s", good_id, RowsSummary(holiday_data))
         return holiday_data
     except Exception as e:
         logger.error(f"Ошибка при получении данных о праздниках и сезонности: {str(e)}")
@@ -398,6 +374,11 @@ def search_goods():
 
 @app.route('/products')
 def product_analysis():
+    # pandas и plotly нужны только этой странице, поэтому загружаются при первом запросе к ней
+    import pandas as pd
+    import plotly.express as px
+    import plotly.graph_objects as go
+
     good_id = request.args.get('good_id', type=int, default=None)
     start_date_str = request.args.get('start_date')
     end_date_str = request.args.get('end_date')
@@ -0,0 +1,158 @@
+import asyncio
+import hmac
+import logging
+import os
+import signal
+
+from aiohttp import web
+from aiogram.types import Update
+
+from metrics import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+# Публичный адрес, на который Telegram отправляет обновления (https://bot.example.com)
+WEBHOOK_URL = os.getenv("WEBHOOK_URL", "")
+WEBHOOK_PATH = os.getenv("WEBHOOK_PATH", "/telegram/webhook")
+# Секрет, который Telegram передает в заголовке X-Telegram-Bot-Api-Secret-Token
+WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET", "")
+WEBHOOK_HOST = os.getenv("WEBHOOK_HOST", "0.0.0.0")
+WEBHOOK_PORT = int(os.getenv("WEBHOOK_PORT", "8080"))
+# Сколько обновлений обрабатывается одновременно и сколько может ждать обработки.
+# Обработчик графика или отчета ждет свое задание в JobQueue (до JOB_QUEUE_SIZE заданий),
+# поэтому предел берется с запасом, чтобы такие обработчики не задерживали остальные обновления
+WEBHOOK_CONCURRENCY = int(os.getenv("WEBHOOK_CONCURRENCY", "200"))
+WEBHOOK_QUEUE_SIZE = int(os.getenv("WEBHOOK_QUEUE_SIZE", "1000"))
+# Сколько секунд при остановке ждать завершения уже принятых обновлений
+SHUTDOWN_DRAIN_TIMEOUT = float(os.getenv("SHUTDOWN_DRAIN_TIMEOUT", "60"))
+
+SECRET_HEADER = "X-Telegram-Bot-Api-Secret-Token"
+
+
+# Прием обновлений Telegram через aiohttp: запрос проверяется по секрету,
+# обновление ставится в ограниченную очередь и сразу подтверждается. Каждое
+# обновление обрабатывается отдельной задачей, число одновременных задач
+# ограничено семафором. Если очередь полна или сервер останавливается,
+# возвращается 503 — Telegram повторит доставку позже
+class WebhookServer:
+    def __init__(self, dp, bot, secret=WEBHOOK_SECRET, path=WEBHOOK_PATH,
+                 concurrency=WEBHOOK_CONCURRENCY, queue_size=WEBHOOK_QUEUE_SIZE):
+        if not secret:
+            raise ValueError("Для режима webhook нужно задать WEBHOOK_SECRET")
+        self.dp = dp
+        self.bot = bot
+        self.secret = secret
+        self.path = path
+        self.concurrency = max(1, concurrency)
+        self._queue = asyncio.Queue(maxsize=queue_size)
+        self._slots = asyncio.Semaphore(self.concurrency)
+        self._dispatcher = None
+        self._tasks = set()
+        self._accepting = False
+        self.received = 0
+        self.rejected = 0
+
+    def create_app(self):
+        app = web.Application()
+        app.router.add_post(self.path, self.handle)
+        return app
+
+    async def handle(self, request):
+        token = request.headers.get(SECRET_HEADER, "")
+        if not hmac.compare_digest(token, self.secret):
+            logger.warning(f"Webhook: запрос с неверным секретом от {request.remote}")
+            return web.Response(status=401)
+        if not self._accepting:
+            return web.Response(status=503)
+        try:
+            update = Update.model_validate(await request.json(), context={"bot": self.bot})
+        except Exception as e:
+            logger.warning(f"Webhook: некорректное обновление: {str(e)}")
+            return web.Response(status=400)
+        try:
+            self._queue.put_nowait(update)
+        except asyncio.QueueFull:
+            self.rejected += 1
+            logger.warning(f"Webhook: очередь обновлений заполнена, обновление {update.update_id} отложено")
+            return web.Response(status=503)
+        self.received += 1
+        return web.Response()
+
+    # Забирает обновления из очереди и запускает для каждого задачу, как только есть свободное место
+    async def _dispatch(self):
+        while True:
+            await self._slots.acquire()
+            update = await self._queue.get()
+            task = asyncio.create_task(self._process(update))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _process(self, update):
+        try:
+            await self.dp.feed_update(self.bot, update)
+        except Exception as e:
+            logger.error(f"Webhook: ошибка обработки обновления {update.update_id}: {str(e)}")
+        finally:
+            self._slots.release()
+            self._queue.task_done()
+
+    def queued(self):
+        return self._queue.qsize()
+
+    def in_progress(self):
+        return len(self._tasks)
+
+    def start(self):
+        self._dispatcher = asyncio.create_task(self._dispatch())
+        self._accepting = True
+
+    # Перестает принимать обновления и ждет обработки уже принятых
+    async def drain(self, timeout=SHUTDOWN_DRAIN_TIMEOUT):
+        self._accepting = False
+        try:
+            await asyncio.wait_for(self._queue.join(), timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"Webhook: за {timeout} сек не обработано обновлений: "
+                           f"{self._queue.qsize() + len(self._tasks)}")
+        tasks = list(self._tasks)
+        if self._dispatcher is not None:
+            tasks.append(self._dispatcher)
+            self._dispatcher = None
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
+async def run_webhook(dp, bot, host=WEBHOOK_HOST, port=WEBHOOK_PORT, url=WEBHOOK_URL):
+    server = WebhookServer(dp, bot)
+    REGISTRY.callback("bot_webhook_updates_total", "counter", "Обновления, принятые и отложенные вебхуком",
+                      lambda: {"accepted": server.received, "rejected": server.rejected}, ("result",))
+    REGISTRY.callback("bot_webhook_queue_depth", "gauge", "Обновлений в очереди вебхука",
+                      server.queued)
+    REGISTRY.callback("bot_webhook_in_progress", "gauge", "Обновлений, обрабатываемых вебхуком",
+                      server.in_progress)
+    runner = web.AppRunner(server.create_app())
+    await runner.setup()
+    await dp.emit_startup(bot=bot)
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+    try:
+        server.start()
+        await web.TCPSite(runner, host, port).start()
+        if url:
+            # Вебхук при остановке не удаляется: пока бот перезапускается,
+            # Telegram копит обновления и доставит их после запуска
+            await bot.set_webhook(url.rstrip("/") + server.path, secret_token=server.secret,
+                                  allowed_updates=dp.resolve_used_update_types())
+        logger.info(f"Webhook: сервер запущен на {host}:{port}{server.path}, одновременно: {server.concurrency}")
+        await stop.wait()
+        logger.info("Webhook: остановка, ожидание обработки принятых обновлений...")
+        await server.drain()
+    finally:
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            loop.remove_signal_handler(sig)
+        await runner.cleanup()
+        await dp.emit_shutdown(bot=bot)
+        await bot.session.close()